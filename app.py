@@ -6,6 +6,10 @@ import pyautogui
 import pygetwindow as gw
 from datetime import datetime
 
+from screenCapture import BufferPool, FrameSource, create_backend, expand_region
+from fftMatch import FFTCorrelator
+from circularStats import CircularAccumulator
+
 from PySide6.QtCore import Qt, QRect, QPoint, Signal, QObject, QThread
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton, QFileDialog,
@@ -14,6 +18,9 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtGui import QPainter, QPen, QColor, QGuiApplication, QImage, QPixmap, QIcon
 
+# 偵測用的暫存影像（灰階、邊緣、遮罩、比對結果）：每次偵測寫回同一塊記憶體，不再逐次配置
+_buffers = BufferPool()
+
 # ==========================
 # 資源文件路徑處理
 # ==========================
@@ -75,10 +82,16 @@ DEFAULT_CFG = {
 
     # 箭頭/拖曳
     "ARROW_SEARCH_RADIUS": 140,
+    "ARROW_ANNULUS_ENABLED": True,   # 箭頭只在人物周圍的環內找（排除人物本身的紅色與圓外四角）
+    "ARROW_INNER_RADIUS": 30,        # 搜尋環內半徑（像素），約人物身形一半
+    "ARROW_PROBE_ENABLED": True,     # 導航中先以搜尋環內紅色像素數判斷箭頭在不在，不在就略過完整角度分析
     "ARROW_MIN_AREA": 80,
     "ARROW_DETECTION_TIMEOUT": 3.0,
     "ARROW_POLL_INTERVAL": 0.08,
     "ARROW_MIN_HITS": 5,
+    "ARROW_DECISION_CI_DEG": 10.0,     # 角度均值 95% 信賴區間半寬小於此值（度）即停止取樣
+    "ARROW_DECISION_MIN_SAMPLES": 3,   # 短窗取樣提前停止所需的最少命中數
+    "ARROW_DECISION_MAX_EXTEND": 2.0,  # 樣本不一致時短窗最多延長的倍數
     "DRAG_DISTANCE": 180,
     "DRAG_HOLD_SECONDS": 0.2,
     "DRAG_BUTTON": "left",
@@ -108,12 +121,30 @@ DEFAULT_CFG = {
     "RING_CONSISTENCY": 0.55,           # 圓周白色比例閾值
     "RING_REFINE_WINDOW": 120,          # 模板驗證窗口大小
     "RING_TEMPLATE_CONFIDENCE": 0.82,   # 模板二次驗證閾值
+    "RING_ENGINE": "hough",             # 圓環偵測引擎：hough（HoughCircles）/ annulus（環帶卷積，延遲固定不受畫面雜訊影響）
+    "RING_ANNULUS_STEP": 4,             # annulus 引擎的半徑間隔（原解析度像素；環帶寬 ±1 個縮小後像素，不超過 2/RING_ANNULUS_SCALE 就不漏半徑）
+    "RING_ANNULUS_SCALE": 0.5,          # annulus 引擎卷積時的縮小倍率（1.0 = 原解析度，較準但較慢）
+    "RING_ANNULUS_TOP_K": 8,            # annulus 引擎交給圓周一致性檢查的候選數
     
     # 圖標增強檢測參數
     "ICON_ENHANCED_DETECTION": True,    # 是否啟用圖標增強檢測
     "ICON_MASK_ALPHA": 0.5,             # 灰階+遮罩 與 邊緣 的融合權重
     "ICON_RATIO_THRESHOLD": 1.12,       # 最佳/次佳 比例門檻
     "ICON_ENHANCED_CONFIDENCE": 0.84,   # 增強檢測信心度閾值
+    "ICON_SEARCH_MODE": "coarse_to_fine",  # 尺度搜尋：coarse_to_fine（粗層篩選+拋物線內插）/ dense（逐尺度全解析度）
+    "ICON_COARSE_FACTOR": 0.5,          # 粗層縮小比例
+    "ICON_REFINE_TOP_K": 2,             # 粗層前幾名進入全解析度精修
+    "ICON_TRACKING_ENABLED": True,      # 命中後先在上次位置附近（鎖定尺度 ±1 步）追蹤
+    "ICON_TRACK_PADDING": 24,           # 追蹤 ROI 向外擴張的像素
+    "ICON_PREFILTER_ENABLED": True,     # 先以白色/青藍像素數做負向預篩，明顯不足就跳過模板比對
+    "ICON_PREFILTER_RATIO": 0.5,        # 需要達到最小尺度模板像素數的比例（越小越保守）
+    "STRATEGY_ADAPTIVE": True,          # 依成功率與耗時排序偵測方法（有驗證的增強/圓環永遠先於備援）
+    "STRATEGY_SKIP_AFTER_FAILS": 8,     # 其他方法成功而此方法連續失敗幾次後暫時跳過
+    "STRATEGY_RETRY_INTERVAL": 20,      # 被跳過的方法每隔幾次呼叫重試一次
+    "CHAR_TRACKING_ENABLED": True,      # 導航中以等速 Kalman 預測人物中心，只在預測附近做局部模板確認
+    "CHAR_TRACK_MAX_SIGMA": 12.0,       # 預測位置標準差超過此值（像素）就改做完整人物偵測
+    "CHAR_TRACK_PADDING": 24,           # 局部確認窗向外擴張的像素（至少 3 倍預測標準差）
+    "MATCH_ENGINE": "opencv",           # 整區模板比對引擎：opencv（逐尺度 matchTemplate）/ fft（影像頻譜共用，適合大搜尋區+多尺度）
     "ANGLE_RELOCK_STD": 25.0,       # 角度發散時「重新鎖定」的門檻（度），高於此值暫停拖
     "ANGLE_ABORT_DEG": 60.0,        # 與上次方向差超過此角度則視為大幅偏離，停止這輪
     "ANGLE_SMOOTH_ALPHA": 0.35,     # 角度 EMA 平滑係數（0~1）
@@ -123,12 +154,28 @@ DEFAULT_CFG = {
     "DRAG_FEEDBACK_INTERVAL": 0.15, # 動態拖曳中檢查箭頭間隔（秒）
     "DRAG_ANGLE_TOLERANCE": 25.0,   # 動態拖曳中角度變化容忍度（度）
     "DRAG_MIN_TIME": 0.3,           # 動態拖曳最短時間（秒）
+    "DRAG_CONTROL_HZ": 60,          # 動態拖曳控制迴圈頻率（次/秒），偵測在另一個執行緒進行
+    "DRAG_STEER_SMOOTH": 0.08,      # 游標移向新目標點的平滑時間常數（秒），0 = 直接跳到目標點
+    "PERCEPTION_MAX_AGE": 0.3,      # 拖曳中感知執行緒的角度估計在多久內（秒）可直接用於下一次拖曳，0 = 每次重新取樣
+    
+    "MOTION_ESTIMATION_ENABLED": True,  # 拖曳中以光流量測人物位移，到達/卡住/超過時提早放開
+    "MOTION_STALL_SPEED": 20.0,     # 低於此速度（px/s）視為停止
+    "MOTION_STALL_TIME": 0.4,       # 持續停止多久（秒）視為卡住
+    "MOTION_ARRIVE_RADIUS": 20.0,   # 人物與拖曳點距離小於此值（像素）視為到達
     
     # 呼吸式箭頭處理參數
     "ARROW_BREATHING_CYCLE": 1.0,    # 箭頭呼吸週期（秒）
+    "ARROW_PHASE_LOCK_ENABLED": True, # 由紅色像素數估計呼吸相位，箭頭取樣集中在亮相位
+    "ARROW_BRIGHT_FRACTION": 0.5,     # 視為亮相位的週期比例（以亮峰為中心）
     "ARROW_MISS_TOLERANCE_TIME": 0.5, # 容忍箭頭消失時間（秒）
     "DIRECTION_CHANGE_THRESHOLD": 3,  # 方向改變確認次數
 
+    # 螢幕擷取
+    "CAPTURE_BACKEND": "auto",        # 擷取後端：auto / pyautogui / mss / xshm（可用 benchCapture.py 比較）
+    "CAPTURE_THREAD_ENABLED": True,   # 箭頭/導航階段啟用背景擷取執行緒
+    "CAPTURE_STREAM_FPS": 30,         # 背景擷取頻率（張/秒）
+    "CAPTURE_RING_SIZE": 4,           # 最新影格環形緩衝容量
+
     # 視窗聚焦功能
     "ENABLE_WINDOW_FOCUS": True,        # 是否啟用視窗聚焦功能
     "WINDOW_FOCUS_ON_DETECTION": True,  # 在偵測到圖標時聚焦視窗
@@ -322,16 +369,6 @@ class DiscordNotifier:
 # ==========================
 # 公用函式
 # ==========================
-def circular_mean_deg(angles_deg):
-    if not angles_deg:
-        return None
-    sum_x = sum(math.sin(math.radians(a)) for a in angles_deg)
-    sum_y = sum(math.cos(math.radians(a)) for a in angles_deg)
-    if sum_x == 0 and sum_y == 0:
-        return None
-    mean_rad = math.atan2(sum_x, sum_y)
-    return (math.degrees(mean_rad) + 360) % 360
-
 def clamp_region_to_screen(x, y, w, h):
     try:
         sw, sh = pyautogui.size()
@@ -515,6 +552,44 @@ class ConfigDialog(QDialog):
         icon_scale_layout.addWidget(self.icon_scale_max_spin)
         detection_layout.addRow("圖標縮放範圍:", icon_scale_layout)
         
+        # 圖標尺度搜尋模式
+        self.icon_search_mode_combo = QComboBox()
+        self.icon_search_mode_combo.addItems(["coarse_to_fine", "dense"])
+        self.icon_search_mode_combo.setCurrentText(self.cfg.get("ICON_SEARCH_MODE", "coarse_to_fine"))
+        detection_layout.addRow("圖標尺度搜尋模式:", self.icon_search_mode_combo)
+        
+        self.icon_coarse_factor_spin = QDoubleSpinBox()
+        self.icon_coarse_factor_spin.setRange(0.2, 0.8)
+        self.icon_coarse_factor_spin.setSingleStep(0.05)
+        self.icon_coarse_factor_spin.setDecimals(2)
+        self.icon_coarse_factor_spin.setValue(self.cfg.get("ICON_COARSE_FACTOR", 0.5))
+        self.icon_coarse_factor_spin.setToolTip("粗層縮小比例：越小越快，但模板太小時會自動改用逐尺度搜尋")
+        detection_layout.addRow("粗層縮小比例:", self.icon_coarse_factor_spin)
+        
+        self.icon_refine_top_k_spin = QSpinBox()
+        self.icon_refine_top_k_spin.setRange(1, 5)
+        self.icon_refine_top_k_spin.setValue(self.cfg.get("ICON_REFINE_TOP_K", 2))
+        self.icon_refine_top_k_spin.setToolTip("粗層分數前幾名的尺度進入原解析度精修")
+        detection_layout.addRow("精修候選數:", self.icon_refine_top_k_spin)
+        
+        # 圖標追蹤
+        self.icon_tracking_checkbox = QCheckBox("命中後先在上次位置附近追蹤（miss 才全區搜尋）")
+        self.icon_tracking_checkbox.setChecked(self.cfg.get("ICON_TRACKING_ENABLED", True))
+        detection_layout.addRow("", self.icon_tracking_checkbox)
+        
+        self.icon_track_padding_spin = QSpinBox()
+        self.icon_track_padding_spin.setRange(4, 200)
+        self.icon_track_padding_spin.setSuffix(" px")
+        self.icon_track_padding_spin.setValue(self.cfg.get("ICON_TRACK_PADDING", 24))
+        detection_layout.addRow("追蹤範圍擴張:", self.icon_track_padding_spin)
+        
+        # 模板比對引擎
+        self.match_engine_combo = QComboBox()
+        self.match_engine_combo.addItems(["opencv", "fft"])
+        self.match_engine_combo.setCurrentText(self.cfg.get("MATCH_ENGINE", "opencv"))
+        self.match_engine_combo.setToolTip("fft：搜尋影像每個影格只做一次頻譜轉換，所有尺度共用；搜尋區大、尺度多時較快")
+        detection_layout.addRow("模板比對引擎:", self.match_engine_combo)
+        
         # 人物縮放範圍
         self.character_scale_min_spin = QDoubleSpinBox()
         self.character_scale_min_spin.setRange(0.1, 2.0)
@@ -535,6 +610,24 @@ class ConfigDialog(QDialog):
         character_scale_layout.addWidget(self.character_scale_max_spin)
         detection_layout.addRow("人物縮放範圍:", character_scale_layout)
         
+        # 導航中人物追蹤
+        self.char_tracking_checkbox = QCheckBox("導航中追蹤人物（預測位置附近局部確認，不確定時才完整偵測）")
+        self.char_tracking_checkbox.setChecked(self.cfg.get("CHAR_TRACKING_ENABLED", True))
+        detection_layout.addRow("", self.char_tracking_checkbox)
+        
+        self.char_track_sigma_spin = QDoubleSpinBox()
+        self.char_track_sigma_spin.setRange(2.0, 100.0)
+        self.char_track_sigma_spin.setSingleStep(1.0)
+        self.char_track_sigma_spin.setSuffix(" px")
+        self.char_track_sigma_spin.setValue(self.cfg.get("CHAR_TRACK_MAX_SIGMA", 12.0))
+        detection_layout.addRow("追蹤預測誤差上限:", self.char_track_sigma_spin)
+        
+        self.char_track_padding_spin = QSpinBox()
+        self.char_track_padding_spin.setRange(4, 200)
+        self.char_track_padding_spin.setSuffix(" px")
+        self.char_track_padding_spin.setValue(self.cfg.get("CHAR_TRACK_PADDING", 24))
+        detection_layout.addRow("人物確認範圍擴張:", self.char_track_padding_spin)
+        
         tabs.addTab(detection_tab, "偵測參數")
         
         # 箭頭偵測標籤頁
@@ -553,6 +646,21 @@ class ConfigDialog(QDialog):
         arrow_radius_layout.addWidget(self.arrow_radius_label)
         arrow_layout.addRow("箭頭搜尋半徑:", arrow_radius_layout)
         
+        # 箭頭搜尋環
+        self.arrow_annulus_checkbox = QCheckBox("只在人物周圍的環內找箭頭（排除人物本身與圓外四角）")
+        self.arrow_annulus_checkbox.setChecked(self.cfg.get("ARROW_ANNULUS_ENABLED", True))
+        arrow_layout.addRow("", self.arrow_annulus_checkbox)
+        
+        self.arrow_inner_radius_spin = QSpinBox()
+        self.arrow_inner_radius_spin.setRange(0, 150)
+        self.arrow_inner_radius_spin.setSuffix(" px")
+        self.arrow_inner_radius_spin.setValue(self.cfg.get("ARROW_INNER_RADIUS", 30))
+        arrow_layout.addRow("搜尋環內半徑:", self.arrow_inner_radius_spin)
+        
+        self.arrow_probe_checkbox = QCheckBox("導航中先以紅色像素數快速判斷箭頭是否還在")
+        self.arrow_probe_checkbox.setChecked(self.cfg.get("ARROW_PROBE_ENABLED", True))
+        arrow_layout.addRow("", self.arrow_probe_checkbox)
+        
         # 箭頭最小面積
         self.arrow_min_area_slider = QSlider(Qt.Horizontal)
         self.arrow_min_area_slider.setRange(10, 500)
@@ -578,6 +686,24 @@ class ConfigDialog(QDialog):
         self.arrow_min_hits_spin.setValue(self.cfg["ARROW_MIN_HITS"])
         arrow_layout.addRow("箭頭最小命中次數:", self.arrow_min_hits_spin)
         
+        # 角度序貫停止
+        self.arrow_decision_ci_spin = QDoubleSpinBox()
+        self.arrow_decision_ci_spin.setRange(2.0, 30.0)
+        self.arrow_decision_ci_spin.setSingleStep(1.0)
+        self.arrow_decision_ci_spin.setValue(self.cfg.get("ARROW_DECISION_CI_DEG", 10.0))
+        arrow_layout.addRow("角度信賴區間半寬(度):", self.arrow_decision_ci_spin)
+        
+        self.arrow_decision_min_samples_spin = QSpinBox()
+        self.arrow_decision_min_samples_spin.setRange(2, 10)
+        self.arrow_decision_min_samples_spin.setValue(self.cfg.get("ARROW_DECISION_MIN_SAMPLES", 3))
+        arrow_layout.addRow("提前停止最少命中數:", self.arrow_decision_min_samples_spin)
+        
+        self.arrow_decision_extend_spin = QDoubleSpinBox()
+        self.arrow_decision_extend_spin.setRange(1.0, 4.0)
+        self.arrow_decision_extend_spin.setSingleStep(0.5)
+        self.arrow_decision_extend_spin.setValue(self.cfg.get("ARROW_DECISION_MAX_EXTEND", 2.0))
+        arrow_layout.addRow("不一致時延長倍數:", self.arrow_decision_extend_spin)
+        
         tabs.addTab(arrow_tab, "箭頭偵測")
         
         # 移動控制標籤頁
@@ -692,6 +818,25 @@ class ConfigDialog(QDialog):
         self.drag_min_dynamic_time_spin.setValue(self.cfg["DRAG_MIN_TIME"])
         dynamic_drag_layout.addRow("最短動態拖曳(秒):", self.drag_min_dynamic_time_spin)
         
+        # 控制迴圈頻率與轉向平滑
+        self.drag_control_hz_spin = QSpinBox()
+        self.drag_control_hz_spin.setRange(10, 240)
+        self.drag_control_hz_spin.setSingleStep(10)
+        self.drag_control_hz_spin.setValue(self.cfg.get("DRAG_CONTROL_HZ", 60))
+        dynamic_drag_layout.addRow("控制頻率(次/秒):", self.drag_control_hz_spin)
+        
+        self.drag_steer_smooth_spin = QDoubleSpinBox()
+        self.drag_steer_smooth_spin.setRange(0.0, 0.5)
+        self.drag_steer_smooth_spin.setSingleStep(0.02)
+        self.drag_steer_smooth_spin.setValue(self.cfg.get("DRAG_STEER_SMOOTH", 0.08))
+        dynamic_drag_layout.addRow("轉向平滑時間(秒):", self.drag_steer_smooth_spin)
+        
+        self.perception_max_age_spin = QDoubleSpinBox()
+        self.perception_max_age_spin.setRange(0.0, 1.0)
+        self.perception_max_age_spin.setSingleStep(0.05)
+        self.perception_max_age_spin.setValue(self.cfg.get("PERCEPTION_MAX_AGE", 0.3))
+        dynamic_drag_layout.addRow("拖曳中估計沿用期限(秒):", self.perception_max_age_spin)
+        
         # 角度穩定標準差門檻
         self.angle_ok_std_spin = QDoubleSpinBox()
         self.angle_ok_std_spin.setRange(5.0, 30.0)
@@ -706,6 +851,29 @@ class ConfigDialog(QDialog):
         self.angle_relock_std_spin.setValue(self.cfg["ANGLE_RELOCK_STD"])
         dynamic_drag_layout.addRow("角度重鎖定門檻(度):", self.angle_relock_std_spin)
         
+        # 光流位移量測
+        self.motion_enabled_checkbox = QCheckBox("拖曳中以光流量測人物位移（到達/卡住/超過時提早放開）")
+        self.motion_enabled_checkbox.setChecked(self.cfg.get("MOTION_ESTIMATION_ENABLED", True))
+        dynamic_drag_layout.addRow("", self.motion_enabled_checkbox)
+        
+        self.motion_stall_speed_spin = QDoubleSpinBox()
+        self.motion_stall_speed_spin.setRange(1.0, 200.0)
+        self.motion_stall_speed_spin.setSingleStep(5.0)
+        self.motion_stall_speed_spin.setValue(self.cfg.get("MOTION_STALL_SPEED", 20.0))
+        dynamic_drag_layout.addRow("停止速度門檻(px/s):", self.motion_stall_speed_spin)
+        
+        self.motion_stall_time_spin = QDoubleSpinBox()
+        self.motion_stall_time_spin.setRange(0.1, 2.0)
+        self.motion_stall_time_spin.setSingleStep(0.1)
+        self.motion_stall_time_spin.setValue(self.cfg.get("MOTION_STALL_TIME", 0.4))
+        dynamic_drag_layout.addRow("卡住判定時間(秒):", self.motion_stall_time_spin)
+        
+        self.motion_arrive_radius_spin = QDoubleSpinBox()
+        self.motion_arrive_radius_spin.setRange(5.0, 100.0)
+        self.motion_arrive_radius_spin.setSingleStep(5.0)
+        self.motion_arrive_radius_spin.setValue(self.cfg.get("MOTION_ARRIVE_RADIUS", 20.0))
+        dynamic_drag_layout.addRow("到達判定距離(像素):", self.motion_arrive_radius_spin)
+        
         # 呼吸式箭頭處理
         dynamic_drag_layout.addRow("", QLabel())  # 分隔線
         breathing_label = QLabel("呼吸式箭頭處理:")
@@ -719,6 +887,17 @@ class ConfigDialog(QDialog):
         self.arrow_breathing_cycle_spin.setValue(self.cfg["ARROW_BREATHING_CYCLE"])
         dynamic_drag_layout.addRow("箭頭呼吸週期(秒):", self.arrow_breathing_cycle_spin)
         
+        # 呼吸相位鎖定
+        self.arrow_phase_lock_checkbox = QCheckBox("箭頭取樣鎖定呼吸亮相位")
+        self.arrow_phase_lock_checkbox.setChecked(self.cfg.get("ARROW_PHASE_LOCK_ENABLED", True))
+        dynamic_drag_layout.addRow("", self.arrow_phase_lock_checkbox)
+        
+        self.arrow_bright_fraction_spin = QDoubleSpinBox()
+        self.arrow_bright_fraction_spin.setRange(0.2, 0.9)
+        self.arrow_bright_fraction_spin.setSingleStep(0.05)
+        self.arrow_bright_fraction_spin.setValue(self.cfg.get("ARROW_BRIGHT_FRACTION", 0.5))
+        dynamic_drag_layout.addRow("亮相位比例:", self.arrow_bright_fraction_spin)
+        
         # 容忍消失時間
         self.arrow_miss_tolerance_time_spin = QDoubleSpinBox()
         self.arrow_miss_tolerance_time_spin.setRange(0.1, 2.0)
@@ -760,6 +939,42 @@ class ConfigDialog(QDialog):
         
         tabs.addTab(timing_tab, "時間控制")
         
+        # 螢幕擷取標籤頁
+        capture_tab = QWidget()
+        capture_layout = QFormLayout(capture_tab)
+        
+        # 擷取後端
+        self.capture_backend_combo = QComboBox()
+        self.capture_backend_combo.addItems(["auto", "pyautogui", "mss", "xshm"])
+        self.capture_backend_combo.setCurrentText(self.cfg.get("CAPTURE_BACKEND", "auto"))
+        capture_layout.addRow("擷取後端:", self.capture_backend_combo)
+        
+        # 背景擷取執行緒
+        self.capture_thread_checkbox = QCheckBox("箭頭/導航階段啟用背景擷取執行緒")
+        self.capture_thread_checkbox.setChecked(self.cfg.get("CAPTURE_THREAD_ENABLED", True))
+        capture_layout.addRow("", self.capture_thread_checkbox)
+        
+        # 背景擷取頻率
+        self.capture_fps_spin = QSpinBox()
+        self.capture_fps_spin.setRange(5, 120)
+        self.capture_fps_spin.setValue(self.cfg.get("CAPTURE_STREAM_FPS", 30))
+        capture_layout.addRow("背景擷取頻率(張/秒):", self.capture_fps_spin)
+        
+        # 環形緩衝容量
+        self.capture_ring_size_spin = QSpinBox()
+        self.capture_ring_size_spin.setRange(2, 16)
+        self.capture_ring_size_spin.setValue(self.cfg.get("CAPTURE_RING_SIZE", 4))
+        capture_layout.addRow("影格緩衝容量:", self.capture_ring_size_spin)
+        
+        capture_layout.addRow("", QLabel())
+        capture_help_label = QLabel("💡 背景擷取：箭頭取樣直接讀取最新影格，不再受截圖+處理+輪詢間隔拖慢；處理跟不上時自動丟棄舊影格。"
+                                    "擷取後端可執行 python benchCapture.py 比較本機速度後選擇（auto 依序嘗試 xshm → mss → pyautogui）")
+        capture_help_label.setStyleSheet("color: #666; font-size: 10px;")
+        capture_help_label.setWordWrap(True)
+        capture_layout.addRow("", capture_help_label)
+        
+        tabs.addTab(capture_tab, "螢幕擷取")
+        
         # 高級設定標籤頁
         advanced_tab = QWidget()
         advanced_layout = QFormLayout(advanced_tab)
@@ -854,6 +1069,29 @@ class ConfigDialog(QDialog):
         self.final_check_delay_spin.setValue(self.cfg["FINAL_CHECK_DELAY"])
         advanced_layout.addRow("最終檢查延遲(秒):", self.final_check_delay_spin)
         
+        # 分隔線
+        advanced_layout.addRow("", QLabel())
+        strategy_label = QLabel("偵測策略設定:")
+        strategy_label.setStyleSheet("font-weight: bold; color: #0066cc;")
+        advanced_layout.addRow(strategy_label)
+        
+        # 自適應策略
+        self.strategy_adaptive_checkbox = QCheckBox("依成功率與耗時自動排序偵測方法")
+        self.strategy_adaptive_checkbox.setChecked(self.cfg.get("STRATEGY_ADAPTIVE", True))
+        advanced_layout.addRow("", self.strategy_adaptive_checkbox)
+        
+        # 連續失敗跳過門檻
+        self.strategy_skip_after_spin = QSpinBox()
+        self.strategy_skip_after_spin.setRange(2, 100)
+        self.strategy_skip_after_spin.setValue(self.cfg.get("STRATEGY_SKIP_AFTER_FAILS", 8))
+        advanced_layout.addRow("連續失敗幾次後跳過:", self.strategy_skip_after_spin)
+        
+        # 重試間隔
+        self.strategy_retry_spin = QSpinBox()
+        self.strategy_retry_spin.setRange(2, 500)
+        self.strategy_retry_spin.setValue(self.cfg.get("STRATEGY_RETRY_INTERVAL", 20))
+        advanced_layout.addRow("跳過的方法每幾次重試:", self.strategy_retry_spin)
+        
         # 分隔線
         advanced_layout.addRow("", QLabel())
         log_label = QLabel("日誌管理設定:")
@@ -899,6 +1137,29 @@ class ConfigDialog(QDialog):
         self.ring_r_max_spin.setValue(self.cfg.get("RING_CIRCLE_R_MAX", 40))
         ring_layout.addRow("圓環最大半徑(像素):", self.ring_r_max_spin)
         
+        # 圓環偵測引擎
+        self.ring_engine_combo = QComboBox()
+        self.ring_engine_combo.addItems(["hough", "annulus"])
+        self.ring_engine_combo.setCurrentText(self.cfg.get("RING_ENGINE", "hough"))
+        self.ring_engine_combo.setToolTip("annulus：白色遮罩與各半徑的環帶卷積核卷積，每張影格耗時固定，不受畫面雜訊影響")
+        ring_layout.addRow("圓環偵測引擎:", self.ring_engine_combo)
+        
+        self.ring_annulus_step_spin = QSpinBox()
+        self.ring_annulus_step_spin.setRange(1, 8)
+        self.ring_annulus_step_spin.setValue(self.cfg.get("RING_ANNULUS_STEP", 4))
+        ring_layout.addRow("環帶半徑間隔(像素):", self.ring_annulus_step_spin)
+        
+        self.ring_annulus_top_k_spin = QSpinBox()
+        self.ring_annulus_top_k_spin.setRange(1, 32)
+        self.ring_annulus_top_k_spin.setValue(self.cfg.get("RING_ANNULUS_TOP_K", 8))
+        ring_layout.addRow("環帶候選數:", self.ring_annulus_top_k_spin)
+        
+        self.ring_annulus_scale_spin = QDoubleSpinBox()
+        self.ring_annulus_scale_spin.setRange(0.25, 1.0)
+        self.ring_annulus_scale_spin.setSingleStep(0.05)
+        self.ring_annulus_scale_spin.setValue(self.cfg.get("RING_ANNULUS_SCALE", 0.5))
+        ring_layout.addRow("環帶卷積縮小倍率:", self.ring_annulus_scale_spin)
+        
         # 白色檢測參數
         ring_layout.addRow("", QLabel())
         white_label = QLabel("白色檢測參數:")
@@ -1031,6 +1292,24 @@ class ConfigDialog(QDialog):
         ratio_threshold_layout.addWidget(self.icon_ratio_threshold_label)
         icon_enhanced_layout.addRow("最佳/次佳比例門檻:", ratio_threshold_layout)
         
+        # 負向預篩
+        icon_enhanced_layout.addRow("", QLabel())
+        prefilter_label = QLabel("負向預篩:")
+        prefilter_label.setStyleSheet("font-weight: bold; color: #0066cc;")
+        icon_enhanced_layout.addRow(prefilter_label)
+        
+        self.icon_prefilter_checkbox = QCheckBox("白色/青藍像素明顯不足時跳過模板比對（降低閒置 CPU）")
+        self.icon_prefilter_checkbox.setChecked(self.cfg.get("ICON_PREFILTER_ENABLED", True))
+        icon_enhanced_layout.addRow("", self.icon_prefilter_checkbox)
+        
+        self.icon_prefilter_ratio_spin = QDoubleSpinBox()
+        self.icon_prefilter_ratio_spin.setRange(0.05, 1.0)
+        self.icon_prefilter_ratio_spin.setSingleStep(0.05)
+        self.icon_prefilter_ratio_spin.setDecimals(2)
+        self.icon_prefilter_ratio_spin.setValue(self.cfg.get("ICON_PREFILTER_RATIO", 0.5))
+        self.icon_prefilter_ratio_spin.setToolTip("搜尋區內特徵色像素需達到「最小尺度模板像素數」的比例")
+        icon_enhanced_layout.addRow("預篩像素比例:", self.icon_prefilter_ratio_spin)
+        
         # 添加說明
         icon_enhanced_layout.addRow("", QLabel())
         icon_enhanced_help_label = QLabel("💡 智能遮罩檢測：自動識別關鍵特徵（白色對話框、青藍光圈），排除干擾（紅色驚嘆號）")
@@ -1195,14 +1474,29 @@ class ConfigDialog(QDialog):
         # 縮放範圍
         self.icon_scale_min_spin.setValue(DEFAULT_CFG["ICON_SCALE_RANGE"][0])
         self.icon_scale_max_spin.setValue(DEFAULT_CFG["ICON_SCALE_RANGE"][1])
+        self.icon_search_mode_combo.setCurrentText(DEFAULT_CFG["ICON_SEARCH_MODE"])
+        self.icon_coarse_factor_spin.setValue(DEFAULT_CFG["ICON_COARSE_FACTOR"])
+        self.icon_refine_top_k_spin.setValue(DEFAULT_CFG["ICON_REFINE_TOP_K"])
+        self.icon_tracking_checkbox.setChecked(DEFAULT_CFG["ICON_TRACKING_ENABLED"])
+        self.icon_track_padding_spin.setValue(DEFAULT_CFG["ICON_TRACK_PADDING"])
+        self.match_engine_combo.setCurrentText(DEFAULT_CFG["MATCH_ENGINE"])
         self.character_scale_min_spin.setValue(DEFAULT_CFG["CHARACTER_SCALE_RANGE"][0])
         self.character_scale_max_spin.setValue(DEFAULT_CFG["CHARACTER_SCALE_RANGE"][1])
+        self.char_tracking_checkbox.setChecked(DEFAULT_CFG["CHAR_TRACKING_ENABLED"])
+        self.char_track_sigma_spin.setValue(DEFAULT_CFG["CHAR_TRACK_MAX_SIGMA"])
+        self.char_track_padding_spin.setValue(DEFAULT_CFG["CHAR_TRACK_PADDING"])
         
         # 箭頭偵測
         self.arrow_radius_slider.setValue(DEFAULT_CFG["ARROW_SEARCH_RADIUS"])
+        self.arrow_annulus_checkbox.setChecked(DEFAULT_CFG["ARROW_ANNULUS_ENABLED"])
+        self.arrow_inner_radius_spin.setValue(DEFAULT_CFG["ARROW_INNER_RADIUS"])
+        self.arrow_probe_checkbox.setChecked(DEFAULT_CFG["ARROW_PROBE_ENABLED"])
         self.arrow_min_area_slider.setValue(DEFAULT_CFG["ARROW_MIN_AREA"])
         self.arrow_timeout_spin.setValue(DEFAULT_CFG["ARROW_DETECTION_TIMEOUT"])
         self.arrow_min_hits_spin.setValue(DEFAULT_CFG["ARROW_MIN_HITS"])
+        self.arrow_decision_ci_spin.setValue(DEFAULT_CFG["ARROW_DECISION_CI_DEG"])
+        self.arrow_decision_min_samples_spin.setValue(DEFAULT_CFG["ARROW_DECISION_MIN_SAMPLES"])
+        self.arrow_decision_extend_spin.setValue(DEFAULT_CFG["ARROW_DECISION_MAX_EXTEND"])
         
         # 移動控制
         self.drag_distance_slider.setValue(DEFAULT_CFG["DRAG_DISTANCE"])
@@ -1227,14 +1521,29 @@ class ConfigDialog(QDialog):
         self.drag_feedback_interval_spin.setValue(DEFAULT_CFG["DRAG_FEEDBACK_INTERVAL"])
         self.drag_angle_tolerance_spin.setValue(DEFAULT_CFG["DRAG_ANGLE_TOLERANCE"])
         self.drag_min_dynamic_time_spin.setValue(DEFAULT_CFG["DRAG_MIN_TIME"])
+        self.drag_control_hz_spin.setValue(DEFAULT_CFG["DRAG_CONTROL_HZ"])
+        self.drag_steer_smooth_spin.setValue(DEFAULT_CFG["DRAG_STEER_SMOOTH"])
+        self.perception_max_age_spin.setValue(DEFAULT_CFG["PERCEPTION_MAX_AGE"])
         self.angle_ok_std_spin.setValue(DEFAULT_CFG["ANGLE_OK_STD"])
         self.angle_relock_std_spin.setValue(DEFAULT_CFG["ANGLE_RELOCK_STD"])
+        self.motion_enabled_checkbox.setChecked(DEFAULT_CFG["MOTION_ESTIMATION_ENABLED"])
+        self.motion_stall_speed_spin.setValue(DEFAULT_CFG["MOTION_STALL_SPEED"])
+        self.motion_stall_time_spin.setValue(DEFAULT_CFG["MOTION_STALL_TIME"])
+        self.motion_arrive_radius_spin.setValue(DEFAULT_CFG["MOTION_ARRIVE_RADIUS"])
         
         # 呼吸式箭頭處理
         self.arrow_breathing_cycle_spin.setValue(DEFAULT_CFG["ARROW_BREATHING_CYCLE"])
+        self.arrow_phase_lock_checkbox.setChecked(DEFAULT_CFG["ARROW_PHASE_LOCK_ENABLED"])
+        self.arrow_bright_fraction_spin.setValue(DEFAULT_CFG["ARROW_BRIGHT_FRACTION"])
         self.arrow_miss_tolerance_time_spin.setValue(DEFAULT_CFG["ARROW_MISS_TOLERANCE_TIME"])
         self.direction_change_threshold_spin.setValue(DEFAULT_CFG["DIRECTION_CHANGE_THRESHOLD"])
         
+        # 螢幕擷取
+        self.capture_backend_combo.setCurrentText(DEFAULT_CFG["CAPTURE_BACKEND"])
+        self.capture_thread_checkbox.setChecked(DEFAULT_CFG["CAPTURE_THREAD_ENABLED"])
+        self.capture_fps_spin.setValue(DEFAULT_CFG["CAPTURE_STREAM_FPS"])
+        self.capture_ring_size_spin.setValue(DEFAULT_CFG["CAPTURE_RING_SIZE"])
+        
         # 高級設定
         self.arrow_poll_interval_spin.setValue(DEFAULT_CFG["ARROW_POLL_INTERVAL"])
         self.drag_button_combo.setText(DEFAULT_CFG["DRAG_BUTTON"])
@@ -1246,6 +1555,11 @@ class ConfigDialog(QDialog):
         self.post_move_delay_spin.setValue(DEFAULT_CFG["POST_MOVE_DELAY"])
         self.final_check_delay_spin.setValue(DEFAULT_CFG["FINAL_CHECK_DELAY"])
         
+        # 偵測策略設定
+        self.strategy_adaptive_checkbox.setChecked(DEFAULT_CFG["STRATEGY_ADAPTIVE"])
+        self.strategy_skip_after_spin.setValue(DEFAULT_CFG["STRATEGY_SKIP_AFTER_FAILS"])
+        self.strategy_retry_spin.setValue(DEFAULT_CFG["STRATEGY_RETRY_INTERVAL"])
+        
         # 日誌管理設定
         self.log_auto_cleanup_checkbox.setChecked(DEFAULT_CFG.get("LOG_AUTO_CLEANUP", True))
         self.log_max_lines_spin.setValue(DEFAULT_CFG.get("LOG_MAX_LINES", 500))
@@ -1299,11 +1613,26 @@ class ConfigDialog(QDialog):
         # 縮放範圍
         self.cfg["ICON_SCALE_RANGE"] = [self.icon_scale_min_spin.value(), self.icon_scale_max_spin.value()]
         self.cfg["CHARACTER_SCALE_RANGE"] = [self.character_scale_min_spin.value(), self.character_scale_max_spin.value()]
+        self.cfg["CHAR_TRACKING_ENABLED"] = self.char_tracking_checkbox.isChecked()
+        self.cfg["CHAR_TRACK_MAX_SIGMA"] = self.char_track_sigma_spin.value()
+        self.cfg["CHAR_TRACK_PADDING"] = self.char_track_padding_spin.value()
+        self.cfg["ICON_SEARCH_MODE"] = self.icon_search_mode_combo.currentText()
+        self.cfg["ICON_COARSE_FACTOR"] = self.icon_coarse_factor_spin.value()
+        self.cfg["ICON_REFINE_TOP_K"] = self.icon_refine_top_k_spin.value()
+        self.cfg["ICON_TRACKING_ENABLED"] = self.icon_tracking_checkbox.isChecked()
+        self.cfg["ICON_TRACK_PADDING"] = self.icon_track_padding_spin.value()
+        self.cfg["MATCH_ENGINE"] = self.match_engine_combo.currentText()
         
         self.cfg["ARROW_SEARCH_RADIUS"] = self.arrow_radius_slider.value()
+        self.cfg["ARROW_ANNULUS_ENABLED"] = self.arrow_annulus_checkbox.isChecked()
+        self.cfg["ARROW_INNER_RADIUS"] = self.arrow_inner_radius_spin.value()
+        self.cfg["ARROW_PROBE_ENABLED"] = self.arrow_probe_checkbox.isChecked()
         self.cfg["ARROW_MIN_AREA"] = self.arrow_min_area_slider.value()
         self.cfg["ARROW_DETECTION_TIMEOUT"] = self.arrow_timeout_spin.value()
         self.cfg["ARROW_MIN_HITS"] = self.arrow_min_hits_spin.value()
+        self.cfg["ARROW_DECISION_CI_DEG"] = self.arrow_decision_ci_spin.value()
+        self.cfg["ARROW_DECISION_MIN_SAMPLES"] = self.arrow_decision_min_samples_spin.value()
+        self.cfg["ARROW_DECISION_MAX_EXTEND"] = self.arrow_decision_extend_spin.value()
         
         self.cfg["DRAG_DISTANCE"] = self.drag_distance_slider.value()
         self.cfg["DRAG_HOLD_SECONDS"] = self.drag_hold_spin.value()
@@ -1326,14 +1655,29 @@ class ConfigDialog(QDialog):
         self.cfg["DRAG_FEEDBACK_INTERVAL"] = self.drag_feedback_interval_spin.value()
         self.cfg["DRAG_ANGLE_TOLERANCE"] = self.drag_angle_tolerance_spin.value()
         self.cfg["DRAG_MIN_TIME"] = self.drag_min_dynamic_time_spin.value()
+        self.cfg["DRAG_CONTROL_HZ"] = self.drag_control_hz_spin.value()
+        self.cfg["DRAG_STEER_SMOOTH"] = self.drag_steer_smooth_spin.value()
+        self.cfg["PERCEPTION_MAX_AGE"] = self.perception_max_age_spin.value()
         self.cfg["ANGLE_OK_STD"] = self.angle_ok_std_spin.value()
         self.cfg["ANGLE_RELOCK_STD"] = self.angle_relock_std_spin.value()
+        self.cfg["MOTION_ESTIMATION_ENABLED"] = self.motion_enabled_checkbox.isChecked()
+        self.cfg["MOTION_STALL_SPEED"] = self.motion_stall_speed_spin.value()
+        self.cfg["MOTION_STALL_TIME"] = self.motion_stall_time_spin.value()
+        self.cfg["MOTION_ARRIVE_RADIUS"] = self.motion_arrive_radius_spin.value()
         
         # 呼吸式箭頭處理設置
         self.cfg["ARROW_BREATHING_CYCLE"] = self.arrow_breathing_cycle_spin.value()
+        self.cfg["ARROW_PHASE_LOCK_ENABLED"] = self.arrow_phase_lock_checkbox.isChecked()
+        self.cfg["ARROW_BRIGHT_FRACTION"] = self.arrow_bright_fraction_spin.value()
         self.cfg["ARROW_MISS_TOLERANCE_TIME"] = self.arrow_miss_tolerance_time_spin.value()
         self.cfg["DIRECTION_CHANGE_THRESHOLD"] = self.direction_change_threshold_spin.value()
         
+        # 螢幕擷取設定
+        self.cfg["CAPTURE_BACKEND"] = self.capture_backend_combo.currentText()
+        self.cfg["CAPTURE_THREAD_ENABLED"] = self.capture_thread_checkbox.isChecked()
+        self.cfg["CAPTURE_STREAM_FPS"] = self.capture_fps_spin.value()
+        self.cfg["CAPTURE_RING_SIZE"] = self.capture_ring_size_spin.value()
+        
         # 高級設定
         self.cfg["ENABLE_WINDOW_FOCUS"] = self.enable_window_focus_checkbox.isChecked()
         self.cfg["WINDOW_FOCUS_ON_DETECTION"] = self.window_focus_on_detection_checkbox.isChecked()
@@ -1347,6 +1691,11 @@ class ConfigDialog(QDialog):
         self.cfg["POST_MOVE_DELAY"] = self.post_move_delay_spin.value()
         self.cfg["FINAL_CHECK_DELAY"] = self.final_check_delay_spin.value()
         
+        # 偵測策略設定
+        self.cfg["STRATEGY_ADAPTIVE"] = self.strategy_adaptive_checkbox.isChecked()
+        self.cfg["STRATEGY_SKIP_AFTER_FAILS"] = self.strategy_skip_after_spin.value()
+        self.cfg["STRATEGY_RETRY_INTERVAL"] = self.strategy_retry_spin.value()
+        
         # 日誌管理設定
         self.cfg["LOG_AUTO_CLEANUP"] = self.log_auto_cleanup_checkbox.isChecked()
         self.cfg["LOG_MAX_LINES"] = self.log_max_lines_spin.value()
@@ -1367,6 +1716,10 @@ class ConfigDialog(QDialog):
         self.cfg["RING_DETECTION_ENABLED"] = self.ring_detection_enabled_checkbox.isChecked()
         self.cfg["RING_CIRCLE_R_MIN"] = self.ring_r_min_spin.value()
         self.cfg["RING_CIRCLE_R_MAX"] = self.ring_r_max_spin.value()
+        self.cfg["RING_ENGINE"] = self.ring_engine_combo.currentText()
+        self.cfg["RING_ANNULUS_STEP"] = self.ring_annulus_step_spin.value()
+        self.cfg["RING_ANNULUS_TOP_K"] = self.ring_annulus_top_k_spin.value()
+        self.cfg["RING_ANNULUS_SCALE"] = self.ring_annulus_scale_spin.value()
         self.cfg["RING_WHITE_V_THRESH"] = self.ring_white_v_slider.value()
         self.cfg["RING_WHITE_S_MAX"] = self.ring_white_s_slider.value()
         self.cfg["RING_CONSISTENCY"] = self.ring_consistency_slider.value() / 100.0
@@ -1378,36 +1731,1014 @@ class ConfigDialog(QDialog):
         self.cfg["ICON_MASK_ALPHA"] = self.icon_mask_alpha_slider.value() / 100.0
         self.cfg["ICON_ENHANCED_CONFIDENCE"] = self.icon_enhanced_conf_slider.value() / 100.0
         self.cfg["ICON_RATIO_THRESHOLD"] = self.icon_ratio_threshold_slider.value() / 100.0
+        self.cfg["ICON_PREFILTER_ENABLED"] = self.icon_prefilter_checkbox.isChecked()
+        self.cfg["ICON_PREFILTER_RATIO"] = self.icon_prefilter_ratio_spin.value()
         
         return self.cfg
 
 # ==========================
 # 你的偵測類別（略微改為讀 cfg 變數）
 # ==========================
+class TemplateLevel:
+    """模板在單一尺度下的預算結果"""
+    __slots__ = ("scale", "w", "h", "gray", "edge", "mask", "plain", "coarse", "spectra")
+
+    def __init__(self, scale, w, h, gray, edge, mask, plain):
+        self.scale = scale
+        self.w = w
+        self.h = h
+        self.gray = gray    # INTER_AREA 縮放的灰階（增強比對）
+        self.edge = edge    # Canny 邊緣（INTER_NEAREST）
+        self.mask = mask    # 比對遮罩（INTER_NEAREST；未提供 mask_builder 時為 None）
+        self.plain = plain  # INTER_LINEAR 縮放的灰階（傳統比對）
+        self.coarse = None  # 由粗到細搜尋用的縮小版 TemplateLevel
+        self.spectra = {}   # FFT 比對引擎的模板頻譜快取
+
+    def spectra_for(self, name):
+        """name（gray / edge / plain）對應模板的頻譜快取 dict"""
+        return self.spectra.setdefault(name, {})
+
+
+class TemplateBank:
+    """
+    模板庫：建構時一次讀檔，並依 scale_range / scale_steps 預先縮放灰階、邊緣與遮罩
+    偵測時直接走訪 levels，不再每次呼叫都 imread、Canny、產生遮罩與 resize
+    coarse_factor：另外為每個尺度準備縮小版（由粗到細搜尋的粗層）
+    只在模板路徑或尺度設定改變時重建（見 matches）
+    """
+    COARSE_MIN_SIZE = 8  # 粗層模板邊長下限，再小就失去辨識力，改走密集搜尋
+
+    def __init__(self, template_path, scale_range, scale_steps, mask_builder=None, coarse_factor=None):
+        self.template_path = template_path
+        self.scale_range = (float(scale_range[0]), float(scale_range[1]))
+        self.scale_steps = int(scale_steps)
+        self.coarse_factor = float(coarse_factor) if coarse_factor else None
+
+        # 傳統比對沿用 IMREAD_GRAYSCALE；增強比對沿用彩色模板轉灰階
+        self.gray = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        if self.gray is None:
+            raise ValueError(f"無法載入圖片: {template_path}")
+        self.bgr = cv2.imread(template_path, cv2.IMREAD_COLOR)
+        self.height, self.width = self.gray.shape[:2]
+
+        self.color_gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY) if self.bgr is not None else self.gray
+        self.edge = cv2.Canny(self.color_gray, 50, 150)
+        self.mask = mask_builder(self.bgr) if (mask_builder is not None and self.bgr is not None) else None
+
+        self.levels = [self.level_at(s) for s in np.linspace(self.scale_range[0], self.scale_range[1], self.scale_steps)]
+        self.coarse_ok = False
+        if self.coarse_factor:
+            for lv in self.levels:
+                lv.coarse = self._coarse_level(lv)
+            self.coarse_ok = all(lv.coarse is not None for lv in self.levels)
+        self._fitted = {}  # (max_w, max_h) -> 縮到放得進小窗的原始灰階模板
+
+    def fitted(self, max_w, max_h):
+        """
+        放得進 max_w x max_h 小窗的原始灰階模板（模板較大時等比例以 INTER_AREA 縮小，不放大）
+        依小窗大小快取；圓環二次驗證的小窗通常固定大小，只在第一次呼叫時縮放
+        """
+        key = (int(max_w), int(max_h))
+        tmpl = self._fitted.get(key)
+        if tmpl is None:
+            scale = min(key[0] / max(1, self.width), key[1] / max(1, self.height), 1.0)
+            tmpl = self.gray
+            if scale < 1.0:
+                tmpl = cv2.resize(tmpl, (int(self.width*scale), int(self.height*scale)), interpolation=cv2.INTER_AREA)
+            tmpl = self._fitted[key] = tmpl
+        return tmpl
+
+    def level_at(self, s):
+        """任意尺度的 TemplateLevel（拋物線內插出的尺度也用這個現場產生）"""
+        w = max(1, int(round(self.width * s)))
+        h = max(1, int(round(self.height * s)))
+        return TemplateLevel(
+            float(s), w, h,
+            cv2.resize(self.color_gray, (w, h), interpolation=cv2.INTER_AREA),
+            cv2.resize(self.edge, (w, h), interpolation=cv2.INTER_NEAREST),
+            None if self.mask is None else cv2.resize(self.mask, (w, h), interpolation=cv2.INTER_NEAREST),
+            cv2.resize(self.gray, (w, h)),
+        )
+
+    def _coarse_level(self, lv):
+        f = self.coarse_factor
+        w = int(round(lv.w * f))
+        h = int(round(lv.h * f))
+        if min(w, h) < self.COARSE_MIN_SIZE:
+            return None
+        # 粗層邊緣由縮小後的灰階重新做 Canny，與搜尋影像粗層的做法一致
+        gray = cv2.resize(self.color_gray, (w, h), interpolation=cv2.INTER_AREA)
+        return TemplateLevel(
+            lv.scale, w, h, gray, cv2.Canny(gray, 50, 150),
+            None if self.mask is None else cv2.resize(self.mask, (w, h), interpolation=cv2.INTER_NEAREST),
+            cv2.resize(self.gray, (w, h), interpolation=cv2.INTER_AREA),
+        )
+
+    def matches(self, template_path, scale_range, scale_steps, coarse_factor=None):
+        """coarse_factor 為 None 表示不需要粗層，任何模板庫都可用"""
+        return (self.template_path == template_path
+                and self.scale_range == (float(scale_range[0]), float(scale_range[1]))
+                and self.scale_steps == int(scale_steps)
+                and (coarse_factor is None or self.coarse_factor == float(coarse_factor)))
+
+
+def scan_template_scales(bank, match, cfg, level_indices=None):
+    """
+    在模板庫的各尺度上比對，回傳 (grid, best)：
+    - grid：[(score, loc, level)] 在全解析度比對過的尺度，分數由高到低
+    - best：(score, loc, scale)；沒有任何結果時為 None
+    match(level, coarse, window)：在全解析度（coarse=False，window 為 (x, y, w, h) 或 None）
+    或粗層（coarse=True）影像上比對，回傳 (score, (x, y)) 或 None；座標為該層影像座標
+    MATCH_ENGINE 為 "fft" 時，match 對整張影像（window=None）的比對改用 FFT 批次相關
+
+    ICON_SEARCH_MODE:
+    - "dense"：每個尺度都做全解析度比對（原本做法）
+    - "coarse_to_fine"：先在縮小的粗層上比對所有尺度，只把前 ICON_REFINE_TOP_K 名
+      在原解析度的小窗內精修，再用相鄰尺度分數做拋物線內插求出更準的尺度
+      全解析度比對次數約為 top_k + 3，不再隨 ICON_SCALE_STEPS 線性增加
+    level_indices：只在這些尺度上做全解析度比對（追蹤模式的鎖定尺度 ±1），同樣做拋物線內插
+    """
+    levels = bank.levels
+    full = {}
+
+    def at(i, window=None):
+        if i not in full:
+            full[i] = match(levels[i], False, window)
+        return full[i]
+
+    coarse_mode = (level_indices is None
+                   and cfg.get("ICON_SEARCH_MODE", "coarse_to_fine") == "coarse_to_fine"
+                   and bank.coarse_ok and len(levels) >= 3)
+    f = bank.coarse_factor or 0.5
+    margin = int(math.ceil(1.0 / f)) + 2  # 粗層一個像素對應的原解析度誤差 + 餘裕
+    if not coarse_mode:
+        for i in (range(len(levels)) if level_indices is None else level_indices):
+            at(i)
+    else:
+        top_k = max(1, int(cfg.get("ICON_REFINE_TOP_K", 2)))
+
+        coarse = []
+        for i, lv in enumerate(levels):
+            r = match(lv.coarse, True, None)
+            if r is not None:
+                coarse.append((r[0], i, r[1]))
+        coarse.sort(key=lambda c: c[0], reverse=True)
+
+        for _, i, (cx, cy) in coarse[:top_k]:
+            lv = levels[i]
+            at(i, (int(cx / f) - margin, int(cy / f) - margin, lv.w + 2 * margin, lv.h + 2 * margin))
+
+    grid = [(r[0], r[1], levels[i]) for i, r in full.items() if r is not None]
+    if not grid:
+        return [], None
+    grid.sort(key=lambda g: g[0], reverse=True)
+    score, loc, lv = grid[0]
+    best = (score, loc, lv.scale)
+    if not coarse_mode and level_indices is None:
+        return grid, best
+
+    # 最佳尺度的左右鄰居，以同一個中心開窗精修
+    i = levels.index(lv)
+    center = (loc[0] + lv.w / 2.0, loc[1] + lv.h / 2.0)
+
+    def window_at(level):
+        return (int(center[0] - level.w / 2.0) - margin, int(center[1] - level.h / 2.0) - margin,
+                level.w + 2 * margin, level.h + 2 * margin)
+
+    for j in (i - 1, i + 1):
+        if 0 <= j < len(levels) and (level_indices is None or j in level_indices):
+            at(j, window_at(levels[j]))
+    grid = [(r[0], r[1], levels[k]) for k, r in full.items() if r is not None]
+    grid.sort(key=lambda g: g[0], reverse=True)
+
+    # 拋物線內插：y(-1), y(0), y(+1) 三點求頂點位置
+    left = full.get(i - 1) if i > 0 else None
+    right = full.get(i + 1) if i + 1 < len(levels) else None
+    if left is not None and right is not None and full.get(i) is not None and grid[0][2] is lv:
+        y_l, y_0, y_r = left[0], full[i][0], right[0]
+        denom = y_l - 2.0 * y_0 + y_r
+        if denom < 0:
+            offset = max(-0.5, min(0.5, 0.5 * (y_l - y_r) / denom))
+            if abs(offset) > 0.05:
+                step = levels[i + 1].scale - lv.scale
+                refined = bank.level_at(lv.scale + offset * step)
+                r = match(refined, False, window_at(refined))
+                if r is not None and r[0] > score:
+                    best = (r[0], r[1], refined.scale)
+    if grid[0][0] > best[0]:
+        best = (grid[0][0], grid[0][1], grid[0][2].scale)
+    return grid, best
+
+
+class StrategySelector:
+    """
+    偵測策略選擇器：記錄本次執行期間各方法的成功率與耗時（EMA），
+    依「每次成功的期望成本」= 平均耗時 / 成功率 決定嘗試順序
+    - tiers：[[名稱, ...], ...] 把方法分層（例如有比例 / 誤判驗證的方法在前、沒有驗證的備援在後）；
+      前面的層永遠先試，只在同一層內依期望成本排序，備援再便宜也不會排到驗證過的方法前面
+    - 只有「同一次呼叫中同一層有別的方法成功」時，先前失敗的方法才記為失敗：
+      全部失敗多半是目標不在畫面；只有下一層的備援成功也可能是誤判，都不影響成功率
+    - 在目前場景連續失敗 skip_after 次的方法暫時跳過，每 retry_every 次呼叫重試一次，場景改變時能恢復
+    - 從未執行過的方法依原本順序優先嘗試
+    """
+    MIN_RATE = 0.02
+
+    def __init__(self, names, label="", alpha=0.15, skip_after=8, retry_every=20, tiers=None):
+        self.names = list(names)
+        self.label = label
+        self.alpha = alpha
+        self.skip_after = skip_after
+        self.retry_every = retry_every
+        # 每個方法所在的層；沒有分層時全部同一層
+        self.tier = {n: 0 for n in self.names}
+        for i, group in enumerate(tiers or ()):
+            for n in group:
+                self.tier[n] = i
+        self.stats = {n: {"rate": 0.5, "cost": None, "fails": 0, "skipped": 0, "runs": 0} for n in self.names}
+
+    def expected_cost(self, name):
+        st = self.stats[name]
+        if st["cost"] is None:
+            return 0.0
+        return st["cost"] / max(self.MIN_RATE, st["rate"])
+
+    def order(self, enabled):
+        """回傳這次要依序嘗試的方法（已排除暫時跳過的方法；至少保留一個）"""
+        enabled = [n for n in self.names if n in enabled]
+        ranked = sorted(enabled, key=lambda n: (self.tier[n], self.expected_cost(n), self.names.index(n)))
+        active = []
+        for n in ranked:
+            st = self.stats[n]
+            if st["fails"] >= self.skip_after:
+                st["skipped"] += 1
+                if st["skipped"] < self.retry_every:
+                    continue
+                st["skipped"] = 0  # 到了重試時機，給它一次機會
+            active.append(n)
+        return active or ranked[:1]
+
+    def record(self, attempts):
+        """attempts：[(name, success, seconds)]，依實際執行順序"""
+        succeeded = {self.tier[name] for name, ok, _ in attempts if ok}
+        for name, ok, seconds in attempts:
+            st = self.stats[name]
+            st["runs"] += 1
+            st["cost"] = seconds if st["cost"] is None else (1 - self.alpha) * st["cost"] + self.alpha * seconds
+            if self.tier[name] not in succeeded:
+                continue
+            st["rate"] = (1 - self.alpha) * st["rate"] + self.alpha * (1.0 if ok else 0.0)
+            if ok:
+                if st["fails"] >= self.skip_after:
+                    print(f"[策略{self.label}] {name} 重新成功，恢復使用")
+                st["fails"] = 0
+            else:
+                st["fails"] += 1
+                if st["fails"] == self.skip_after:
+                    print(f"[策略{self.label}] {name} 在目前場景連續失敗 {st['fails']} 次，暫時跳過")
+
+    def summary(self):
+        parts = []
+        for n in self.names:
+            st = self.stats[n]
+            cost = "-" if st["cost"] is None else f"{st['cost'] * 1000:.1f}ms"
+            parts.append(f"{n}: 成功率={st['rate']:.2f} 耗時={cost} 次數={st['runs']}")
+        return "；".join(parts)
+
+    @staticmethod
+    def from_cfg(names, cfg, label="", tiers=None):
+        return StrategySelector(names, label,
+                                skip_after=int(cfg.get("STRATEGY_SKIP_AFTER_FAILS", 8)),
+                                retry_every=int(cfg.get("STRATEGY_RETRY_INTERVAL", 20)),
+                                tiers=tiers)
+
+
+def run_strategies(selector, methods, cfg):
+    """
+    依選擇器決定的順序執行 methods（{name: callable -> (result, ok)}），第一個成功就停
+    STRATEGY_ADAPTIVE 關閉時照 methods 原本順序；回傳成功方法的 result，全部失敗回傳 None
+    """
+    if cfg.get("STRATEGY_ADAPTIVE", True):
+        order = selector.order(methods.keys())
+    else:
+        order = list(methods.keys())
+    attempts = []
+    found = None
+    for name in order:
+        t0 = time.perf_counter()
+        result, ok = methods[name]()
+        attempts.append((name, ok, time.perf_counter() - t0))
+        if ok:
+            found = result
+            break
+    selector.record(attempts)
+    return found
+
+
+class CharacterTracker:
+    """
+    人物中心的等速 Kalman 追蹤器（x、y 兩軸各自獨立，共用同一個 2x2 共變異數）
+    - predict(t)：預測 t 時刻的中心與位置標準差（像素），不改變狀態
+    - update(x, y, t)：以量測到的中心修正狀態；第一次呼叫時初始化
+    標準差隨時間與速度不確定性成長，超過門檻時由呼叫端改做完整偵測
+    """
+    ACCEL_NOISE = 2000.0   # 加速度白雜訊強度（px²/s³）：角色起停、轉向
+    MEAS_STD = 2.0         # 量測誤差（像素）
+    INIT_VEL_STD = 150.0   # 初始化時的速度不確定性（px/s）
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.t = None
+        self.pos = None   # [x, y]
+        self.vel = None   # [vx, vy]
+        self.P = None     # [[p00, p01], [p01, p11]]
+
+    @property
+    def initialized(self):
+        return self.t is not None
+
+    def _propagate(self, dt):
+        (p00, p01), (_, p11) = self.P
+        q = self.ACCEL_NOISE
+        return [[p00 + 2*dt*p01 + dt*dt*p11 + q*dt**3/3, p01 + dt*p11 + q*dt*dt/2],
+                [0.0, p11 + q*dt]]
+
+    def predict(self, t):
+        """回傳 (x, y, 位置標準差)；尚未初始化回傳 None"""
+        if not self.initialized:
+            return None
+        dt = max(0.0, t - self.t)
+        P = self._propagate(dt)
+        return (self.pos[0] + self.vel[0]*dt, self.pos[1] + self.vel[1]*dt, math.sqrt(P[0][0]))
+
+    def update(self, x, y, t):
+        r = self.MEAS_STD ** 2
+        if not self.initialized:
+            self.t = t
+            self.pos = [float(x), float(y)]
+            self.vel = [0.0, 0.0]
+            self.P = [[r, 0.0], [0.0, self.INIT_VEL_STD ** 2]]
+            return
+        dt = max(0.0, t - self.t)
+        (p00, p01), (_, p11) = self._propagate(dt)
+        s = p00 + r
+        k0, k1 = p00 / s, p01 / s
+        for i, z in enumerate((x, y)):
+            pred = self.pos[i] + self.vel[i]*dt
+            innov = z - pred
+            self.pos[i] = pred + k0*innov
+            self.vel[i] += k1*innov
+        self.P = [[(1 - k0)*p00, (1 - k0)*p01], [0.0, p11 - k1*p01]]
+        self.t = t
+
+
+class MotionEstimator:
+    """
+    拖曳中的人物位移量測：人物框內的角點以金字塔 Lucas-Kanade 光流追到下一張影格
+    - 只處理人物中心附近的小窗（人物框 + margin），每張影格數毫秒
+    - 前後向追蹤誤差過大的點丟棄，取剩餘點位移的中位數作為人物位移
+    - 每次 update 後在新位置重新取角點，不累積失效的點
+    update() 回傳該影格的位移 (dx, dy)；追蹤失敗回傳 None（呼叫端視為「不知道」，不是「沒動」）
+    """
+    MAX_POINTS = 40
+    MIN_POINTS = 6
+    FB_MAX_ERR = 1.0   # 前後向追蹤誤差上限（像素）
+    LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                     criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+    def __init__(self, frame_source, bounds, box_size, margin=40, stall_speed=20.0, alpha=0.4):
+        self.frame_source = frame_source
+        self.bounds = tuple(map(int, bounds))
+        self.box_w, self.box_h = (max(8, int(v)) for v in box_size)
+        self.margin = int(margin)
+        self.stall_speed = float(stall_speed)
+        self.alpha = alpha
+        self.center = None
+        self.origin = None
+        self.velocity = (0.0, 0.0)   # EMA（px/s）
+        self.still_since = None      # 速度低於 stall_speed 的起始時間
+        self.t = None
+        self._prev = None            # (視窗, 灰階 copy, 角點)
+
+    @property
+    def displacement(self):
+        """從 start() 以來的總位移"""
+        return (self.center[0] - self.origin[0], self.center[1] - self.origin[1])
+
+    @property
+    def speed(self):
+        return math.hypot(*self.velocity)
+
+    def still_for(self, t=None):
+        """速度持續低於 stall_speed 的秒數"""
+        if self.still_since is None:
+            return 0.0
+        return (self.t if t is None else t) - self.still_since
+
+    def _window(self, center):
+        bx, by, bw, bh = self.bounds
+        hw = self.box_w // 2 + self.margin
+        hh = self.box_h // 2 + self.margin
+        x0 = max(bx, int(center[0]) - hw)
+        y0 = max(by, int(center[1]) - hh)
+        x1 = min(bx + bw, int(center[0]) + hw)
+        y1 = min(by + bh, int(center[1]) + hh)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def _frame(self, region, frame):
+        if frame is None:
+            frame = self.frame_source.latest()
+        return self.frame_source.frame_for(region, frame)
+
+    def _seed(self, center, frame):
+        """在 center 的小窗內取人物框的角點，作為下一次 update 的起點"""
+        self._prev = None
+        region = self._window(center)
+        if region is None:
+            return False
+        frame, region = self._frame(region, frame)
+        gray = frame.context.gray(region)
+        if gray is None or gray.size == 0:
+            return False
+        mask = np.zeros(gray.shape, np.uint8)
+        x0 = int(center[0] - region[0]) - self.box_w // 2
+        y0 = int(center[1] - region[1]) - self.box_h // 2
+        mask[max(0, y0):max(0, y0 + self.box_h), max(0, x0):max(0, x0 + self.box_w)] = 255
+        pts = cv2.goodFeaturesToTrack(gray, self.MAX_POINTS, 0.01, 4, mask=mask)
+        if pts is None or len(pts) < self.MIN_POINTS:
+            return False
+        # 影格緩衝會被下一次擷取覆寫，小窗灰階要自己留一份
+        self._prev = (region, gray.copy(), pts)
+        return True
+
+    def start(self, center, frame=None):
+        """以 center（通常是剛偵測到的人物中心）為新的原點開始量測；成功取到角點回傳 True"""
+        self.center = self.origin = (float(center[0]), float(center[1]))
+        self.velocity = (0.0, 0.0)
+        self.still_since = None
+        self.t = frame.timestamp if frame is not None else time.time()
+        return self._seed(self.center, frame)
+
+    def resync(self, center, frame=None):
+        """以新的偵測結果校正目前位置（保留原點與速度），避免光流誤差累積"""
+        self.center = (float(center[0]), float(center[1]))
+        return self._seed(self.center, frame)
+
+    def update(self, frame=None):
+        if self._prev is None:
+            # 上次取不到角點（例如人物被遮住）：這張影格重新取點，下一張才有位移
+            if self.center is not None:
+                self._seed(self.center, frame)
+            return None
+        region, prev_gray, p0 = self._prev
+        try:
+            frame, region_now = self._frame(region, frame)
+            if region_now != region:
+                return None
+            gray = frame.context.gray(region)
+            p1, st, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **self.LK_PARAMS)
+            p0r, st_r, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **self.LK_PARAMS)
+        except Exception as e:
+            print(f"[光流] 追蹤失敗: {e}")
+            self._prev = None
+            return None
+        fb_err = np.abs(p0 - p0r).reshape(-1, 2).max(axis=1)
+        good = (st.ravel() == 1) & (st_r.ravel() == 1) & (fb_err < self.FB_MAX_ERR)
+        if good.sum() < self.MIN_POINTS:
+            self._seed(self.center, frame)
+            return None
+
+        d = np.median((p1 - p0).reshape(-1, 2)[good], axis=0)
+        dx, dy = float(d[0]), float(d[1])
+        t = frame.timestamp
+        dt = t - self.t
+        if dt > 1e-3:
+            a = self.alpha
+            self.velocity = ((1 - a) * self.velocity[0] + a * dx / dt,
+                             (1 - a) * self.velocity[1] + a * dy / dt)
+        self.t = t
+        self.center = (self.center[0] + dx, self.center[1] + dy)
+        if self.speed < self.stall_speed:
+            if self.still_since is None:
+                self.still_since = t
+        else:
+            self.still_since = None
+        self._seed(self.center, frame)
+        return dx, dy
+
+
+class ArrowPresenceProbe:
+    """
+    箭頭存在探針的遲滯判斷：以搜尋環內紅色像素數決定箭頭在不在
+    - 門檻由完整流程的結果校正：記錄「找到箭頭」與「沒找到」時紅色像素數的 EMA，
+      開門檻取兩者之間 60%、關門檻取 30%；校正前兩個門檻都用 min_pixels
+    - 遲滯：已在時低於關門檻才判為消失，已消失時高於開門檻才判為出現，避免呼吸式箭頭在門檻附近來回跳
+    """
+    ON_FRACTION = 0.6
+    OFF_FRACTION = 0.3
+
+    def __init__(self, min_pixels=40, alpha=0.3):
+        self.min_pixels = min_pixels
+        self.alpha = alpha
+        self.present = True
+        self.level_found = None    # 找到箭頭時的紅色像素數 EMA
+        self.level_missing = None  # 沒找到時的紅色像素數 EMA
+        self.last_count = None
+
+    def thresholds(self):
+        """回傳 (開門檻, 關門檻)"""
+        if self.level_found is None:
+            return self.min_pixels, self.min_pixels
+        base = self.level_missing or 0.0
+        gap = max(0.0, self.level_found - base)
+        on = max(self.min_pixels, base + self.ON_FRACTION * gap)
+        off = max(self.min_pixels * 0.5, base + self.OFF_FRACTION * gap)
+        return on, min(on, off)
+
+    def observe(self, count):
+        self.last_count = count
+        on, off = self.thresholds()
+        if self.present:
+            self.present = count >= off
+        else:
+            self.present = count >= on
+        return self.present
+
+    def calibrate(self, count, found):
+        """以完整流程在同一張影格的結果校正門檻"""
+        if count is None:
+            return
+        a = self.alpha
+        if found:
+            self.level_found = count if self.level_found is None else (1 - a) * self.level_found + a * count
+            self.present = True
+        else:
+            self.level_missing = count if self.level_missing is None else (1 - a) * self.level_missing + a * count
+
+
+class BreathingPhase:
+    """
+    箭頭呼吸相位估計：週期已知（ARROW_BREATHING_CYCLE），以最近幾個週期的紅色像素數做一次諧波最小平方擬合
+        count(t) ≈ a + b·cos(ωt) + c·sin(ωt) = a + A·cos(ωt − φ)
+    取樣間隔不均（例如鎖定後只在亮相位取樣）也不會偏；φ 即亮峰相位
+    - 樣本橫跨至少一個週期、且調變深度 A / a 夠大才算鎖定；沒有呼吸（或箭頭不在）時自然不鎖定
+    - 最後一個樣本太舊（超過 HISTORY_CYCLES 個週期）也視為失鎖，避免週期設定與實際的微小誤差累積
+    """
+    MIN_SAMPLES = 8
+    MIN_DEPTH = 0.25       # 鎖定所需的調變深度 A / a
+    HISTORY_CYCLES = 3     # 擬合使用的歷史長度（週期數）
+
+    def __init__(self, period=1.0, bright_fraction=0.5):
+        self.period = float(period)
+        self.bright_fraction = float(bright_fraction)
+        self.samples = []      # [(時間戳, 紅色像素數)]
+        self.t_ref = None
+        self.phi = None        # 亮峰相位；None 表示未鎖定
+        self.depth = 0.0
+
+    def reset(self):
+        self.samples = []
+        self.phi = None
+        self.depth = 0.0
+
+    def observe(self, t, count):
+        """加入一個樣本並重新擬合；同一張影格（相同時間戳）只記一次"""
+        if count is None or self.period <= 0:
+            return
+        if self.samples and t <= self.samples[-1][0]:
+            return
+        self.samples.append((t, float(count)))
+        horizon = t - self.HISTORY_CYCLES * self.period
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.pop(0)
+        self._fit()
+
+    def _fit(self):
+        self.phi = None
+        if len(self.samples) < self.MIN_SAMPLES:
+            return
+        t, c = np.array(self.samples, dtype=np.float64).T
+        if t[-1] - t[0] < self.period:
+            return
+        # 以最後一個樣本為時間原點，避免大時間戳乘上 ω 後失去精度
+        th = (2 * math.pi / self.period) * (t - t[-1])
+        A = np.column_stack((np.ones_like(th), np.cos(th), np.sin(th)))
+        (a, b, s), *_ = np.linalg.lstsq(A, c, rcond=None)
+        if a < 1.0:
+            return
+        self.depth = math.hypot(b, s) / a
+        if self.depth < self.MIN_DEPTH:
+            return
+        self.t_ref = t[-1]
+        self.phi = math.atan2(s, b)
+
+    def locked(self, now):
+        return self.phi is not None and now - self.samples[-1][0] <= self.HISTORY_CYCLES * self.period
+
+    def phase(self, now):
+        """距離亮峰的相位（弧度，-π ~ π）；未鎖定回傳 None"""
+        if not self.locked(now):
+            return None
+        th = (2 * math.pi / self.period) * (now - self.t_ref) - self.phi
+        return (th + math.pi) % (2 * math.pi) - math.pi
+
+    def wait_time(self, now):
+        """距離下一個亮相位開始還要等幾秒；已在亮相位或未鎖定回傳 0"""
+        th = self.phase(now)
+        if th is None:
+            return 0.0
+        half = math.pi * self.bright_fraction
+        if abs(th) <= half:
+            return 0.0
+        return ((-half - th) % (2 * math.pi)) * self.period / (2 * math.pi)
+
+
+class PerceptionEstimate:
+    """
+    感知執行緒發布的估計（發布後不再修改，讀取端不必加鎖）
+    seq：發布序號；timestamp：影格時間戳；center：人物中心；present：探針判斷箭頭在不在
+    angle / std：最近 samples 個角度樣本的環形均值與標準差；hits：累計角度樣本數；last_hit：最後一次取到角度的影格時間戳
+    """
+
+    def __init__(self, seq, timestamp, center, present, angle=None, std=None, hits=0, last_hit=None, samples=0):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.center = center
+        self.present = present
+        self.angle = angle
+        self.std = std
+        self.hits = hits
+        self.last_hit = last_hit
+        self.samples = samples
+
+
+class DragPerception(threading.Thread):
+    """
+    拖曳中的感知執行緒：滑鼠按住期間（動態拖曳與固定拖曳都是）持續處理最新影格，隨時發布最新估計（PerceptionEstimate）
+    放開時的最後一個估計交給導航迴圈，夠新的話下一次拖曳直接從它的角度開始，不必再取樣
+    - 每張影格：光流更新人物位置 → 探針 → 箭頭還在時取一個角度樣本（最近 ANGLE_WINDOW 個樣本做環形統計）
+    - 每 resync_interval 秒以 character_center 完整校正一次人物位置，光流誤差不累積
+    控制迴圈只讀 latest()，偵測慢時估計較舊，但控制本身不會被拖慢
+    拖曳期間只有這個執行緒做擷取與偵測，影格緩衝與 BufferPool 不會被兩個執行緒同時使用
+    """
+    ANGLE_WINDOW = 5
+
+    def __init__(self, detector, cfg, center, motion=None, resync_interval=0.15):
+        super().__init__(name="DragPerception", daemon=True)
+        self.detector = detector
+        self.cfg = cfg
+        self.center = (float(center[0]), float(center[1]))
+        self.motion = motion
+        self.resync_interval = resync_interval
+        self.angles = CircularAccumulator(window=self.ANGLE_WINDOW)
+        self.hits = 0
+        self.last_hit = None
+        self._seq = 0
+        self._last_resync = time.time()
+        self._estimate = None
+        self._lock = threading.Lock()
+        self._stop_ev = threading.Event()
+
+    def stop(self):
+        self._stop_ev.set()
+
+    def latest(self):
+        """最新估計（不阻塞）；還沒處理完第一張影格時回傳 None"""
+        with self._lock:
+            return self._estimate
+
+    def run(self):
+        source = self.detector.frame_source
+        last_ts = 0.0
+        while not self._stop_ev.is_set():
+            t = time.time()
+            try:
+                if source.streaming:
+                    frame = source.next_frame(last_ts, timeout=0.1)
+                    if frame is None:
+                        continue
+                else:
+                    frame = source.grab()
+                last_ts = frame.timestamp
+                self._step(frame)
+            except Exception as e:
+                print(f"[拖曳感知] 影格處理異常: {e}")
+            if not source.streaming:
+                self._stop_ev.wait(max(0.0, self.detector.poll - (time.time() - t)))
+
+    def _step(self, frame):
+        det, cfg, motion = self.detector, self.cfg, self.motion
+        if motion is not None:
+            try:
+                motion.update(frame)
+            except Exception as e:
+                print(f"[光流] 量測異常: {e}")
+            if motion.center is not None:
+                self.center = motion.center
+
+        if frame.timestamp - self._last_resync >= self.resync_interval:
+            self._last_resync = frame.timestamp
+            try:
+                center = det.character_center(cfg, frame=frame)
+            except Exception as e:
+                print(f"[警告] 拖曳中人物偵測異常: {e}")
+                center = None
+            if center is not None:
+                self.center = (float(center[0]), float(center[1]))
+                if motion is not None:
+                    motion.resync(center, frame)
+
+        cx, cy = self.center
+        present = det.arrow_present(cx, cy, cfg, frame=frame)
+        if present:
+            _, _, ang = det.find_arrow_by_color(cx, cy, frame=frame)
+            if ang is not None:
+                self.angles.add(ang)
+                self.hits += 1
+                self.last_hit = frame.timestamp
+            # 探針剛才量的就是這張影格，以完整流程的結果校正門檻
+            if cfg.get("ARROW_PROBE_ENABLED", True):
+                det.probe.calibrate(det.probe.last_count, ang is not None)
+
+        mean, _, std = self.angles.stats()
+        self._seq += 1
+        estimate = PerceptionEstimate(self._seq, frame.timestamp, self.center, present,
+                                      mean, std, self.hits, self.last_hit, len(self.angles))
+        with self._lock:
+            self._estimate = estimate
+
+
+class DragController:
+    """
+    動態拖曳控制器：以固定頻率（DRAG_CONTROL_HZ）執行的狀態機 IDLE → PRESS → STEER → RELEASE
+    - IDLE：游標移到人物中心
+    - PRESS：按下滑鼠、游標快速丟到方向射線上的目標點、啟動光流與感知執行緒
+    - STEER：每個 tick 讀最新估計（不等待偵測），判斷到達/卡住/超過、箭頭持續消失、方向持續改變；
+      角度小幅偏差時更新目標點，游標以時間常數 DRAG_STEER_SMOOTH 平滑移向目標點
+    - RELEASE：放開滑鼠、停止感知執行緒
+    轉向延遲只取決於控制頻率與估計的新舊，與單次偵測耗時無關
+    steer=False：固定拖曳（目標點不變、不做方向判斷、沒有最短拖曳時間），只在到達/卡住/超過或箭頭持續消失時提早放開；
+      箭頭消失時間從感知執行緒第一次看到箭頭後才開始算
+    run() 回傳放開時的最新估計（感知執行緒沒處理完任何影格時為 None）
+    """
+    IDLE, PRESS, STEER, RELEASE = "IDLE", "PRESS", "STEER", "RELEASE"
+    STEER_DEADBAND = 8.0   # 角度偏差小於此值（度）不修正目標點
+
+    def __init__(self, detector, cfg, log_fn=None, steer=True):
+        self.detector = detector
+        self.cfg = cfg
+        self.log_fn = log_fn
+        self.steer = steer
+        self.label = "[動態拖曳]" if steer else "[固定拖曳]"
+        self.rate = max(10.0, float(cfg.get("DRAG_CONTROL_HZ", 60)))
+        self.smooth = max(0.0, float(cfg.get("DRAG_STEER_SMOOTH", 0.08)))
+        self.check_interval = float(cfg.get("DRAG_FEEDBACK_INTERVAL", 0.15))
+        self.angle_tolerance = float(cfg.get("DRAG_ANGLE_TOLERANCE", 25.0))
+        self.min_drag_time = float(cfg.get("DRAG_MIN_TIME", 0.3)) if steer else 0.0
+        self.miss_tolerance_time = float(cfg.get("ARROW_MISS_TOLERANCE_TIME", 0.5))
+        self.direction_change_threshold = int(cfg.get("DIRECTION_CHANGE_THRESHOLD", 3))
+        self.state = self.IDLE
+
+    def _log(self, msg):
+        if self.log_fn:
+            self.log_fn(msg)
+
+    def _target(self, cx, cy, angle_deg):
+        """人物中心沿角度方向 drag_distance 處（夾在螢幕內）"""
+        rad = math.radians(angle_deg)
+        tx = cx + self.detector.drag_distance * math.sin(rad)
+        ty = cy - self.detector.drag_distance * math.cos(rad)
+        return max(0, min(self.sw - 1, tx)), max(0, min(self.sh - 1, ty))
+
+    def run(self, cx, cy, angle_deg, max_hold_seconds):
+        self.sw, self.sh = pyautogui.size()
+        self.center = (int(round(cx)), int(round(cy)))
+        self.angle = angle_deg              # 目前目標點的基準角度（修正後更新）
+        self.max_hold = max_hold_seconds
+        self.goal = self._target(cx, cy, angle_deg)
+        self.cursor = None
+        self.motion = None
+        self.perception = None
+        self.t_start = None
+        self.last_check = 0.0
+        self.seen_hits = 0
+        self.missing = False
+        self.corrections = 0
+        self.direction_changes = 0
+        self.state = self.IDLE
+
+        if self.steer:
+            self._log(f"[動態拖曳] 開始：角度{angle_deg:.1f}°，最長{max_hold_seconds:.2f}s，控制頻率{self.rate:.0f}Hz")
+        period = 1.0 / self.rate
+        next_tick = time.time()
+        try:
+            while self.state != self.RELEASE:
+                getattr(self, "_tick_" + self.state.lower())(time.time())
+                next_tick += period
+                wait = next_tick - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    next_tick = time.time()   # 落後時不追趕，從現在重新計時
+        finally:
+            self._release()
+        return self.perception.latest() if self.perception is not None else None
+
+    def _tick_idle(self, now):
+        pyautogui.moveTo(*self.center, _pause=False)
+        self.state = self.PRESS
+
+    def _tick_press(self, now):
+        det = self.detector
+        pyautogui.mouseDown(button=det.drag_button, _pause=False)
+        tx, ty = int(round(self.goal[0])), int(round(self.goal[1]))
+        pyautogui.moveTo(tx, ty, duration=min(det.drag_seconds, 0.05), _pause=False)
+        self.cursor = (float(tx), float(ty))
+        self.t_start = self.last_check = time.time()
+        # 光流在這裡取第一張影格，之後只由感知執行緒更新
+        self.motion = det._start_motion(self.cfg, *self.center)
+        self.perception = DragPerception(det, self.cfg, self.center, self.motion, resync_interval=self.check_interval)
+        self.perception.start()
+        self.state = self.STEER
+
+    def _tick_steer(self, now):
+        elapsed = now - self.t_start
+        if elapsed >= self.max_hold:
+            if self.steer:
+                self._log(f"[動態拖曳] 達到最長時間{self.max_hold:.2f}s，結束")
+            self.state = self.RELEASE
+            return
+        if elapsed >= self.min_drag_time:
+            if self.motion is not None:
+                reason = self.detector._motion_verdict(self.motion, self.goal[0], self.goal[1], self.cfg)
+                if reason:
+                    self._log(f"{self.label} {reason}，結束拖曳（已拖{elapsed:.2f}s）")
+                    self.state = self.RELEASE
+                    return
+            estimate = self.perception.latest()
+            if estimate is not None and (self._check_missing(estimate, elapsed) or
+                                         (self.steer and self._check_direction(estimate, now, elapsed))):
+                self.state = self.RELEASE
+                return
+        if self.steer:
+            self._move_cursor()
+
+    def _check_missing(self, estimate, elapsed):
+        """呼吸式箭頭：以感知執行緒的影格時間計算消失多久，短暫消失不中斷；回傳 True 表示該放開"""
+        if estimate.last_hit is None and not self.steer:
+            # 固定拖曳沒有最短拖曳時間：開頭幾張影格可能正落在呼吸暗相，
+            # 感知執行緒還沒看過箭頭前不開始計算消失時間，至多保持到 hold_seconds
+            return False
+        since = max(estimate.last_hit or 0.0, self.t_start + self.min_drag_time)
+        miss_duration = estimate.timestamp - since
+        if estimate.last_hit is not None and estimate.last_hit >= estimate.timestamp:
+            if self.missing:
+                self._log(f"{self.label} 箭頭恢復檢測，繼續拖曳")
+            self.missing = False
+            return False
+        if miss_duration <= 0:
+            return False
+        if miss_duration >= self.miss_tolerance_time:
+            self._log(f"{self.label} 箭頭持續消失{miss_duration:.2f}s，可能已到達目標，結束拖曳（已拖{elapsed:.2f}s）")
+            return True
+        if not self.missing:
+            self._log(f"{self.label} 箭頭暫時消失，等待呼吸式恢復...")
+            self.missing = True
+        return False
+
+    def _check_direction(self, estimate, now, elapsed):
+        """每 check_interval 以新的角度樣本判斷方向；持續偏差則放開，小幅偏差則更新目標點"""
+        if now - self.last_check < self.check_interval or estimate.hits <= self.seen_hits or estimate.angle is None:
+            return False
+        self.last_check = now
+        self.seen_hits = estimate.hits
+        angle_diff = self.detector._angle_diff(self.angle, estimate.angle)
+        if angle_diff > self.angle_tolerance:
+            self.direction_changes += 1
+            # 需要多次確認才停止（避免呼吸式閃爍造成的誤判）
+            if self.direction_changes >= self.direction_change_threshold:
+                self._log(f"[動態拖曳] 方向持續改變{self.direction_changes}次，"
+                          f"最終偏差{angle_diff:.1f}°>容忍{self.angle_tolerance}°，確認方向錯誤，停止拖曳（已拖{elapsed:.2f}s）")
+                return True
+            self._log(f"[動態拖曳] 檢測到方向改變{angle_diff:.1f}°（第{self.direction_changes}/{self.direction_change_threshold}次），繼續確認...")
+            return False
+        self.direction_changes = 0
+        if angle_diff > self.STEER_DEADBAND:
+            self.goal = self._target(estimate.center[0], estimate.center[1], estimate.angle)
+            self.corrections += 1
+            self._log(f"[動態拖曳] 微調方向：{self.angle:.1f}°→{estimate.angle:.1f}° (第{self.corrections}次)")
+            self.angle = estimate.angle
+        return False
+
+    def _move_cursor(self):
+        """游標以一階平滑移向目標點；整數座標沒變就不送事件"""
+        a = 1.0 if self.smooth <= 0 else 1.0 - math.exp(-1.0 / (self.rate * self.smooth))
+        x = self.cursor[0] + a * (self.goal[0] - self.cursor[0])
+        y = self.cursor[1] + a * (self.goal[1] - self.cursor[1])
+        if (int(round(x)), int(round(y))) != (int(round(self.cursor[0])), int(round(self.cursor[1]))):
+            pyautogui.moveTo(int(round(x)), int(round(y)), _pause=False)
+        self.cursor = (x, y)
+
+    def _release(self):
+        """放開滑鼠並停止感知執行緒（任何狀態離開都會經過這裡）"""
+        if self.perception is not None:
+            self.perception.stop()
+        if self.state != self.IDLE:
+            try:
+                pyautogui.mouseUp(button=self.detector.drag_button)
+            except Exception as e:
+                print(f"[警告] 滑鼠釋放失敗: {e}")
+                # 嘗試強制釋放滑鼠
+                try:
+                    pyautogui.mouseUp()
+                except Exception as e2:
+                    print(f"[錯誤] 強制滑鼠釋放也失敗: {e2}")
+        self.state = self.RELEASE
+        if self.perception is not None:
+            # 等感知執行緒處理完手上的影格（它已收到停止信號，最多再跑一次 _step）；
+            # 影格有租借、BufferPool 每執行緒一份，逾時不等也不會覆寫別人的資料，只是探針校正可能晚一拍
+            period = max(1.0 / max(1, self.cfg.get("CAPTURE_STREAM_FPS", 30)), self.detector.poll)
+            self.perception.join(timeout=2 * period)
+            if self.perception.is_alive():
+                print(f"[警告] 拖曳感知執行緒 {2 * period:.2f}s 內未結束（仍在處理影格），不再等待")
+        if self.steer and self.t_start is not None:
+            self._log(f"[動態拖曳] 完成：實際拖曳{time.time() - self.t_start:.2f}s，微調{self.corrections}次，方向改變確認{self.direction_changes}次")
+
+
 class ImageDetector:
-    def __init__(self, template_path, search_region, confidence=0.8, scale_steps=7, scale_range=(0.8,1.2)):
+    def __init__(self, template_path, search_region, confidence=0.8, scale_steps=7, scale_range=(0.8,1.2),
+                 frame_source=None, coarse_factor=None):
         self.template_path = template_path
         self.search_region = tuple(search_region)
         self.confidence = confidence
         self.scale_steps = scale_steps
         self.scale_range = scale_range
+        # 共用影格來源（同一 tick 的偵測從同一張截圖裁切）
+        self.frame_source = frame_source or FrameSource()
+
+        # 模板庫（各尺度灰階/邊緣/遮罩，及由粗到細的粗層）只在這裡建一次
+        self.bank = TemplateBank(template_path, scale_range, scale_steps, self.build_icon_masks, coarse_factor)
+        self.template_img = self.bank.gray
+        self.template_width, self.template_height = self.bank.width, self.bank.height
+        # 上一次命中的 (左上角, 尺度)；之後先在其附近小範圍追蹤，miss 才全區搜尋
+        self.last_hit = None
+        # 增強 / 傳統方法的策略統計（追蹤 ROI 與全區的成本差很多，分開記錄）
+        self.strategies = {}
+        # 模板本身（尺度 1）的白色 / 青藍像素數，負向預篩的門檻基準
+        self.icon_color_counts = None
+        if self.bank.bgr is not None:
+            white, cyan = self.icon_color_masks(cv2.cvtColor(self.bank.bgr, cv2.COLOR_BGR2HSV))
+            self.icon_color_counts = (cv2.countNonZero(white), cv2.countNonZero(cyan))
+
+    def template_bank(self, scale_range=None, scale_steps=None, cfg=None):
+        """取得模板庫；模板路徑、尺度設定或粗層比例改變時才重建"""
+        scale_range = self.scale_range if scale_range is None else scale_range
+        scale_steps = self.scale_steps if scale_steps is None else scale_steps
+        coarse_factor = None
+        if cfg is not None and cfg.get("ICON_SEARCH_MODE", "coarse_to_fine") == "coarse_to_fine":
+            coarse_factor = cfg.get("ICON_COARSE_FACTOR", 0.5)
+        if not self.bank.matches(self.template_path, scale_range, scale_steps, coarse_factor):
+            if coarse_factor is None:
+                coarse_factor = self.bank.coarse_factor
+            self.bank = TemplateBank(self.template_path, scale_range, scale_steps, self.build_icon_masks, coarse_factor)
+        return self.bank
+
+    @staticmethod
+    def _window(images, window):
+        """把 images 裁成 window（夾在影像內），回傳 (裁切後 images, 左上角偏移)"""
+        if window is None:
+            return images, (0, 0)
+        H, W = images[0].shape[:2]
+        x, y, w, h = window
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(W, x + w), min(H, y + h)
+        return [img[y0:y1, x0:x1] for img in images], (x0, y0)
+
+    @staticmethod
+    def icon_color_masks(hsv, pooled=False):
+        """
+        圖標特徵色分類：回傳 (white, cyan) 兩張 8U 遮罩
+        build_icon_masks 與負向預篩共用；pooled=True 時寫進共用緩衝（搜尋區每個 tick 都要算）
+        """
+        shape = hsv.shape[:2]
+        buf = (lambda name: _buffers.get(name, shape)) if pooled else (lambda name: None)
 
-        self.template_img = cv2.imread(template_path, 0)
-        if self.template_img is None:
-            raise ValueError(f"無法載入圖片: {template_path}")
-        self.template_width, self.template_height = self.template_img.shape[::-1]
+        # 白色（對話框氣泡）
+        white = cv2.inRange(hsv, (0, 0, 200), (179, 40, 255), dst=buf("icon_white"))
+
+        # 青藍（圖示底座與無線電波）
+        cyan1 = cv2.inRange(hsv, (85, 60, 120), (105, 255, 255), dst=buf("icon_cyan1"))   # H 近似藍綠
+        cyan2 = cv2.inRange(hsv, (100, 40, 120), (125, 255, 255), dst=buf("icon_cyan2"))  # 擴一點上界
+        cyan = cv2.bitwise_or(cyan1, cyan2, dst=cyan1 if pooled else None)
+        return white, cyan
 
     def build_icon_masks(self, tmpl_bgr):
         """從模板自動產生 mask：保留白色對話框 + 青藍光圈；排除紅色驚嘆號"""
         tmpl_hsv = cv2.cvtColor(tmpl_bgr, cv2.COLOR_BGR2HSV)
-
-        # 白色（對話框氣泡）
-        white = cv2.inRange(tmpl_hsv, (0, 0, 200), (179, 40, 255))
-
-        # 青藍（圖示底座與無線電波）
-        cyan1 = cv2.inRange(tmpl_hsv, (85, 60, 120), (105, 255, 255))   # H 近似藍綠
-        cyan2 = cv2.inRange(tmpl_hsv, (100, 40, 120), (125, 255, 255))  # 擴一點上界
-        cyan = cv2.bitwise_or(cyan1, cyan2)
+        white, cyan = self.icon_color_masks(tmpl_hsv)
 
         # 排除紅色（右上驚嘆號）
         red1 = cv2.inRange(tmpl_hsv, (0, 80, 80), (10, 255, 255))
@@ -1423,93 +2754,91 @@ class ImageDetector:
 
         return keep  # 單通道 8U，0=忽略，>0=納入比對
 
-    def find_icon_enhanced(self, cfg=None, scale_range=None, scale_steps=None):
+    def find_icon_enhanced(self, cfg=None, scale_range=None, scale_steps=None, frame=None,
+                           search_region=None, level_indices=None):
         """
         增強版圖標檢測：使用智能遮罩 + 多重比對融合
+        frame：共用影格（None 時自行擷取搜尋區）
+        search_region / level_indices：追蹤模式的小範圍 ROI 與鎖定尺度（None 為全區、全部尺度）
         回傳：(top_left_xy_global, best_scale, score) 或 (None, None, None)
         """
         if cfg is None:
             cfg = DEFAULT_CFG
-            
-        if scale_range is None:
-            scale_range = self.scale_range
-        if scale_steps is None:
-            scale_steps = self.scale_steps
+
+        bank = self.template_bank(scale_range, scale_steps, cfg)
             
         # 從配置獲取參數
         alpha = cfg.get("ICON_MASK_ALPHA", 0.5)
         conf = cfg.get("ICON_ENHANCED_CONFIDENCE", 0.84)
         ratio_thresh = cfg.get("ICON_RATIO_THRESHOLD", 1.12)
             
-        rx, ry, rw, rh = map(int, self.search_region)
+        rx, ry, rw, rh = map(int, search_region or self.search_region)
 
         try:
-            # 擷取搜尋區
-            shot = pyautogui.screenshot(region=(rx, ry, rw, rh))
-            img_rgb = np.array(shot)
-            if img_rgb.size == 0:
+            # 擷取搜尋區（優先從共用影格裁切）；灰階與邊緣由影格快取，其他偵測器可共用
+            frame, region = self.frame_source.frame_for((rx, ry, rw, rh), frame)
+            rx, ry = region[:2]
+            img_gray = frame.context.gray(region)
+            if img_gray is None or img_gray.size == 0:
                 return None, None, None
-
-            # 準備比對素材
-            img_gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
-            img_edge = cv2.Canny(img_gray, 50, 150)
-
-            # 讀取彩色模板（用於遮罩生成）
-            tmpl_bgr = cv2.imread(self.template_path, cv2.IMREAD_COLOR)
-            if tmpl_bgr is None:
-                # 回退到傳統方法
-                return self.find_image_with_scaling_original()
-                
-            tmpl_gray = cv2.cvtColor(tmpl_bgr, cv2.COLOR_BGR2GRAY)
-            tmpl_edge = cv2.Canny(tmpl_gray, 50, 150)
-            mask0     = self.build_icon_masks(tmpl_bgr)
-
-            th, tw = tmpl_gray.shape[:2]
-            H, W   = img_gray.shape[:2]
-
-            best_score = -1.0
-            second_best = -1.0
-            best_loc = None
-            best_scale = None
-
-            for s in np.linspace(scale_range[0], scale_range[1], scale_steps):
-                w = max(1, int(round(tw * s)))
-                h = max(1, int(round(th * s)))
-                if h > H or w > W:
-                    continue
-
+            img_edge = frame.context.edges(region)
+
+            # 彩色模板讀不到（沒有遮罩）就回退到傳統方法
+            if bank.mask is None:
+                loc, scale = self.find_image_with_scaling_original(frame, cfg, search_region, level_indices)
+                return loc, scale, None
+
+            coarse_imgs = None
+            if bank.coarse_ok and level_indices is None:
+                coarse_imgs = (frame.context.gray(region, bank.coarse_factor),
+                               frame.context.edges(region, scale=bank.coarse_factor))
+            use_fft = cfg.get("MATCH_ENGINE", "opencv") == "fft"
+
+            def match(lv, coarse, window):
+                (g, e), (ox, oy) = self._window(coarse_imgs if coarse else (img_gray, img_edge), window)
+                H, W = g.shape[:2]
+                if lv.h > H or lv.w > W:
+                    return None
                 try:
-                    t_gray = cv2.resize(tmpl_gray, (w, h), interpolation=cv2.INTER_AREA)
-                    t_edge = cv2.resize(tmpl_edge, (w, h), interpolation=cv2.INTER_NEAREST)
-                    t_mask = cv2.resize(mask0,     (w, h), interpolation=cv2.INTER_NEAREST)
-
-                    # A) 灰階+遮罩
-                    res1 = cv2.matchTemplate(img_gray, t_gray, cv2.TM_CCORR_NORMED, mask=t_mask)
-                    _, s1, _, loc1 = cv2.minMaxLoc(res1)
-
-                    # B) 邊緣
-                    res2 = cv2.matchTemplate(img_edge, t_edge, cv2.TM_CCOEFF_NORMED)
-                    _, s2, _, loc2 = cv2.minMaxLoc(res2)
-
-                    # 融合
-                    score = alpha * s1 + (1.0 - alpha) * s2
-                    loc   = loc1 if s1 >= s2 else loc2
-
-                    if score > best_score:
-                        second_best = best_score
-                        best_score  = score
-                        best_loc    = (loc[0] + rx, loc[1] + ry)
-                        best_scale  = s
-                    elif score > second_best:
-                        second_best = score
-                        
-                except cv2.error as e:
-                    print(f"[警告] 圖標增強檢測比對失敗 (scale={s:.2f}): {e}")
-                    continue
-
-            if best_loc is None:
+                    scale = bank.coarse_factor if coarse else 1.0
+                    if use_fft and window is None:
+                        # 整張搜尋區：影像頻譜由影格快取，模板頻譜由 TemplateLevel 快取
+                        res1 = frame.context.correlator(region, "gray", scale).ccorr_normed_masked(
+                            lv.gray, lv.mask, lv.spectra_for("gray"))
+                        res2 = frame.context.correlator(region, "edges", scale).ccoeff_normed(
+                            lv.edge, lv.spectra_for("edge"))
+                        _, s1, _, loc1 = cv2.minMaxLoc(res1)
+                        _, s2, _, loc2 = cv2.minMaxLoc(res2)
+                    else:
+                        # A) 灰階+遮罩
+                        res_shape = (H - lv.h + 1, W - lv.w + 1)
+                        res1 = cv2.matchTemplate(g, lv.gray, cv2.TM_CCORR_NORMED,
+                                                 result=_buffers.get("icon_res1", res_shape, np.float32),
+                                                 mask=lv.mask)
+                        _, s1, _, loc1 = cv2.minMaxLoc(res1)
+
+                        # B) 邊緣
+                        res2 = cv2.matchTemplate(e, lv.edge, cv2.TM_CCOEFF_NORMED,
+                                                 result=_buffers.get("icon_res2", res_shape, np.float32))
+                        _, s2, _, loc2 = cv2.minMaxLoc(res2)
+                except cv2.error as err:
+                    print(f"[警告] 圖標增強檢測比對失敗 (scale={lv.scale:.2f}): {err}")
+                    return None
+
+                # 融合
+                score = alpha * s1 + (1.0 - alpha) * s2
+                loc   = loc1 if s1 >= s2 else loc2
+                return score, (loc[0] + ox, loc[1] + oy)
+
+            grid, best = scan_template_scales(bank, match, cfg, level_indices)
+            if best is None:
                 return None, None, None
 
+            # 最佳/次佳比例沿用各尺度格點上的分數（內插尺度只影響最終位置與尺度）
+            best_score, best_loc, best_scale = best
+            best_loc = (best_loc[0] + rx, best_loc[1] + ry)
+            second_best = grid[1][0] if len(grid) > 1 else -1.0
+
             # 置信度驗證
             ratio_ok = (best_score / max(1e-6, second_best)) >= ratio_thresh
             if best_score >= conf and ratio_ok:
@@ -1523,61 +2852,146 @@ class ImageDetector:
             print(f"[錯誤] 增強圖標檢測異常: {e}")
             return None, None, None
 
-    def find_image_with_scaling_original(self):
-        scale_steps = self.scale_steps
-        scale_range = self.scale_range
-        screenshot = pyautogui.screenshot(region=self.search_region)
-        screenshot_np = np.array(screenshot)
-        screenshot_gray = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2GRAY)
-
-        found_location = None
-        max_corr = -1
-        best_scale = None
-
-        for scale in np.linspace(scale_range[0], scale_range[1], scale_steps):
-            w, h = self.template_img.shape[::-1]
-            resized_template = cv2.resize(self.template_img, (int(w * scale), int(h * scale)))
-            if resized_template.shape[0] > screenshot_gray.shape[0] or resized_template.shape[1] > screenshot_gray.shape[1]:
-                continue
-            res = cv2.matchTemplate(screenshot_gray, resized_template, cv2.TM_CCOEFF_NORMED)
+    def find_image_with_scaling_original(self, frame=None, cfg=None, search_region=None, level_indices=None):
+        if cfg is None:
+            cfg = DEFAULT_CFG
+        bank = self.template_bank(cfg=cfg)
+        frame, region = self.frame_source.frame_for(search_region or self.search_region, frame)
+        screenshot_gray = frame.context.gray(region)
+        coarse_gray = None
+        if bank.coarse_ok and level_indices is None:
+            coarse_gray = frame.context.gray(region, bank.coarse_factor)
+
+        use_fft = cfg.get("MATCH_ENGINE", "opencv") == "fft"
+
+        def match(lv, coarse, window):
+            (g,), (ox, oy) = self._window((coarse_gray if coarse else screenshot_gray,), window)
+            if lv.h > g.shape[0] or lv.w > g.shape[1]:
+                return None
+            if use_fft and window is None:
+                engine = frame.context.correlator(region, "gray", bank.coarse_factor if coarse else 1.0)
+                res = engine.ccoeff_normed(lv.plain, lv.spectra_for("plain"))
+            else:
+                res = cv2.matchTemplate(g, lv.plain, cv2.TM_CCOEFF_NORMED)
             _, max_val, _, max_loc = cv2.minMaxLoc(res)
-            if max_val > max_corr:
-                max_corr = max_val
-                top_left = max_loc
-                found_location = (top_left[0] + self.search_region[0], top_left[1] + self.search_region[1])
-                best_scale = scale
+            return max_val, (max_loc[0] + ox, max_loc[1] + oy)
 
-        if max_corr >= self.confidence:
+        _, best = scan_template_scales(bank, match, cfg, level_indices)
+        if best is not None and best[0] >= self.confidence:
+            max_corr, top_left, best_scale = best
+            found_location = (top_left[0] + region[0], top_left[1] + region[1])
             return found_location, best_scale
         else:
             return None, None
 
-    def find_image_with_scaling(self, cfg=None, use_enhanced=None, fallback_to_original=True):
+    def find_image_with_scaling(self, cfg=None, use_enhanced=None, fallback_to_original=True, frame=None):
         """
         主要的圖標檢測方法：優先使用增強版檢測，失敗時可回退到傳統方法
+        frame：共用影格；未提供時只擷取一次搜尋區，增強與傳統方法共用
         """
         if cfg is None:
             cfg = DEFAULT_CFG
             
         if use_enhanced is None:
             use_enhanced = cfg.get("ICON_ENHANCED_DETECTION", True)
-            
-        if use_enhanced:
+
+        if frame is None:
+            frame = self.frame_source.capture(self.search_region)
+
+        # 負向快速路徑：特徵色像素明顯不夠就不跑任何 matchTemplate（閒置搜尋時大多走這裡）
+        if cfg.get("ICON_PREFILTER_ENABLED", True) and not self.passes_color_prefilter(cfg, frame):
+            self.last_hit = None
+            return None, None
+
+        # 先在上次命中位置附近、鎖定尺度 ±1 步追蹤；miss 才做全區搜尋
+        if cfg.get("ICON_TRACKING_ENABLED", True) and self.last_hit is not None:
+            roi, indices = self._tracking_window(cfg)
+            if roi is not None:
+                location, scale = self._find_in(cfg, use_enhanced, fallback_to_original, frame, roi, indices)
+                if location is not None:
+                    self.last_hit = (location, scale)
+                    return location, scale
+                print("[圖標追蹤] 追蹤範圍內未找到，改為全區搜尋")
+            self.last_hit = None
+
+        location, scale = self._find_in(cfg, use_enhanced, fallback_to_original, frame)
+        self.last_hit = (location, scale) if location is not None else None
+        return location, scale
+
+    def passes_color_prefilter(self, cfg, frame=None):
+        """
+        搜尋區內白色、青藍像素是否都足以容納一個最小尺度的圖標
+        門檻 = 模板像素數 × 最小尺度² × ICON_PREFILTER_RATIO；只用來排除，通過不代表有圖標
+        """
+        if self.icon_color_counts is None:
+            return True
+        frame, region = self.frame_source.frame_for(self.search_region, frame)
+        hsv = frame.context.hsv(region)
+        if hsv is None or hsv.size == 0:
+            return True
+        white, cyan = self.icon_color_masks(hsv, pooled=True)
+
+        ratio = cfg.get("ICON_PREFILTER_RATIO", 0.5)
+        s_min = min(self.scale_range)
+        need_white = self.icon_color_counts[0] * s_min * s_min * ratio
+        need_cyan = self.icon_color_counts[1] * s_min * s_min * ratio
+        return cv2.countNonZero(white) >= need_white and cv2.countNonZero(cyan) >= need_cyan
+
+    def _tracking_window(self, cfg):
+        """上次命中的追蹤 ROI（夾在搜尋區內）與鎖定尺度 ±1 步的 level 索引"""
+        (lx, ly), last_scale = self.last_hit
+        levels = self.template_bank(cfg=cfg).levels
+        i = min(range(len(levels)), key=lambda k: abs(levels[k].scale - last_scale))
+        indices = [k for k in (i - 1, i, i + 1) if 0 <= k < len(levels)]
+        pad = int(cfg.get("ICON_TRACK_PADDING", 24))
+        w = max(levels[k].w for k in indices)
+        h = max(levels[k].h for k in indices)
+
+        sx, sy, sw, sh = map(int, self.search_region)
+        x0 = max(sx, int(lx) - pad)
+        y0 = max(sy, int(ly) - pad)
+        x1 = min(sx + sw, int(lx) + w + pad)
+        y1 = min(sy + sh, int(ly) + h + pad)
+        if x1 - x0 < w or y1 - y0 < h:
+            return None, None
+        return (x0, y0, x1 - x0, y1 - y0), indices
+
+    def _find_in(self, cfg, use_enhanced, fallback_to_original, frame, search_region=None, level_indices=None):
+        """
+        增強檢測與傳統方法；search_region / level_indices 為 None 時搜尋全區、全部尺度
+        嘗試順序由策略選擇器依每次成功的期望成本決定（預設仍是增強優先）
+        """
+        def enhanced():
             try:
-                result = self.find_icon_enhanced(cfg)
+                result = self.find_icon_enhanced(cfg, frame=frame, search_region=search_region,
+                                                 level_indices=level_indices)
                 if result[0] is not None:
-                    return result[0], result[1]  # 返回 (location, scale) 格式
-                else:
-                    print("[增強圖標檢測] 未找到結果")
+                    return (result[0], result[1]), True  # 返回 (location, scale) 格式
+                print("[增強圖標檢測] 未找到結果")
             except Exception as e:
                 print(f"[增強圖標檢測] 異常: {e}")
-        
-        # 增強檢測失敗，回退到傳統方法
+            return None, False
+
+        def original():
+            result = self.find_image_with_scaling_original(frame, cfg, search_region, level_indices)
+            return result, result[0] is not None
+
+        methods = {}
+        if use_enhanced:
+            methods["enhanced"] = enhanced
         if fallback_to_original:
-            print("[增強圖標檢測] 回退到傳統模板匹配")
-            return self.find_image_with_scaling_original()
-        
-        return None, None
+            methods["original"] = original
+        if not methods:
+            return None, None
+
+        mode = "track" if search_region is not None else "full"
+        selector = self.strategies.get(mode)
+        if selector is None:
+            # 增強比對有最佳/次佳比例驗證，傳統比對只是備援：分兩層，傳統再快也不會排到前面
+            selector = self.strategies[mode] = StrategySelector.from_cfg(
+                ["enhanced", "original"], cfg, f"/圖標{mode}", tiers=[["enhanced"], ["original"]])
+        found = run_strategies(selector, methods, cfg)
+        return found if found is not None else (None, None)
 
     def get_center_position(self, location, scale):
         if location and scale:
@@ -1628,10 +3042,22 @@ class ArrowDetector:
     def __init__(self, character_template_path, search_region, arrow_search_radius=140,
                  min_area=80, conf=0.8, scale_steps=7, scale_range=(0.8,1.2),
                  drag_distance=180, drag_seconds=0.2, drag_button="left",
-                 timeout=3.0, poll=0.08, min_hits=5):
+                 timeout=3.0, poll=0.08, min_hits=5, frame_source=None,
+                 arrow_annulus=True, arrow_inner_radius=0,
+                 phase_lock=False, breathing_cycle=1.0, bright_fraction=0.5,
+                 decision_ci_deg=10.0, decision_min_samples=3, decision_extend=2.0):
         self.character_template_path = character_template_path
         self.search_region = tuple(search_region)
         self.arrow_search_radius = arrow_search_radius
+        # 箭頭只在 arrow_inner_radius ~ arrow_search_radius 的環內找（排除人物本身與四角）
+        self.arrow_annulus = arrow_annulus
+        self.arrow_inner_radius = arrow_inner_radius
+        self._annulus_masks = {}
+        # 箭頭存在探針：完整角度流程只在探針判斷箭頭還在時執行
+        self.probe = ArrowPresenceProbe(min_pixels=max(1, min_area // 2))
+        # 呼吸相位：探針的紅色像素數同時用來估計亮峰時刻，箭頭取樣排在亮相位
+        self.phase_lock = phase_lock
+        self.breathing = BreathingPhase(breathing_cycle, bright_fraction)
         self.min_area = min_area
         self.confidence = conf
         self.scale_steps = scale_steps
@@ -1642,11 +3068,149 @@ class ArrowDetector:
         self.timeout = timeout
         self.poll = poll
         self.min_hits = min_hits
+        # 角度序貫停止：均值信賴區間半寬門檻、最少樣本數、樣本不一致時時間窗最多延長倍數
+        self.decision_ci_deg = decision_ci_deg
+        self.decision_min_samples = decision_min_samples
+        self.decision_extend = max(1.0, decision_extend)
+        # 共用影格來源（與 ImageDetector 共用同一個）
+        self.frame_source = frame_source or FrameSource()
+
+        # 人物模板庫（各尺度灰階）只在這裡建一次
+        self.bank = TemplateBank(character_template_path, scale_range, scale_steps)
+        self.template_img = self.bank.gray
+        self.template_width, self.template_height = self.bank.width, self.bank.height
+        # 圓環 / 模板方法的策略統計（第一次偵測時依 cfg 建立）
+        self.strategy = None
+        # 導航中的人物中心追蹤：預測夠準時只做局部模板確認，不必每次完整偵測
+        self.tracker = CharacterTracker()
+        self.track_scale = None
+        self._track_level = None
+        # 紅色遮罩的 CLAHE（第一次取樣時建立，之後重複使用）
+        self._clahe = None
+
+    def template_bank(self):
+        """取得人物模板庫；模板路徑或尺度設定改變時才重建"""
+        if not self.bank.matches(self.character_template_path, self.scale_range, self.scale_steps):
+            self.bank = TemplateBank(self.character_template_path, self.scale_range, self.scale_steps)
+        return self.bank
+
+    # 每個半徑的取樣偏移表：{r: (圓周 dx, dy, 內圓 dx, dy)}，所有 ArrowDetector 共用
+    _ring_offset_tables = {}
+
+    @classmethod
+    def _ring_offsets(cls, r):
+        """
+        半徑 r 的圓周取樣點與內圓（半徑 0.45r 的實心圓）像素偏移
+        圓周：N = max(36, 2πr/8) 個等角點；內圓：與 cv2.circle 實心圓相同的像素集合
+        """
+        table = cls._ring_offset_tables.get(r)
+        if table is None:
+            N = max(36, int(2 * math.pi * r / 8))  # 半徑越大取樣越多
+            thetas = np.linspace(0, 2*np.pi, N, endpoint=False)
+            # 圓周保留浮點偏移：加上圓心後再截斷，取樣點與逐一計算時完全相同
+            pdx = r * np.cos(thetas)
+            pdy = r * np.sin(thetas)
+
+            inner_r = max(2, int(r*0.45))
+            disc = np.zeros((2*inner_r + 1, 2*inner_r + 1), np.uint8)
+            cv2.circle(disc, (inner_r, inner_r), inner_r, 255, -1)
+            idy, idx = np.nonzero(disc)
+            table = cls._ring_offset_tables[r] = (pdx, pdy, idx - inner_r, idy - inner_r)
+        return table
 
-        self.template_img = cv2.imread(character_template_path, 0)
-        if self.template_img is None:
-            raise ValueError(f"無法載入圖片: {character_template_path}")
-        self.template_width, self.template_height = self.template_img.shape[::-1]
+    def _score_ring_candidates(self, white, circles):
+        """
+        以預先算好的偏移表一次 gather 所有候選（同半徑的候選一起算）
+        回傳 (圓周白色比例, 內圓白色比例)，順序與 circles 相同
+        圓周點超出邊界時夾到邊緣；內圓只計算影像內的像素
+        """
+        h, w = white.shape[:2]
+        ring_ratio = np.zeros(len(circles), np.float64)
+        inner_ratio = np.zeros(len(circles), np.float64)
+        for r in np.unique(circles[:, 2]):
+            sel = np.nonzero(circles[:, 2] == r)[0]
+            cx = circles[sel, 0][:, None]
+            cy = circles[sel, 1][:, None]
+            pdx, pdy, idx, idy = self._ring_offsets(int(r))
+
+            xs = np.clip((cx + pdx).astype(np.intp), 0, w - 1)
+            ys = np.clip((cy + pdy).astype(np.intp), 0, h - 1)
+            ring_ratio[sel] = (white[ys, xs] > 0).mean(axis=1)
+
+            xs = cx + idx
+            ys = cy + idy
+            valid = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+            hits = (white[np.clip(ys, 0, h - 1), np.clip(xs, 0, w - 1)] > 0) & valid
+            inner_ratio[sel] = hits.sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+        return ring_ratio, inner_ratio
+
+    # 環帶減內圓卷積核：{(r_min, r_max, step, scale): (pad, [(r, kernel, 頻譜快取), ...])}，所有 ArrowDetector 共用
+    _annulus_kernel_sets = {}
+
+    @classmethod
+    def _annulus_kernels(cls, r_min, r_max, step, scale):
+        """
+        每個半徑一個卷積核（在縮小 scale 倍的影像上使用）：
+        半徑 r 的環帶（縮小後 ±1 像素）權重總和 +1、內圓（0.45r）權重總和 -0.4
+        對 0~1 白色比例圖卷積後 ≈ 圓周白色比例 - 0.4*內圓白色比例，與 _score_ring_candidates 的綜合分數同尺度
+        所有卷積核同樣大小 (2*pad+1)，影像四周補 pad 個 0 後做有效相關，輸出剛好與影像同大小
+        """
+        key = (int(r_min), int(r_max), max(1, int(step)), float(scale))
+        entry = cls._annulus_kernel_sets.get(key)
+        if entry is None:
+            pad = int(math.ceil(key[1] * key[3])) + 2
+            yy, xx = np.mgrid[:2*pad + 1, :2*pad + 1] - pad
+            dist = np.sqrt(xx*xx + yy*yy)
+            kernels = []
+            for r in range(key[0], key[1] + 1, key[2]):
+                ring = np.abs(dist - r*key[3]) <= 1.0
+                inner = dist <= max(2, int(r*0.45)) * key[3]
+                k = np.zeros(dist.shape, np.float32)
+                k[ring] = 1.0 / ring.sum()
+                k[inner] = -0.4 / inner.sum()
+                kernels.append((r, k, {}))
+            entry = cls._annulus_kernel_sets[key] = (pad, kernels)
+        return entry
+
+    def _annulus_candidates(self, white, circle_r_min, circle_r_max, min_dist,
+                            ring_consistency, step=4, top_k=8, scale=0.5):
+        """
+        環帶卷積找圓環候選（HoughCircles 的替代引擎）
+        白色遮罩先以 INTER_AREA 縮小 scale 倍，影像頻譜只算一次，每個半徑只做一次頻譜相乘 + 反轉換；
+        取各像素最佳半徑的回應，以 min_dist 做非極大值抑制取前 top_k 名（之後由 _score_ring_candidates 在原解析度精算）
+        計算量只跟搜尋區大小與半徑數有關，不隨畫面雜訊增加，延遲穩定
+        回傳 (N, 3) int 陣列 [cx, cy, r]（原解析度座標，分數由高到低），沒有候選時回傳 None
+        """
+        h, w = white.shape[:2]
+        sw, sh = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        pad, kernels = self._annulus_kernels(circle_r_min, circle_r_max, step, scale)
+
+        small = cv2.resize(white, (sw, sh), dst=_buffers.get("annulus_small", (sh, sw)), interpolation=cv2.INTER_AREA)
+        src = _buffers.get("annulus_src", (sh + 2*pad, sw + 2*pad), np.float32)
+        src.fill(0)
+        np.multiply(small, 1.0 / 255.0, out=src[pad:pad + sh, pad:pad + sw], casting="unsafe")
+        engine = FFTCorrelator(src)
+
+        resp = _buffers.get("annulus_resp", (len(kernels), sh, sw), np.float32)
+        for i, (r, k, spectra) in enumerate(kernels):
+            resp[i] = engine.correlate(k, spectra)
+        best_i = resp.argmax(axis=0)
+        best = np.take_along_axis(resp, best_i[None], axis=0)[0]
+
+        # 綜合分數 >= ring_consistency - 0.4 是圓周比例達標的必要條件（內圓比例最多 1）
+        # 非極大值抑制用方形窗（比橢圓快，效果與 HoughCircles 的 minDist 相近）
+        d = max(1, int(round(min_dist * scale)))
+        peaks = best == cv2.dilate(best, cv2.getStructuringElement(cv2.MORPH_RECT, (2*d + 1, 2*d + 1)))
+        peaks &= best >= ring_consistency - 0.4
+        ys, xs = np.nonzero(peaks)
+        if len(xs) == 0:
+            return None
+        order = np.argsort(-best[ys, xs], kind="stable")[:top_k]
+        ys, xs = ys[order], xs[order]
+        cx = np.minimum(np.round((xs + 0.5) / scale - 0.5).astype(int), w - 1)
+        cy = np.minimum(np.round((ys + 0.5) / scale - 0.5).astype(int), h - 1)
+        radii = np.array([r for r, _, _ in kernels])
+        return np.stack([cx, cy, radii[best_i[ys, xs]]], axis=1)
 
     def find_ring_then_match(self, search_region=None, 
                            circle_r_min=18, circle_r_max=40,  # 依解析度調整
@@ -1654,9 +3218,12 @@ class ArrowDetector:
                            white_v_thresh=200, white_s_max=60,
                            ring_consistency=0.55,               # 圓周取樣有多少比例是「白」
                            refine_window=120,                    # 小窗大小（正方形）
-                           confidence=0.82):
+                           confidence=0.82, frame=None,
+                           engine="hough", annulus_step=4, annulus_top_k=8, annulus_scale=0.5):
         """
         先用 HoughCircles 找白色圓環中心；可選擇在中心附近做模板比對做二次驗證。
+        frame：共用影格（None 時自行擷取搜尋區）
+        engine："hough"（Canny + HoughCircles）或 "annulus"（白色遮罩與環帶卷積核卷積，延遲固定）
         回傳：(center_xy, radius, score)；找不到回傳 (None, None, None)
         """
         if search_region is None:
@@ -1665,70 +3232,62 @@ class ArrowDetector:
         rx, ry, rw, rh = map(int, search_region)
 
         try:
-            shot = pyautogui.screenshot(region=(rx, ry, rw, rh))
+            frame, region = self.frame_source.frame_for((rx, ry, rw, rh), frame)
         except Exception as e:
             print(f"[ring] 截圖失敗: {e}")
             return None, None, None
 
-        img = np.array(shot)
-        if img.size == 0:
+        rx, ry, rw, rh = region
+        if rw == 0 or rh == 0:
             return None, None, None
 
         # ---- 預處理：強化白圈並壓背景 ----
-        hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
-        H, S, V = cv2.split(hsv)
+        shape = (rh, rw)
+        hsv = frame.context.hsv(region)
 
         # 以「亮且不太飽和」挑白
-        white = cv2.inRange(hsv, (0, 0, white_v_thresh), (179, white_s_max, 255))
-
-        # 平滑 + 邊緣
-        blur = cv2.GaussianBlur(white, (5,5), 0)
-        edges = cv2.Canny(blur, 50, 150)
+        white = cv2.inRange(hsv, (0, 0, white_v_thresh), (179, white_s_max, 255),
+                            dst=_buffers.get("ring_white", shape))
+
+        if engine == "annulus":
+            # ---- 環帶卷積找候選 ----
+            circles = self._annulus_candidates(white, circle_r_min, circle_r_max, minDist,
+                                               ring_consistency, annulus_step, annulus_top_k, annulus_scale)
+            if circles is None:
+                return None, None, None
+        else:
+            # 平滑 + 邊緣
+            blur = cv2.GaussianBlur(white, (5,5), 0, dst=_buffers.get("ring_blur", shape))
+            edges = cv2.Canny(blur, 50, 150, edges=_buffers.get("ring_edges", shape))
 
-        # ---- Hough 圓偵測 ----
-        circles = cv2.HoughCircles(edges, cv2.HOUGH_GRADIENT, dp=dp, minDist=minDist,
-                                   param1=param1, param2=param2,
-                                   minRadius=circle_r_min, maxRadius=circle_r_max)
+            # ---- Hough 圓偵測 ----
+            circles = cv2.HoughCircles(edges, cv2.HOUGH_GRADIENT, dp=dp, minDist=minDist,
+                                       param1=param1, param2=param2,
+                                       minRadius=circle_r_min, maxRadius=circle_r_max)
 
-        if circles is None:
-            return None, None, None
+            if circles is None:
+                return None, None, None
 
-        circles = np.round(circles[0, :]).astype(int)
+            circles = np.round(circles[0, :]).astype(int)
 
         # ---- 針對每個候選做「白圈一致性」檢查，挑最佳 ----
-        best = (None, None, -1.0)  # (center_xy_global, r, score)
-
         h, w = white.shape[:2]
-        for (cx, cy, r) in circles:
-            if not (0 <= cx < w and 0 <= cy < h):
-                continue
-
-            # 在圓周上取樣 N 個點，計算白色比例
-            N = max(36, int(2 * math.pi * r / 8))  # 半徑越大取樣越多
-            thetas = np.linspace(0, 2*np.pi, N, endpoint=False)
-            xs = (cx + r * np.cos(thetas)).astype(int)
-            ys = (cy + r * np.sin(thetas)).astype(int)
-            xs = np.clip(xs, 0, w-1)
-            ys = np.clip(ys, 0, h-1)
-
-            ring_white_ratio = (white[ys, xs] > 0).mean()
-
-            # 也檢查「中心附近不是白」（避免把亮點誤當實心圓）
-            inner_r = max(2, int(r*0.45))
-            mask_inner = np.zeros_like(white)
-            cv2.circle(mask_inner, (cx, cy), inner_r, 255, -1)
-            inner_white_ratio = (white[mask_inner > 0] > 0).mean()
-
-            # 綜合分數：白圈比例高且中心白比例低
-            score = ring_white_ratio - 0.4*inner_white_ratio
+        inside = (circles[:, 0] >= 0) & (circles[:, 0] < w) & (circles[:, 1] >= 0) & (circles[:, 1] < h)
+        circles = circles[inside]
+        if len(circles) == 0:
+            return None, None, None
 
-            if ring_white_ratio >= ring_consistency and score > best[2]:
-                best = ((cx + rx, cy + ry), r, score)
+        ring_white_ratio, inner_white_ratio = self._score_ring_candidates(white, circles)
 
-        if best[0] is None:
+        # 綜合分數：白圈比例高且中心白比例低
+        scores = ring_white_ratio - 0.4 * inner_white_ratio
+        scores[ring_white_ratio < ring_consistency] = -np.inf
+        i = int(np.argmax(scores))
+        if not np.isfinite(scores[i]):
             return None, None, None
 
-        center_xy_global, r_best, score = best
+        cx, cy, r_best = (int(v) for v in circles[i])
+        center_xy_global, score = (cx + rx, cy + ry), float(scores[i])
 
         # ---- 可選：在白圈中心附近開小窗做模板二次驗證 ----
         if self.template_img is not None:
@@ -1745,20 +3304,12 @@ class ArrowDetector:
                 # 小窗不合理就直接回傳白圈
                 return center_xy_global, r_best, score
 
-            # 取小窗並做模板比對
+            # 小窗一定落在剛才的搜尋區內：直接從同一張影格的灰階切出來，不再另外截圖
             try:
-                win = np.array(pyautogui.screenshot(region=(wx, wy, wW, wH)))
-                win_gray = cv2.cvtColor(win, cv2.COLOR_RGB2GRAY)
+                win_gray = frame.context.gray(region)[wy - ry:wy2 - ry, wx - rx:wx2 - rx]
 
-                tmpl = self.template_img.copy()
-                if len(tmpl.shape) == 3:
-                    tmpl = cv2.cvtColor(tmpl, cv2.COLOR_BGR2GRAY)
-
-                # 尺度：模板若比小窗大就縮
-                th, tw = tmpl.shape[:2]
-                scale = min(wW / max(1, tw), wH / max(1, th), 1.0)
-                if scale < 1.0:
-                    tmpl = cv2.resize(tmpl, (int(tw*scale), int(th*scale)), interpolation=cv2.INTER_AREA)
+                # 尺度：模板若比小窗大就縮（依小窗大小快取在模板庫）
+                tmpl = self.template_bank().fitted(wW, wH)
 
                 if tmpl.shape[0] <= win_gray.shape[0] and tmpl.shape[1] <= win_gray.shape[1]:
                     res = cv2.matchTemplate(win_gray, tmpl, cv2.TM_CCOEFF_NORMED)
@@ -1778,17 +3329,24 @@ class ArrowDetector:
         # 單純找白圈就夠用
         return center_xy_global, r_best, score
 
-    def find_character_enhanced(self, cfg=None, use_ring_detection=True, fallback_to_template=True):
+    def find_character_enhanced(self, cfg=None, use_ring_detection=True, fallback_to_template=True, frame=None):
         """
         增強版人物檢測：優先使用圓環檢測，失敗時可回退到傳統模板匹配
+        frame：共用影格；未提供時只擷取一次搜尋區，圓環與模板方法共用
         回傳：(location, scale) 或 (None, None)
         """
         if cfg is None:
             # 使用默認配置
             cfg = DEFAULT_CFG
+
+        if frame is None:
+            try:
+                frame = self.frame_source.capture(self.search_region)
+            except Exception as e:
+                print(f"[警告] 人物偵測螢幕截圖異常: {e}")
+                return None, None
             
-        # 檢查是否啟用圓環檢測
-        if use_ring_detection and cfg.get("RING_DETECTION_ENABLED", True):
+        def ring():
             try:
                 center_xy, radius, score = self.find_ring_then_match(
                     circle_r_min=cfg.get("RING_CIRCLE_R_MIN", 18),
@@ -1797,7 +3355,12 @@ class ArrowDetector:
                     white_s_max=cfg.get("RING_WHITE_S_MAX", 60),
                     ring_consistency=cfg.get("RING_CONSISTENCY", 0.55),
                     refine_window=cfg.get("RING_REFINE_WINDOW", 120),
-                    confidence=cfg.get("RING_TEMPLATE_CONFIDENCE", 0.82)
+                    confidence=cfg.get("RING_TEMPLATE_CONFIDENCE", 0.82),
+                    engine=cfg.get("RING_ENGINE", "hough"),
+                    annulus_step=cfg.get("RING_ANNULUS_STEP", 4),
+                    annulus_top_k=cfg.get("RING_ANNULUS_TOP_K", 8),
+                    annulus_scale=cfg.get("RING_ANNULUS_SCALE", 0.5),
+                    frame=frame
                 )
                 if center_xy is not None:
                     # 將圓環中心轉換為兼容的 location, scale 格式
@@ -1812,25 +3375,42 @@ class ArrowDetector:
                     location = (int(cx - half_w), int(cy - half_h))
                     
                     print(f"[增強檢測] 圓環檢測成功：中心({cx}, {cy})，分數={score:.3f}")
-                    return location, estimated_scale
+                    return (location, estimated_scale), True
                 else:
                     print("[增強檢測] 圓環檢測未找到結果")
             except Exception as e:
                 print(f"[增強檢測] 圓環檢測異常: {e}")
-        
-        # 圓環檢測失敗，回退到傳統模板匹配
+            return None, False
+
+        def template():
+            result = self.find_character_original(frame, cfg)
+            return result, result[0] is not None
+
+        # 圓環檢測與傳統模板匹配，順序由策略選擇器依每次成功的期望成本決定（預設圓環優先）
+        methods = {}
+        if use_ring_detection and cfg.get("RING_DETECTION_ENABLED", True):
+            methods["ring"] = ring
         if fallback_to_template:
-            print("[增強檢測] 回退到傳統模板匹配")
-            return self.find_character_original()
-        
-        return None, None
+            methods["template"] = template
+        if not methods:
+            return None, None
+
+        if self.strategy is None:
+            # 圓環偵測有圓周一致性驗證，模板比對只是備援：分兩層
+            self.strategy = StrategySelector.from_cfg(["ring", "template"], cfg, "/人物",
+                                                     tiers=[["ring"], ["template"]])
+        found = run_strategies(self.strategy, methods, cfg)
+        return found if found is not None else (None, None)
 
-    def find_character_original(self):
+    def find_character_original(self, frame=None, cfg=None):
+        if cfg is None:
+            cfg = DEFAULT_CFG
         try:
             rx, ry, rw, rh = map(int, self.search_region)
             
             try:
-                screenshot = pyautogui.screenshot(region=(rx, ry, rw, rh))
+                frame, region = self.frame_source.frame_for((rx, ry, rw, rh), frame)
+                rx, ry = region[:2]
             except pyautogui.PyAutoGUIException as e:
                 print(f"[警告] 人物偵測螢幕截圖失敗: {e}")
                 return None, None
@@ -1838,17 +3418,11 @@ class ArrowDetector:
                 print(f"[警告] 人物偵測螢幕截圖異常: {e}")
                 return None, None
                 
-            if screenshot is None:
-                print("[警告] 人物偵測截圖返回空值")
-                return None, None
-                
             try:
-                screenshot_np = np.array(screenshot)
-                if screenshot_np.size == 0:
+                screenshot_gray = frame.context.gray(region)
+                if screenshot_gray is None or screenshot_gray.size == 0:
                     print("[警告] 人物偵測截圖圖像為空")
                     return None, None
-                    
-                screenshot_gray = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2GRAY)
             except Exception as e:
                 print(f"[警告] 人物偵測圖像轉換失敗: {e}")
                 return None, None
@@ -1856,18 +3430,22 @@ class ArrowDetector:
             found_location = None
             max_corr = -1.0
             best_scale = None
-            th, tw = self.template_img.shape[:2]
+            bank = self.template_bank()
+            # FFT 引擎：搜尋區頻譜只算一次，各尺度模板頻譜快取在模板庫
+            engine = frame.context.correlator(region) if cfg.get("MATCH_ENGINE", "opencv") == "fft" else None
 
             try:
-                for scale in np.linspace(self.scale_range[0], self.scale_range[1], self.scale_steps):
-                    w = max(1, int(round(tw * scale)))
-                    h = max(1, int(round(th * scale)))
+                for lv in bank.levels:
+                    scale, w, h = lv.scale, lv.w, lv.h
                     
                     try:
-                        resized = cv2.resize(self.template_img, (w, h))
+                        resized = lv.plain
                         if h > screenshot_gray.shape[0] or w > screenshot_gray.shape[1]:
                             continue
-                        res = cv2.matchTemplate(screenshot_gray, resized, cv2.TM_CCOEFF_NORMED)
+                        if engine is not None:
+                            res = engine.ccoeff_normed(resized, lv.spectra_for("plain"))
+                        else:
+                            res = cv2.matchTemplate(screenshot_gray, resized, cv2.TM_CCOEFF_NORMED)
                         _, max_val, _, max_loc = cv2.minMaxLoc(res)
                         if max_val > max_corr:
                             max_corr = max_val
@@ -1890,158 +3468,391 @@ class ArrowDetector:
             print(f"[錯誤] 人物偵測整體異常: {e}")
             return None, None
 
-    def find_character(self, cfg=None):
+    def find_character(self, cfg=None, frame=None):
         """
         主要的人物檢測方法，使用增強版檢測（圓環+模板雙重驗證）
         """
-        return self.find_character_enhanced(cfg)
-
-    def _circular_stats(self, angles_deg):
-        """回傳 (均值角度deg, R, circular_std_deg)；angles_deg 為 list[float]"""
-        if not angles_deg:
-            return None, 0.0, None
-        ang = np.deg2rad(np.array(angles_deg, dtype=np.float64))
-        C = np.cos(ang).sum()
-        S = np.sin(ang).sum()
-        n = max(len(angles_deg), 1)
-        R = np.sqrt(C*C + S*S) / n
-        mean_rad = math.atan2(S, C)
-        mean_deg = (math.degrees(mean_rad) + 360) % 360
-        # circular std（R<=1），避免 log(0)
-        R = max(min(R, 0.999999), 1e-6)
-        circ_std_rad = math.sqrt(-2.0 * math.log(R))
-        circ_std_deg = math.degrees(circ_std_rad)
-        return mean_deg, R, circ_std_deg
-
-    def _internal_angle_deg(self, a, b, c):
-        """回傳點 b 的內角角度（a-b-c）"""
-        v1 = a - b
-        v2 = c - b
-        n1 = np.linalg.norm(v1) + 1e-9
-        n2 = np.linalg.norm(v2) + 1e-9
-        cosang = np.clip(np.dot(v1, v2) / (n1 * n2), -1.0, 1.0)
-        return math.degrees(math.acos(cosang))
-
-    def _preprocess_red_mask(self, img_bgr):
+        return self.find_character_enhanced(cfg, frame=frame)
+
+    def character_center(self, cfg=None, frame=None):
+        """
+        導航用的人物中心 (cx, cy)；找不到回傳 None
+        CHAR_TRACKING_ENABLED 時先用追蹤器預測：預測標準差在 CHAR_TRACK_MAX_SIGMA 以內，
+        只在預測位置附近做一次單尺度模板比對確認；確認失敗或不確定性太大才做完整偵測
+        """
+        if cfg is None:
+            cfg = DEFAULT_CFG
+        if frame is None:
+            frame = self.frame_source.grab()
+        t = frame.timestamp
+
+        if not cfg.get("CHAR_TRACKING_ENABLED", True):
+            return self._detect_character_center(cfg, frame)
+
+        pred = self.tracker.predict(t)
+        if pred is not None and pred[2] <= float(cfg.get("CHAR_TRACK_MAX_SIGMA", 12.0)):
+            center = self._confirm_character_near(cfg, frame, pred)
+            if center is not None:
+                self.tracker.update(center[0], center[1], t)
+                return center
+
+        center = self._detect_character_center(cfg, frame)
+        if center is None:
+            self.tracker.reset()
+        return center
+
+    def _detect_character_center(self, cfg, frame):
+        """完整人物偵測；成功時同步更新追蹤器與鎖定尺度"""
+        loc, scale = self.find_character(cfg, frame=frame)
+        if not (loc and scale):
+            return None
+        cx = loc[0] + (self.template_width * scale) / 2
+        cy = loc[1] + (self.template_height * scale) / 2
+        if cfg.get("CHAR_TRACKING_ENABLED", True):
+            self.tracker.update(cx, cy, frame.timestamp)
+            self.track_scale = scale
+        return cx, cy
+
+    def _confirm_character_near(self, cfg, frame, pred):
+        """
+        在預測中心附近（CHAR_TRACK_PADDING 與 3 倍預測標準差取大者）以鎖定尺度做一次模板比對
+        分數達到人物信心度時回傳比對到的中心，否則回傳 None
+        """
+        if self.track_scale is None:
+            return None
+        if self._track_level is None or self._track_level.scale != self.track_scale:
+            self._track_level = self.template_bank().level_at(self.track_scale)
+        lv = self._track_level
+
+        px, py, sigma = pred
+        pad = int(max(cfg.get("CHAR_TRACK_PADDING", 24), 3 * sigma))
+        sx, sy, sw, sh = map(int, self.search_region)
+        x0 = max(sx, int(px - lv.w / 2) - pad)
+        y0 = max(sy, int(py - lv.h / 2) - pad)
+        x1 = min(sx + sw, int(px + lv.w / 2) + pad)
+        y1 = min(sy + sh, int(py + lv.h / 2) + pad)
+        if x1 - x0 < lv.w or y1 - y0 < lv.h:
+            return None
+
+        try:
+            frame, region = self.frame_source.frame_for((x0, y0, x1 - x0, y1 - y0), frame)
+            gray = frame.context.gray(region)
+            if gray is None or gray.shape[0] < lv.h or gray.shape[1] < lv.w:
+                return None
+            res = cv2.matchTemplate(gray, lv.plain, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        except Exception as e:
+            print(f"[人物追蹤] 局部確認失敗: {e}")
+            return None
+        if max_val < self.confidence:
+            return None
+        return region[0] + max_loc[0] + lv.w / 2, region[1] + max_loc[1] + lv.h / 2
+
+    def _start_motion(self, cfg, cx, cy):
+        """拖曳開始時建立光流位移量測；停用或人物框內取不到角點時回傳 None"""
+        if not cfg.get("MOTION_ESTIMATION_ENABLED", True):
+            return None
+        scale = self.track_scale or 1.0
+        motion = MotionEstimator(self.frame_source, self.search_region,
+                                 (self.template_width * scale, self.template_height * scale),
+                                 stall_speed=float(cfg.get("MOTION_STALL_SPEED", 20.0)))
+        try:
+            if motion.start((cx, cy)):
+                return motion
+        except Exception as e:
+            print(f"[光流] 初始化失敗: {e}")
+        return None
+
+    def _motion_verdict(self, motion, tx, ty, cfg):
+        """
+        依光流量測判斷是否該放開滑鼠；回傳原因字串，繼續拖曳回傳 None
+        - 到達：人物已走到游標附近（MOTION_ARRIVE_RADIUS 以內）
+        - 超過：人物正在遠離游標（速度在游標方向上的分量為負）
+        - 卡住：速度持續低於 MOTION_STALL_SPEED 達 MOTION_STALL_TIME 秒（撞到地形）
+        量測由感知執行緒（DragPerception）更新，這裡只依目前狀態判斷，不做擷取
+        """
+        ex, ey = tx - motion.center[0], ty - motion.center[1]
+        dist = math.hypot(ex, ey)
+        if dist <= float(cfg.get("MOTION_ARRIVE_RADIUS", 20.0)):
+            return f"已到達拖曳點（剩 {dist:.0f}px）"
+        vx, vy = motion.velocity
+        if motion.speed >= motion.stall_speed and (vx * ex + vy * ey) < 0:
+            return f"人物正在遠離拖曳點（速度 {motion.speed:.0f}px/s），可能已超過"
+        still = motion.still_for()
+        if still >= float(cfg.get("MOTION_STALL_TIME", 0.4)):
+            mx, my = motion.displacement
+            return f"人物停止移動 {still:.2f}s（累計位移 {math.hypot(mx, my):.0f}px），可能卡住"
+        return None
+
+    # 紅色色相查表：H 在 [0,10] 或 [170,180] 為 255（與原本兩段 inRange 相同）
+    _RED_HUE_LUT = np.array([255 if (hh <= 10 or 170 <= hh <= 180) else 0 for hh in range(256)], np.uint8)
+    _RED_MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5,5))
+
+    @staticmethod
+    def _hist_percentile(channel, q, mask=None):
+        """
+        8 位元單通道的百分位數：256 格直方圖累積後定位，不必排序整張影像
+        與 np.percentile（線性內插）結果相同；mask 不為 None 時只統計遮罩內的像素
+        """
+        hist = cv2.calcHist([channel], [0], mask, [256], [0, 256]).ravel()
+        cum = np.cumsum(hist)
+        if cum[-1] == 0:
+            return 0.0
+        pos = (cum[-1] - 1) * q / 100.0
+        lo, hi = int(math.floor(pos)), int(math.ceil(pos))
+        # 排序後第 k 個值 = 累積次數第一次超過 k 的灰階
+        v_lo = int(np.searchsorted(cum, lo, side="right"))
+        v_hi = int(np.searchsorted(cum, hi, side="right"))
+        return v_lo + (v_hi - v_lo) * (pos - lo)
+
+    def _preprocess_red_mask(self, img_bgr, hsv=None, lab=None, roi=None):
         """
         回傳更穩定的紅色遮罩：
         - HSV 兩段紅 + 自適應 S/V 下限（使用百分位數）
         - Lab a* 強化紅色
         - 開閉運算去雜訊
+        hsv / lab：已算好的轉換（FrameContext），不會被修改；未提供時自行計算
+        roi：搜尋環遮罩（None = 整個視窗）；百分位數只統計環內像素，環外的紅色不會成為候選
+        百分位數由直方圖求得；紅色判斷拆成色相查表與 S/V/a* 單通道門檻，不再 merge 回三通道做 inRange
         """
-        hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+        shape = img_bgr.shape[:2]
+        if hsv is None:
+            hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV, dst=_buffers.get("red_hsv", img_bgr.shape))
+
+        h = cv2.extractChannel(hsv, 0, dst=_buffers.get("red_h", shape))
+        s = cv2.extractChannel(hsv, 1, dst=_buffers.get("red_s", shape))
+        v = cv2.extractChannel(hsv, 2, dst=_buffers.get("red_v", shape))
 
-        # 對 V 做 CLAHE 提升陰影區辨識
-        h, s, v = cv2.split(hsv)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        v = clahe.apply(v)
-        hsv = cv2.merge([h, s, v])
+        # 對 V 做 CLAHE 提升陰影區辨識（CLAHE 物件每個偵測器建一次）
+        if self._clahe is None:
+            self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        v = self._clahe.apply(v, dst=_buffers.get("red_v_eq", shape))
 
         # 自適應 S/V 下界（避免過暗或過灰被忽略）
-        s_floor = int(np.percentile(s.flatten(), 70))
-        v_floor = int(np.percentile(v.flatten(), 50))
+        s_floor = int(self._hist_percentile(s, 70, roi))
+        v_floor = int(self._hist_percentile(v, 50, roi))
         s_floor = max(60, min(180, s_floor - 10))
         v_floor = max(60, min(180, v_floor - 10))
 
-        mask1 = cv2.inRange(hsv, (0,   s_floor, v_floor), (10, 255, 255))
-        mask2 = cv2.inRange(hsv, (170, s_floor, v_floor), (180, 255, 255))
-        mask_hsv = cv2.bitwise_or(mask1, mask2)
+        # 紅色色相 且 S >= s_floor 且 V >= v_floor
+        mask_hsv = cv2.LUT(h, self._RED_HUE_LUT, dst=_buffers.get("red_m1", shape))
+        m = cv2.threshold(s, s_floor - 1, 255, cv2.THRESH_BINARY, dst=_buffers.get("red_m2", shape))[1]
+        cv2.bitwise_and(mask_hsv, m, dst=mask_hsv)
+        m = cv2.threshold(v, v_floor - 1, 255, cv2.THRESH_BINARY, dst=m)[1]
+        cv2.bitwise_and(mask_hsv, m, dst=mask_hsv)
 
         # Lab a* 強化紅（a* 偏高代表偏紅）
-        lab = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB)
-        a = lab[:,:,1]
-        a_thr = int(np.percentile(a.flatten(), 85))  # 偏嚴格，避免白/橙誤判
-        mask_a = (a > a_thr).astype(np.uint8) * 255
+        if lab is None:
+            lab = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB, dst=_buffers.get("red_lab", img_bgr.shape))
+        a = cv2.extractChannel(lab, 1, dst=_buffers.get("red_a", shape))
+        a_thr = int(self._hist_percentile(a, 85, roi))  # 偏嚴格，避免白/橙誤判
+        mask_a = cv2.threshold(a, a_thr, 255, cv2.THRESH_BINARY, dst=m)[1]
 
-        mask = cv2.bitwise_and(mask_hsv, mask_a)
+        mask = cv2.bitwise_and(mask_hsv, mask_a, dst=mask_hsv)
+        if roi is not None:
+            mask = cv2.bitwise_and(mask, roi, dst=mask)
 
         # 去雜訊（先開再閉）
-        mask = cv2.medianBlur(mask, 3)
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5,5))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+        mask = cv2.medianBlur(mask, 3, dst=_buffers.get("red_mask", shape))
+        kernel = self._RED_MORPH_KERNEL
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=mask, iterations=1)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, dst=mask, iterations=1)
         return mask
 
-    def _score_arrow_candidate(self, cnt, center_xy):
+    @staticmethod
+    def _segment_argmax(values, seg_start, seg_len):
+        """每段（seg_start, seg_len）中最大值的全域索引（同值取第一個）"""
+        seg_max = np.maximum.reduceat(values, seg_start)
+        seg_id = np.repeat(np.arange(len(seg_start)), seg_len)
+        hit = np.flatnonzero(values == seg_max[seg_id])
+        # 每段第一個命中位置
+        first = np.unique(seg_id[hit], return_index=True)[1]
+        return hit[first]
+
+    def _score_arrow_candidates(self, cnts, center_xy):
         """
-        對候選輪廓評分並求方向：
-        - 盡量以「最銳利頂點」當箭頭尖端；找不到就用「距中心最遠點」
-        - 回傳 (score, angle_deg, top_left, has_acute_tip)
+        一次為一張影格的所有候選輪廓評分並求方向，回傳最佳的 (score, angle_deg, top_left, has_acute_tip)
+        沒有合格候選時回傳 (-1, None, None, False)
+        - 面積、extent、solidity、circularity 依序篩選（每一關只算剩下的輪廓）
+        - 多邊形近似後所有頂點串成一個陣列，內角一次算完，各輪廓取最小內角頂點當箭頭尖端（< 70° 才算尖）
+        - 沒有銳角尖端的輪廓改用相對人物中心最遠點
+        綜合評分：面積、extent、solidity、是否有銳角尖端、長寬比（與逐一評分相同，同分取先出現的輪廓）
         """
-        area = cv2.contourArea(cnt)
-        if area < self.min_area:
-            return -1, None, None, False
-
-        x, y, w, h = cv2.boundingRect(cnt)
-        rect_area = max(w*h, 1)
-        extent = area / rect_area
-        if not (0.30 <= extent <= 0.92):
-            return -1, None, None, False
-
-        hull = cv2.convexHull(cnt)
-        hull_area = cv2.contourArea(hull) or 1
+        none = (-1, None, None, False)
+        if not cnts:
+            return none
+        idx = np.arange(len(cnts))
+        area = np.array([cv2.contourArea(c) for c in cnts])
+        keep = area >= self.min_area
+        idx, area = idx[keep], area[keep]
+        if len(idx) == 0:
+            return none
+
+        rects = np.array([cv2.boundingRect(cnts[i]) for i in idx])
+        extent = area / np.maximum(rects[:, 2] * rects[:, 3], 1)
+        keep = (extent >= 0.30) & (extent <= 0.92)
+        idx, area, rects, extent = idx[keep], area[keep], rects[keep], extent[keep]
+        if len(idx) == 0:
+            return none
+
+        hull_area = np.array([cv2.contourArea(cv2.convexHull(cnts[i])) for i in idx])
+        hull_area[hull_area == 0] = 1
         solidity = area / hull_area
-        if solidity < 0.70:  # 稍微放寬，因為箭頭尖端會降低 solidity
-            return -1, None, None, False
+        keep = solidity >= 0.70  # 稍微放寬，因為箭頭尖端會降低 solidity
+        idx, area, rects, extent, solidity = idx[keep], area[keep], rects[keep], extent[keep], solidity[keep]
+        if len(idx) == 0:
+            return none
 
-        peri = cv2.arcLength(cnt, True) or 1
+        peri = np.array([cv2.arcLength(cnts[i], True) for i in idx])
+        peri[peri == 0] = 1
         circularity = 4 * math.pi * area / (peri * peri)
-        if circularity > 0.85:  # 越圓越不像箭頭
-            return -1, None, None, False
-
-        # 多邊形近似，找最小內角的頂點（箭頭尖端）
-        eps = 0.02 * peri
-        approx = cv2.approxPolyDP(cnt, eps, True)
-        pts = approx.reshape(-1, 2).astype(np.float32)
-
-        has_acute_tip = False
-        tip = None
-        if len(pts) >= 3:
-            min_angle = 1e9
-            for i in range(len(pts)):
-                a = pts[(i-1) % len(pts)]
-                b = pts[i]
-                c = pts[(i+1) % len(pts)]
-                ang = self._internal_angle_deg(a, b, c)
-                if ang < min_angle:
-                    min_angle = ang
-                    tip = b
-            if min_angle < 70:  # 夠尖，視為箭頭
-                has_acute_tip = True
+        keep = circularity <= 0.85  # 越圓越不像箭頭
+        idx, area, rects, extent, solidity, peri = (idx[keep], area[keep], rects[keep], extent[keep],
+                                                    solidity[keep], peri[keep])
+        n = len(idx)
+        if n == 0:
+            return none
+
+        # 多邊形近似的頂點串接：b 為頂點，a / c 為同一多邊形中的前後頂點
+        polys = [cv2.approxPolyDP(cnts[i], 0.02 * p, True).reshape(-1, 2) for i, p in zip(idx, peri)]
+        plen = np.array([len(q) for q in polys])
+        pstart = np.concatenate(([0], np.cumsum(plen)[:-1]))
+        b = np.concatenate(polys).astype(np.float64)
+        seg = np.repeat(np.arange(n), plen)
+        local = np.arange(len(b)) - pstart[seg]
+        a = b[pstart[seg] + (local - 1) % plen[seg]]
+        c = b[pstart[seg] + (local + 1) % plen[seg]]
+        v1, v2 = a - b, c - b
+        cosang = (v1 * v2).sum(axis=1) / ((np.hypot(v1[:, 0], v1[:, 1]) + 1e-9) * (np.hypot(v2[:, 0], v2[:, 1]) + 1e-9))
+        inner = np.degrees(np.arccos(np.clip(cosang, -1.0, 1.0)))
+
+        tips = np.zeros((n, 2))
+        has_acute_tip = np.zeros(n, bool)
+        tri = plen >= 3
+        if tri.any():
+            # 少於 3 個頂點的多邊形沒有內角，填 +inf 讓它們不會被選到
+            inner[~tri[seg]] = np.inf
+            tip_i = self._segment_argmax(-inner, pstart, plen)
+            min_angle = inner[tip_i]
+            has_acute_tip = tri & (min_angle < 70)  # 夠尖，視為箭頭
+            tips[has_acute_tip] = b[tip_i[has_acute_tip]]
 
         cx, cy = center_xy
-        if tip is None or not has_acute_tip:
+        far = np.flatnonzero(~has_acute_tip)
+        if len(far):
             # 退而求其次：用相對人物中心最遠點
-            cnt_pts = cnt.reshape(-1, 2).astype(np.float32)
-            d2 = np.square(cnt_pts[:,0]-cx) + np.square(cnt_pts[:,1]-cy)
-            tip = cnt_pts[int(np.argmax(d2))]
-
-        dx = float(tip[0] - cx)
-        dy = float(tip[1] - cy)
-        angle_deg = (math.degrees(math.atan2(dx, -dy)) + 360) % 360
-
-        # 綜合評分：面積、extent、solidity、是否有銳角尖端、長寬比
-        ar = w / max(h, 1)
-        ar_score = 1.0 if 0.4 <= ar <= 2.8 else 0.7
-        tip_bonus = 1.25 if has_acute_tip else 1.0
+            pts = [cnts[idx[k]].reshape(-1, 2) for k in far]
+            clen = np.array([len(q) for q in pts])
+            cstart = np.concatenate(([0], np.cumsum(clen)[:-1]))
+            allp = np.concatenate(pts).astype(np.float64)
+            d2 = np.square(allp[:, 0] - cx) + np.square(allp[:, 1] - cy)
+            tips[far] = allp[self._segment_argmax(d2, cstart, clen)]
+
+        angle_deg = (np.degrees(np.arctan2(tips[:, 0] - cx, -(tips[:, 1] - cy))) + 360) % 360
+
+        ar = rects[:, 2] / np.maximum(rects[:, 3], 1)
+        ar_score = np.where((ar >= 0.4) & (ar <= 2.8), 1.0, 0.7)
+        tip_bonus = np.where(has_acute_tip, 1.25, 1.0)
         score = area * (0.45 + 0.25*extent + 0.20*solidity + 0.10*ar_score) * tip_bonus
 
-        return score, angle_deg, (int(x), int(y)), has_acute_tip
+        k = int(np.argmax(score))
+        x, y = rects[k, :2]
+        return float(score[k]), float(angle_deg[k]), (int(x), int(y)), bool(has_acute_tip[k])
+
+    def _arrow_annulus(self, r, inner):
+        """
+        半徑 r 的箭頭搜尋環遮罩（2r x 2r，圓心在 (r, r)）：inner <= 距離 <= r 為 255
+        依 (r, inner) 快取；中間的人物本身與圓外的四角都不參與箭頭偵測
+        """
+        key = (int(r), int(inner))
+        roi = self._annulus_masks.get(key)
+        if roi is None:
+            size = int(round(2*r))
+            yy, xx = np.mgrid[:size, :size]
+            d2 = (xx - r + 0.5)**2 + (yy - r + 0.5)**2
+            roi = ((d2 <= r*r) & (d2 >= inner*inner)).astype(np.uint8) * 255
+            self._annulus_masks[key] = roi
+        return roi
+
+    def _arrow_roi(self, region, ux, uy):
+        """
+        實際視窗 region 對應的搜尋環遮罩；(ux, uy) 為未截邊前 2r x 2r 視窗的左上角
+        視窗被螢幕邊緣截掉時取對應部分，環外補 0；未啟用搜尋環回傳 None
+        """
+        if not self.arrow_annulus:
+            return None
+        sx, sy, sw, sh = region
+        ring = self._arrow_annulus(self.arrow_search_radius, self.arrow_inner_radius)
+        roi = ring[max(0, sy - uy):sy - uy + sh, max(0, sx - ux):sx - ux + sw]
+        if roi.shape != (sh, sw):
+            full = np.zeros((sh, sw), np.uint8)
+            ox, oy = max(0, ux - sx), max(0, uy - sy)
+            full[oy:oy + roi.shape[0], ox:ox + roi.shape[1]] = roi
+            roi = full
+        return roi
+
+    def _arrow_window(self, search_center_x, search_center_y):
+        """箭頭搜尋窗：回傳 (未夾限的左上角 x, y, 夾在螢幕內的區域)"""
+        r = self.arrow_search_radius
+        ux = int(round(search_center_x - r))
+        uy = int(round(search_center_y - r))
+        return ux, uy, clamp_region_to_screen(ux, uy, int(round(2*r)), int(round(2*r)))
+
+    def arrow_red_count(self, search_center_x, search_center_y, frame=None):
+        """
+        箭頭存在探針：搜尋環內「可能是紅色」的像素數（色相查表 + 固定的寬鬆 S/V 下限）
+        不做 CLAHE、百分位數、形態學與輪廓分析，每次不到 1 毫秒；擷取失敗回傳 None
+        門檻取完整流程自適應下限的最低值，完整流程認得的紅色一定會被算到
+        """
+        ux, uy, (sx, sy, sw, sh) = self._arrow_window(search_center_x, search_center_y)
+        try:
+            if frame is None:
+                frame = self.frame_source.latest()
+            frame, region = self.frame_source.frame_for((sx, sy, sw, sh), frame)
+            hsv = frame.context.hsv(region)
+        except Exception as e:
+            print(f"[箭頭探針] 擷取失敗: {e}")
+            return None
+        if hsv is None or hsv.size == 0:
+            return None
+
+        shape = hsv.shape[:2]
+        red = cv2.LUT(cv2.extractChannel(hsv, 0, dst=_buffers.get("probe_h", shape)),
+                      self._RED_HUE_LUT, dst=_buffers.get("probe_red", shape))
+        sv = cv2.inRange(hsv, (0, 60, 60), (255, 255, 255), dst=_buffers.get("probe_sv", shape))
+        cv2.bitwise_and(red, sv, dst=red)
+        roi = self._arrow_roi(region, ux, uy)
+        if roi is not None:
+            cv2.bitwise_and(red, roi, dst=red)
+        count = cv2.countNonZero(red)
+        self.breathing.observe(frame.timestamp, count)
+        return count
+
+    def arrow_present(self, search_center_x, search_center_y, cfg, frame=None):
+        """
+        探針判斷箭頭是否還在（遲滯門檻，見 ArrowPresenceProbe）
+        ARROW_PROBE_ENABLED 關閉或探針失敗時回傳 True，交給完整角度流程判斷
+        """
+        if not cfg.get("ARROW_PROBE_ENABLED", True):
+            return True
+        count = self.arrow_red_count(search_center_x, search_center_y, frame)
+        if count is None:
+            return True
+        return self.probe.observe(count)
 
-    def find_arrow_by_color(self, search_center_x, search_center_y):
+    def find_arrow_by_color(self, search_center_x, search_center_y, frame=None):
         """
         升級版：HSV+Lab 遮罩 + 尖端導向 + 穩定評分
+        frame：共用影格（None 時只擷取箭頭搜尋窗）
         回： (top_left_global, 1.0, angle_deg) 或 (None, None, None)
         """
         try:
             r = self.arrow_search_radius
-            sx = int(round(search_center_x - r))
-            sy = int(round(search_center_y - r))
-            sw = sh = int(round(2*r))
-            sx, sy, sw, sh = clamp_region_to_screen(sx, sy, sw, sh)
+            ux, uy, (sx, sy, sw, sh) = self._arrow_window(search_center_x, search_center_y)
 
             try:
-                pil_img = pyautogui.screenshot(region=(sx, sy, sw, sh))
+                frame, region = self.frame_source.frame_for((sx, sy, sw, sh), frame)
+                sx, sy, sw, sh = region
             except pyautogui.PyAutoGUIException as e:
                 print(f"[警告] 螢幕截圖失敗: {e}")
                 return None, None, None
@@ -2049,17 +3860,17 @@ class ArrowDetector:
                 print(f"[警告] 螢幕截圖異常: {e}")
                 return None, None, None
 
-            if pil_img is None:
-                print("[警告] 螢幕截圖返回空值")
-                return None, None, None
-
             try:
-                img = np.array(pil_img)[:, :, ::-1]  # to BGR
-                if img.size == 0:
+                img = frame.context.bgr(region)  # 已是 BGR，不需再翻轉通道
+                if img is None or img.size == 0:
                     print("[警告] 截圖圖像為空")
                     return None, None, None
                     
-                mask = self._preprocess_red_mask(img)
+                # 搜尋環（視窗被螢幕邊緣截掉時取對應的部分）
+                roi = self._arrow_roi(region, ux, uy)
+
+                # HSV / Lab 取自影格快取，與圓環偵測等共用
+                mask = self._preprocess_red_mask(img, frame.context.hsv(region), frame.context.lab(region), roi)
             except Exception as e:
                 print(f"[警告] 圖像處理失敗: {e}")
                 return None, None, None
@@ -2071,16 +3882,12 @@ class ArrowDetector:
                 print(f"[警告] 輪廓檢測失敗: {e}")
                 return None, None, None
 
-            best = (-1, None, None, False)  # (score, angle, top_left, tipflag)
-            for c in cnts:
-                try:
-                    # 將局部座標換算為全域前，先用局部判斷
-                    score, ang, tl, tip_ok = self._score_arrow_candidate(c, center_xy=(r, r))
-                    if score > best[0]:
-                        best = (score, ang, tl, tip_ok)
-                except Exception as e:
-                    print(f"[警告] 箭頭候選評分失敗: {e}")
-                    continue
+            # 將局部座標換算為全域前，先用局部判斷（所有候選一次評分）
+            try:
+                best = self._score_arrow_candidates(cnts, center_xy=(ux - sx + r, uy - sy + r))  # (score, angle, top_left, tipflag)
+            except Exception as e:
+                print(f"[警告] 箭頭候選評分失敗: {e}")
+                return None, None, None
 
             if best[0] < 0 or best[1] is None:
                 return None, None, None
@@ -2098,45 +3905,88 @@ class ArrowDetector:
             print(f"[錯誤] 箭頭顏色偵測異常: {e}")
             return None, None, None
 
+    def _arrow_sample_frames(self, window_time, frame=None, center=None):
+        """
+        依時間窗產生箭頭取樣用的影格：
+        - 背景串流中：每次取環形緩衝裡「比上一張新」的最新影格，落後時舊影格直接丟棄，不再 sleep 輪詢
+        - 未串流：產生 None（由 find_arrow_by_color 自行截圖），樣本間 sleep(self.poll)
+        frame：第一個樣本使用的共用影格
+        center：箭頭搜尋中心；給定且啟用相位鎖定時，每個樣本先以探針記錄紅色像素數（估計呼吸相位），
+        鎖定後暗相位不取樣，直接等到下一個亮相位（等不到就結束這個時間窗）
+        """
+        t0 = time.time()
+        deadline = t0 + window_time
+        last_ts = frame.timestamp if frame is not None else t0
+        lock = self.phase_lock and center is not None
+        if frame is not None:
+            if lock:
+                self.arrow_red_count(center[0], center[1], frame)
+            yield frame
+            if not self.frame_source.streaming:
+                time.sleep(self.poll)
+        while time.time() < deadline:
+            if lock:
+                wait = self.breathing.wait_time(time.time())
+                if wait > 0:
+                    if time.time() + wait >= deadline:
+                        return
+                    time.sleep(wait)
+            if self.frame_source.streaming:
+                f = self.frame_source.next_frame(last_ts, timeout=deadline - time.time())
+                if f is None:
+                    return
+                last_ts = f.timestamp
+            elif lock:
+                # 先截箭頭窗給探針，同一張影格再交給 find_arrow_by_color
+                try:
+                    f = self.frame_source.capture(self._arrow_window(center[0], center[1])[2])
+                except Exception as e:
+                    print(f"[箭頭取樣] 擷取失敗: {e}")
+                    f = None
+            else:
+                f = None
+            if lock and f is not None:
+                self.arrow_red_count(center[0], center[1], f)
+            yield f
+            if not self.frame_source.streaming:
+                time.sleep(self.poll)
+
+    def _angle_decided(self, angles, min_samples):
+        """序貫停止：樣本數夠且均值的 95% 信賴區間半寬 <= decision_ci_deg，方向已確定到可以拖曳"""
+        if len(angles) < max(2, min_samples):
+            return False
+        hw = angles.mean_halfwidth()
+        return hw is not None and hw <= self.decision_ci_deg
+
     def wait_for_arrow(self, center_x, center_y):
         """
         收集樣本直到：
         - 命中數量 >= min_hits，且
-        - 角度「環向標準差」足夠小（例如 <= 14°）→ 早收斂
+        - 角度均值的信賴區間夠窄（_angle_decided）→ 早收斂，樣本越一致越早返回
         超時仍不足則維持舊邏輯。
         """
-        angles = []
+        angles = CircularAccumulator()
         last_loc = None
-        t0 = time.time()
-
-        # 可視情況微調
-        early_stop_std_deg = 14.0
 
         try:
-            while time.time() - t0 < self.timeout:
+            for frame in self._arrow_sample_frames(self.timeout, center=(center_x, center_y)):
                 try:
-                    loc, _, ang = self.find_arrow_by_color(center_x, center_y)
+                    loc, _, ang = self.find_arrow_by_color(center_x, center_y, frame=frame)
                     if loc is not None and ang is not None:
-                        angles.append(ang)
+                        angles.add(ang)
                         last_loc = loc
 
-                        if len(angles) >= self.min_hits:
-                            mean_deg, R, std_deg = self._circular_stats(angles)
-                            # 集中度高（std 小）則提前返回
-                            if std_deg is not None and std_deg <= early_stop_std_deg:
-                                return last_loc, mean_deg, len(angles)
+                        if self._angle_decided(angles, self.min_hits):
+                            return last_loc, angles.mean(), len(angles)
                 except Exception as e:
                     print(f"[警告] 等待箭頭時偵測異常: {e}")
                     pass
-                    
-                time.sleep(self.poll)
         except Exception as e:
             print(f"[錯誤] 等待箭頭過程異常: {e}")
 
         if len(angles) >= self.min_hits:
             try:
-                mean_deg, _, _ = self._circular_stats(angles)
-                return last_loc, mean_deg, len(angles)
+                return last_loc, angles.mean(), len(angles)
             except Exception as e:
                 print(f"[錯誤] 箭頭角度統計異常: {e}")
                 return None, None, 0
@@ -2176,32 +4026,28 @@ class ArrowDetector:
             except:
                 pass     
 
-    def _circular_stats(self, angles_deg):
-        if not angles_deg:
-            return None, 0.0, None
-        ang = np.deg2rad(np.array(angles_deg, dtype=np.float64))
-        C = np.cos(ang).sum(); S = np.sin(ang).sum()
-        n = max(len(angles_deg), 1)
-        R = np.sqrt(C*C + S*S) / n
-        mean_deg = (math.degrees(math.atan2(S, C)) + 360) % 360
-        R = max(min(R, 0.999999), 1e-6)
-        std_deg = math.degrees(math.sqrt(-2.0 * math.log(R)))
-        return mean_deg, R, std_deg
-
-    def _sample_angle_window(self, cx, cy, window_time):
+    def _sample_angle_window(self, cx, cy, window_time, frame=None):
+        """
+        短窗取樣箭頭角度；frame 為共用影格時第一個樣本直接使用它（與人物偵測同一時刻）
+        序貫停止：方向一確定（_angle_decided）就提前結束；時間窗到了但樣本彼此不一致時，
+        最多延長到 window_time × decision_extend（完全沒命中則不延長，交給呼叫端處理消失）
+        """
+        angles = CircularAccumulator(); last_loc = None
         t0 = time.time()
-        angles = []; last_loc = None
         try:
-            while time.time() - t0 < window_time:
+            for sample_frame in self._arrow_sample_frames(window_time * self.decision_extend, frame, center=(cx, cy)):
                 try:
-                    loc, _, ang = self.find_arrow_by_color(cx, cy)
+                    loc, _, ang = self.find_arrow_by_color(cx, cy, frame=sample_frame)
                     if loc is not None and ang is not None:
-                        angles.append(ang); last_loc = loc
+                        angles.add(ang); last_loc = loc
                 except Exception as e:
                     # 箭頭偵測失敗，記錄錯誤但繼續嘗試
                     print(f"[警告] 箭頭偵測異常: {e}")
                     pass
-                time.sleep(self.poll)
+                if self._angle_decided(angles, self.decision_min_samples):
+                    break
+                if time.time() - t0 >= window_time and not angles:
+                    break
         except Exception as e:
             # 整個取樣窗口失敗
             print(f"[錯誤] 角度取樣窗口異常: {e}")
@@ -2211,7 +4057,7 @@ class ArrowDetector:
             return None, None, None, 0
         
         try:
-            mean, _, std = self._circular_stats(angles)
+            mean, _, std = angles.stats()
             return last_loc, mean, std, len(angles)
         except Exception as e:
             print(f"[錯誤] 角度統計計算異常: {e}")
@@ -2222,186 +4068,44 @@ class ArrowDetector:
 
     def _dynamic_drag_with_feedback(self, cx, cy, initial_angle_deg, max_hold_seconds, cfg, log_fn=None):
         """
-        動態拖曳：在拖曳過程中持續偵測箭頭方向並動態調整
+        動態拖曳：在拖曳過程中持續偵測箭頭方向並動態調整（DragController）
         - 如果箭頭方向保持一致，繼續拖曳直到max_hold_seconds
-        - 如果箭頭方向改變超過閾值，立即停止
+        - 如果箭頭方向改變超過閾值，立即停止；小幅偏差時平滑修正目標點
         - 處理呼吸式箭頭：短暫消失不中斷，持續消失才停止
+        偵測在感知執行緒進行，控制迴圈以固定頻率執行，不受偵測耗時影響
+        回傳放開時感知執行緒的最新估計（PerceptionEstimate 或 None）
         """
-        def log(msg):
-            if log_fn:
-                log_fn(msg)
-        
-        sw, sh = pyautogui.size()
-        
-        # 拖曳參數
-        check_interval = float(cfg.get("DRAG_FEEDBACK_INTERVAL", 0.15))  # 每0.15秒檢查一次
-        angle_tolerance = float(cfg.get("DRAG_ANGLE_TOLERANCE", 25.0))   # 角度變化容忍度
-        min_drag_time = float(cfg.get("DRAG_MIN_TIME", 0.3))             # 最短拖曳時間
-        
-        # 呼吸式箭頭處理參數
-        breathing_cycle = float(cfg.get("ARROW_BREATHING_CYCLE", 1.0))   # 呼吸週期（秒）
-        miss_tolerance_time = float(cfg.get("ARROW_MISS_TOLERANCE_TIME", 0.5))  # 容忍消失時間
-        direction_change_threshold = int(cfg.get("DIRECTION_CHANGE_THRESHOLD", 3))  # 方向改變確認次數
-        
-        # 計算初始目標位置
-        rad = math.radians(initial_angle_deg)
-        dx = self.drag_distance * math.sin(rad)
-        dy = -self.drag_distance * math.cos(rad)
-        tx = max(0, min(sw - 1, cx + dx))
-        ty = max(0, min(sh - 1, cy + dy))
-        
-        cx = int(round(cx)); cy = int(round(cy))
-        tx = int(round(tx)); ty = int(round(ty))
-        
-        log(f"[動態拖曳] 開始：角度{initial_angle_deg:.1f}°，最長{max_hold_seconds:.2f}s（處理呼吸式箭頭）")
-        
-        # 開始拖曳
-        pyautogui.moveTo(cx, cy)
-        pyautogui.mouseDown(button=self.drag_button)
-        pyautogui.moveTo(tx, ty, duration=min(self.drag_seconds, 0.05))
-        
-        drag_start_time = time.time()
-        last_check_time = drag_start_time
-        total_corrections = 0
-        
-        # 呼吸式箭頭追蹤變數
-        consecutive_misses = 0
-        miss_start_time = None
-        consecutive_direction_changes = 0
-        last_valid_angle = initial_angle_deg
-        angle_history = []  # 記錄最近的角度變化
-        
-        try:
-            while True:
-                current_time = time.time()
-                elapsed = current_time - drag_start_time
-                
-                # 檢查是否達到最長時間
-                if elapsed >= max_hold_seconds:
-                    log(f"[動態拖曳] 達到最長時間{max_hold_seconds:.2f}s，結束")
-                    break
-                
-                # 檢查是否到了檢查間隔
-                if current_time - last_check_time >= check_interval and elapsed >= min_drag_time:
-                    # 重新偵測箭頭方向
-                    try:
-                        updated_center_loc, updated_scale = self.find_character(cfg)
-                        if updated_center_loc and updated_scale:
-                            updated_cx = updated_center_loc[0] + (self.template_width * updated_scale) / 2
-                            updated_cy = updated_center_loc[1] + (self.template_height * updated_scale) / 2
-                        else:
-                            updated_cx, updated_cy = cx, cy
-                    except Exception as e:
-                        print(f"[警告] 動態拖曳中人物偵測異常: {e}")
-                        updated_cx, updated_cy = cx, cy
-                    
-                    # 快速檢測當前箭頭角度（短窗口）
-                    try:
-                        _, current_angle, current_std, hits = self._sample_angle_window(
-                            updated_cx, updated_cy, window_time=max(self.poll*2, 0.1)
-                        )
-                    except Exception as e:
-                        print(f"[警告] 動態拖曳中角度偵測異常: {e}")
-                        # 偵測失敗，視為箭頭消失
-                        current_angle, current_std, hits = None, None, 0
-                    
-                    if hits == 0:
-                        # 箭頭未檢測到
-                        consecutive_misses += 1
-                        if miss_start_time is None:
-                            miss_start_time = current_time
-                        
-                        miss_duration = current_time - miss_start_time
-                        
-                        # 檢查是否為呼吸式暫時消失
-                        if miss_duration < miss_tolerance_time:
-                            # 在容忍時間內，可能是呼吸式閃爍，繼續等待
-                            if consecutive_misses == 1:  # 只在第一次記錄
-                                log(f"[動態拖曳] 箭頭暫時消失，等待呼吸式恢復...")
-                        else:
-                            # 超過容忍時間，可能真的消失了
-                            log(f"[動態拖曳] 箭頭持續消失{miss_duration:.2f}s，可能已到達目標，結束拖曳（已拖{elapsed:.2f}s）")
-                            break
-                    else:
-                        # 檢測到箭頭，重置消失計數
-                        if consecutive_misses > 0:
-                            log(f"[動態拖曳] 箭頭恢復檢測，繼續拖曳")
-                        consecutive_misses = 0
-                        miss_start_time = None
-                        
-                        if current_angle is not None:
-                            angle_diff = self._angle_diff(initial_angle_deg, current_angle)
-                            
-                            # 記錄角度歷史（最多保留最近5個）
-                            angle_history.append(current_angle)
-                            if len(angle_history) > 5:
-                                angle_history.pop(0)
-                            
-                            # 檢查方向是否持續改變
-                            significant_change = angle_diff > angle_tolerance
-                            
-                            if significant_change:
-                                consecutive_direction_changes += 1
-                                
-                                # 需要多次確認才停止（避免呼吸式閃爍造成的誤判）
-                                if consecutive_direction_changes >= direction_change_threshold:
-                                    log(f"[動態拖曳] 方向持續改變{consecutive_direction_changes}次，"
-                                        f"最終偏差{angle_diff:.1f}°>容忍{angle_tolerance}°，確認方向錯誤，停止拖曳（已拖{elapsed:.2f}s）")
-                                    break
-                                else:
-                                    log(f"[動態拖曳] 檢測到方向改變{angle_diff:.1f}°（第{consecutive_direction_changes}/{direction_change_threshold}次），繼續確認...")
-                            else:
-                                # 方向正常，重置計數
-                                consecutive_direction_changes = 0
-                                
-                                # 如果角度變化不大但有微調空間，可以調整目標位置
-                                if 8.0 < angle_diff <= 15.0 and total_corrections < 2:  # 允許小幅修正
-                                    # 重新計算目標位置
-                                    new_rad = math.radians(current_angle)
-                                    new_dx = self.drag_distance * math.sin(new_rad)
-                                    new_dy = -self.drag_distance * math.cos(new_rad)
-                                    new_tx = max(0, min(sw - 1, updated_cx + new_dx))
-                                    new_ty = max(0, min(sh - 1, updated_cy + new_dy))
-                                    
-                                    # 平滑調整到新位置
-                                    pyautogui.moveTo(int(new_tx), int(new_ty), duration=0.1)
-                                    total_corrections += 1
-                                    log(f"[動態拖曳] 微調方向：{initial_angle_deg:.1f}°→{current_angle:.1f}° (第{total_corrections}次)")
-                                    initial_angle_deg = current_angle  # 更新基準角度
-                            
-                            last_valid_angle = current_angle
-                    
-                    last_check_time = current_time
-                
-                # 短暫休眠
-                time.sleep(0.05)
-                
-        finally:
-            try:
-                pyautogui.mouseUp(button=self.drag_button)
-            except Exception as e:
-                print(f"[警告] 滑鼠釋放失敗: {e}")
-                # 嘗試強制釋放滑鼠
-                try:
-                    pyautogui.mouseUp()
-                except Exception as e2:
-                    print(f"[錯誤] 強制滑鼠釋放也失敗: {e2}")
-            
-            try:
-                final_elapsed = time.time() - drag_start_time
-                log(f"[動態拖曳] 完成：實際拖曳{final_elapsed:.2f}s，微調{total_corrections}次，方向改變確認{consecutive_direction_changes}次")
-            except Exception as e:
-                print(f"[警告] 動態拖曳完成記錄失敗: {e}")
+        return DragController(self, cfg, log_fn).run(cx, cy, initial_angle_deg, max_hold_seconds)
+
+    def _fresh_estimate(self, estimate, cfg):
+        """
+        上一次拖曳放開時的估計能否直接作為下一次拖曳的起點：
+        放開時箭頭仍在畫面上、最後一個角度樣本在 PERCEPTION_MAX_AGE 秒內，且窗內樣本數 >= decision_min_samples
+        """
+        max_age = float(cfg.get("PERCEPTION_MAX_AGE", 0.3))
+        if estimate is None or not estimate.present or estimate.angle is None or estimate.last_hit is None or max_age <= 0:
+            return False
+        if estimate.samples < self.decision_min_samples:
+            return False
+        return time.time() - estimate.last_hit <= max_age
 
-    def _hold_drag_seconds(self, cx, cy, angle_deg, hold_seconds):
+    def _hold_drag_seconds(self, cx, cy, angle_deg, hold_seconds, cfg=None, log_fn=None):
         """
         固定速度場景：用「握住多久」決定走多遠
         流程：
           1) mouseDown 在人物中心
           2) 快速把游標丟到方向射線上固定距離（drag_distance）
-          3) 停留 hold_seconds（保持 mouseDown）
+          3) 停留 hold_seconds（保持 mouseDown）；有 cfg 時感知執行緒持續量測（DragController steer=False），
+             到達/卡住/超過或箭頭持續消失就提早放開
           4) mouseUp
+        回傳放開時感知執行緒的最新估計（沒有 cfg 或失敗時為 None）
         """
+        if cfg is not None:
+            try:
+                return DragController(self, cfg, log_fn, steer=False).run(cx, cy, angle_deg, hold_seconds)
+            except Exception as e:
+                print(f"[錯誤] 固定拖曳整體異常: {e}")
+                return None
         try:
             sw, sh = pyautogui.size()
             rad = math.radians(angle_deg)
@@ -2437,17 +4141,57 @@ class ArrowDetector:
             except:
                 pass
 
+    def _measure_for_guide(self, get_center_fn, cfg, log):
+        """
+        導航每回合的量測：重新找人物中心（避免被移動後偏差），人物與第一個箭頭樣本共用同一張影格
+        回傳 (cx, cy, 角度均值, std, 命中數)；人物完全找不到時 cx 為 None
+        """
+        frame = self.frame_source.grab()
+        try:
+            center = self.character_center(cfg, frame=frame)
+            if center is not None:
+                cx, cy = center
+            else:
+                cx, cy = get_center_fn()
+        except Exception as e:
+            print(f"[警告] 導航中人物偵測異常: {e}")
+            try:
+                cx, cy = get_center_fn()
+            except Exception as e2:
+                print(f"[錯誤] 無法獲取人物中心位置: {e2}")
+                log("[導航] 人物偵測失敗，結束導航")
+                return None, None, None, None, 0
+
+        # 箭頭存在探針：箭頭不在就省下整個取樣窗，直接走「找不到箭頭」流程
+        if not self.arrow_present(cx, cy, cfg, frame=frame):
+            hits = 0
+            mean = std = None
+        else:
+            # 取短窗角度樣本
+            try:
+                _, mean, std, hits = self._sample_angle_window(cx, cy, window_time=max(self.poll*4, 0.25), frame=frame)
+            except Exception as e:
+                print(f"[警告] 導航中角度取樣異常: {e}")
+                hits = 0
+                mean = std = None
+            # 探針剛才就是量這張影格，直接以完整流程結果校正門檻
+            if cfg.get("ARROW_PROBE_ENABLED", True):
+                self.probe.calibrate(self.probe.last_count, hits > 0)
+        return cx, cy, mean, std, hits
+
     def guide_towards_arrow(self, get_center_fn, cfg, log_fn=None):
         """
         閉迴路導航（以秒為主）：
-        - 每回合先量測一個短窗角度（~0.25s），算出 std
+        - 每回合先量測一個短窗角度（~0.25s），算出 std；
+          上一次拖曳時感知執行緒的估計還夠新（_fresh_estimate）就直接沿用，不再取樣
         - 依 std 在 [DRAG_HOLD_MIN, DRAG_HOLD_MAX] 之間選擇握住秒數
           * std 越小 → hold 越長（更遠）
           * std 大於 ANGLE_RELOCK_STD → 不拖，先重鎖
         - 持續迴圈直到箭頭消失或達到 DRAG_SESSION_MAX
         """
         t0 = time.time()
-        ema_angle = None
+        # 角度 EMA：指數加權的 sin/cos 累加（環形處理）
+        smoothed = CircularAccumulator(alpha=float(cfg.get("ANGLE_SMOOTH_ALPHA", 0.35)))
         miss = 0
 
         STD_LOW  = float(cfg.get("ANGLE_OK_STD", 12.0))
@@ -2471,32 +4215,18 @@ class ArrowDetector:
 
         action_count = 0
         last_log_time = 0
+        estimate = None   # 上一次拖曳放開時感知執行緒的最新估計
         
         while time.time() - t0 < SESSION_MAX:
-            # 重新找人物中心（避免被移動後偏差）
-            try:
-                center_loc, center_scale = self.find_character(cfg)
-                if center_loc and center_scale:
-                    cx = center_loc[0] + (self.template_width * center_scale) / 2
-                    cy = center_loc[1] + (self.template_height * center_scale) / 2
-                else:
-                    cx, cy = get_center_fn()
-            except Exception as e:
-                print(f"[警告] 導航中人物偵測異常: {e}")
-                try:
-                    cx, cy = get_center_fn()
-                except Exception as e2:
-                    print(f"[錯誤] 無法獲取人物中心位置: {e2}")
-                    log("[導航] 人物偵測失敗，結束導航")
+            if self._fresh_estimate(estimate, cfg):
+                cx, cy = estimate.center
+                mean, std, hits = estimate.angle, estimate.std, estimate.samples
+            else:
+                cx, cy, mean, std, hits = self._measure_for_guide(get_center_fn, cfg, log)
+                if cx is None:
                     return
+            estimate = None
 
-            # 取短窗角度樣本
-            try:
-                _, mean, std, hits = self._sample_angle_window(cx, cy, window_time=max(self.poll*4, 0.25))
-            except Exception as e:
-                print(f"[警告] 導航中角度取樣異常: {e}")
-                hits = 0
-                mean = std = None
             if hits == 0:
                 miss += 1
                 # 只在第一次和每隔一段時間記錄，避免頻繁輸出
@@ -2521,13 +4251,11 @@ class ArrowDetector:
                 time.sleep(self.poll * 3)
                 continue
 
-            # 角度 EMA 平滑（環形處理）
+            # 角度 EMA 平滑（合向量恰為 0 時沿用瞬時角度）
+            smoothed.add(mean)
+            ema_angle = smoothed.mean()
             if ema_angle is None:
                 ema_angle = mean
-            else:
-                alpha = float(cfg.get("ANGLE_SMOOTH_ALPHA", 0.35))
-                delta = ((mean - ema_angle + 540) % 360) - 180
-                ema_angle = (ema_angle + alpha * delta + 360) % 360
 
             # 大幅偏離保護
             if self._angle_diff(ema_angle, mean) > float(cfg.get("ANGLE_ABORT_DEG", 60.0)):
@@ -2542,20 +4270,20 @@ class ArrowDetector:
                     # 減少輸出頻率：每3次操作才記錄一次
                     if action_count % 3 == 0:
                         log(f"[導航] 穩定（std={std:.1f}°），動態拖曳最長{hold_seconds:.2f}s")
-                    self._dynamic_drag_with_feedback(cx, cy, ema_angle, hold_seconds, cfg, log_fn)
+                    estimate = self._dynamic_drag_with_feedback(cx, cy, ema_angle, hold_seconds, cfg, log_fn)
                 else:
                     # 角度不穩定，使用傳統固定時間拖曳，保守一點
                     shorter_hold = min(hold_seconds, HOLD_MIN * 2)  # 限制最長時間
                     if action_count % 3 == 0:
                         log(f"[導航] 不穩定（std={std:.1f}°），固定拖曳{shorter_hold:.2f}s")
-                    self._hold_drag_seconds(cx, cy, ema_angle, shorter_hold)
+                    estimate = self._hold_drag_seconds(cx, cy, ema_angle, shorter_hold, cfg, log_fn)
             except Exception as e:
                 print(f"[錯誤] 拖曳操作異常: {e}")
                 log(f"[導航] 拖曳異常，結束導航: {e}")
                 return
             
             action_count += 1
-            # 握完立刻再量測（越快越能修正）
+            # 握完立刻再量測（越快越能修正）；拖曳中的估計夠新時下一回合直接沿用
             time.sleep(max(self.poll, 0.05))
 
 # ==========================
@@ -2593,12 +4321,29 @@ class DetectorWorker(QThread):
 
     def run(self):
         try:
+            # 擷取後端；指定的後端不可用時退回 pyautogui
+            backend_name = self.cfg.get("CAPTURE_BACKEND", "auto")
+            try:
+                backend = create_backend(backend_name)
+            except Exception as e:
+                self._log(f"[擷取後端] {backend_name} 不可用，改用 pyautogui: {e}")
+                backend = create_backend("pyautogui")
+            self._log(f"[擷取後端] 使用 {backend.name}")
+
+            # 共用影格來源：聯集 = 圖標區 + 人物區（外擴箭頭搜尋半徑）
+            frames = FrameSource([
+                self.cfg["ICON_SEARCH_REGION"],
+                expand_region(self.cfg["CHARACTER_SEARCH_REGION"], self.cfg["ARROW_SEARCH_RADIUS"]),
+            ], backend=backend)
             icon = ImageDetector(
                 template_path=config_file_path(self.cfg["TARGET_IMAGE_PATH"]),
                 search_region=self.cfg["ICON_SEARCH_REGION"],
                 confidence=self.cfg["ICON_CONFIDENCE"],
                 scale_steps=self.cfg["ICON_SCALE_STEPS"],
-                scale_range=tuple(self.cfg["ICON_SCALE_RANGE"])
+                scale_range=tuple(self.cfg["ICON_SCALE_RANGE"]),
+                frame_source=frames,
+                coarse_factor=(self.cfg.get("ICON_COARSE_FACTOR", 0.5)
+                               if self.cfg.get("ICON_SEARCH_MODE", "coarse_to_fine") == "coarse_to_fine" else None)
             )
             arrow = ArrowDetector(
                 character_template_path=config_file_path(self.cfg["CHARACTER_IMAGE_PATH"]),
@@ -2613,7 +4358,16 @@ class DetectorWorker(QThread):
                 drag_button=self.cfg["DRAG_BUTTON"],
                 timeout=self.cfg["ARROW_DETECTION_TIMEOUT"],
                 poll=self.cfg["ARROW_POLL_INTERVAL"],
-                min_hits=self.cfg["ARROW_MIN_HITS"]
+                min_hits=self.cfg["ARROW_MIN_HITS"],
+                frame_source=frames,
+                arrow_annulus=self.cfg.get("ARROW_ANNULUS_ENABLED", True),
+                arrow_inner_radius=self.cfg.get("ARROW_INNER_RADIUS", 30),
+                phase_lock=self.cfg.get("ARROW_PHASE_LOCK_ENABLED", True),
+                breathing_cycle=self.cfg.get("ARROW_BREATHING_CYCLE", 1.0),
+                bright_fraction=self.cfg.get("ARROW_BRIGHT_FRACTION", 0.5),
+                decision_ci_deg=self.cfg.get("ARROW_DECISION_CI_DEG", 10.0),
+                decision_min_samples=self.cfg.get("ARROW_DECISION_MIN_SAMPLES", 3),
+                decision_extend=self.cfg.get("ARROW_DECISION_MAX_EXTEND", 2.0)
             )
         except Exception as e:
             self._log(f"[初始化失敗] {e}")
@@ -2631,7 +4385,7 @@ class DetectorWorker(QThread):
                 time.sleep(0.1)
                 continue
 
-            # 尋找目標圖標
+            # 尋找目標圖標（搜尋狀態只擷取圖標區）
             location, scale = icon.find_image_with_scaling(self.cfg)
             if location and scale:
                 # 更新 Discord 通知器的檢測時間
@@ -2642,11 +4396,20 @@ class DetectorWorker(QThread):
                     last_status = "found"
                     icon_lost_logged = False  # 重置標記
 
+                # 箭頭/導航階段啟用背景擷取（搜尋階段不常駐，避免閒置耗 CPU）
+                if self.cfg.get("CAPTURE_THREAD_ENABLED", True):
+                    try:
+                        frames.start_stream(interval=1.0 / max(1, self.cfg.get("CAPTURE_STREAM_FPS", 30)),
+                                            capacity=self.cfg.get("CAPTURE_RING_SIZE", 4))
+                    except Exception as e:
+                        self._log(f"[背景擷取] 啟動失敗，改用同步截圖: {e}")
+
                 # 箭頭偵測迴圈
                 attempts = 0
                 while attempts < self.cfg["MAX_ARROW_ATTEMPTS"] and self._pause_ev.is_set() and not self._stop_ev.is_set():
                     # 圖標是否還在
-                    current_location, current_scale = icon.find_image_with_scaling(self.cfg)
+                    frame = frames.grab()
+                    current_location, current_scale = icon.find_image_with_scaling(self.cfg, frame=frame)
                     if not current_location:
                         if not icon_lost_logged:
                             self._log("目標圖標消失，回到搜尋。")
@@ -2663,8 +4426,9 @@ class DetectorWorker(QThread):
                     icon.click_center(current_location, current_scale, self.cfg)
                     time.sleep(self.cfg["PREVENTIVE_CLICK_DELAY"])
 
-                    # 找人物
-                    char_loc, char_scale = arrow.find_character(self.cfg)
+                    # 找人物（點擊後畫面已變，重新擷取）
+                    frame = frames.grab()
+                    char_loc, char_scale = arrow.find_character(self.cfg, frame=frame)
                     if char_loc and char_scale:
                         cx = char_loc[0] + (arrow.template_width * char_scale) / 2
                         cy = char_loc[1] + (arrow.template_height * char_scale) / 2
@@ -2682,6 +4446,8 @@ class DetectorWorker(QThread):
 
                     attempts += 1
                     time.sleep(self.cfg["ARROW_SEARCH_INTERVAL"])
+
+                frames.stop_stream()
             else:
                 if last_status != "searching":
                     self._log("搜尋目標圖標中…")
@@ -2711,6 +4477,12 @@ class DetectorWorker(QThread):
                         search_t0 = time.time()
                 time.sleep(self.cfg["MAIN_SEARCH_INTERVAL"])
 
+        frames.close()
+        # 本次執行的偵測策略統計
+        for mode, selector in icon.strategies.items():
+            self._log(f"[策略統計] 圖標({mode}) {selector.summary()}")
+        if arrow.strategy is not None:
+            self._log(f"[策略統計] 人物 {arrow.strategy.summary()}")
         self._log("=== 偵測結束 ===")
         self.signals.finished.emit()
 
@@ -2721,7 +4493,8 @@ class DetectorWorker(QThread):
         try:
             # 圖標是否還在
             try:
-                current_location, current_scale = icon.find_image_with_scaling(self.cfg)
+                frame = icon.frame_source.grab()
+                current_location, current_scale = icon.find_image_with_scaling(self.cfg, frame=frame)
             except Exception as e:
                 print(f"[警告] 圖標偵測異常: {e}")
                 return False
@@ -2741,9 +4514,10 @@ class DetectorWorker(QThread):
                 print(f"[警告] 預防性點擊失敗: {e}")
                 # 點擊失敗不算致命錯誤，繼續執行
 
-            # 找人物中心
+            # 找人物中心（點擊後重新擷取）
             try:
-                char_loc, char_scale = arrow.find_character(self.cfg)
+                frame = arrow.frame_source.grab()
+                char_loc, char_scale = arrow.find_character(self.cfg, frame=frame)
             except Exception as e:
                 print(f"[警告] 箭頭會話中人物偵測異常: {e}")
                 return False
@@ -23,6 +23,7 @@ a = Analysis(
         'numpy',
         'pyautogui',
         'pygetwindow',
+        'mss',              # screenCapture 延遲 import 的擷取後端
         'PIL',
         'PIL.Image',
         'PIL.ImageTk',
@@ -0,0 +1,94 @@
+# benchCapture.py
+# 擷取後端效能測試：依 config.json 的實際區域大小，比較各後端的每秒張數與延遲百分位數
+#
+# 用法：
+#   python benchCapture.py                      # 測試所有可用後端
+#   python benchCapture.py -b mss -b xshm -n 300
+#   xvfb-run -s "-screen 0 1920x1080x24" python benchCapture.py -b xshm   # Linux 無頭測試
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from screenCapture import (
+    CAPTURE_BACKENDS, available_backends, create_backend,
+    clamp_region, expand_region, union_region,
+)
+
+
+def load_regions(cfg_path):
+    """從設定檔取出實際會擷取的區域：圖標、人物、箭頭窗、聯集"""
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    icon = tuple(cfg["ICON_SEARCH_REGION"])
+    char = tuple(cfg["CHARACTER_SEARCH_REGION"])
+    r = int(cfg.get("ARROW_SEARCH_RADIUS", 100))
+    # 箭頭窗以人物區中心為圓心
+    cx = char[0] + char[2] // 2
+    cy = char[1] + char[3] // 2
+    arrow = (cx - r, cy - r, 2 * r, 2 * r)
+    union = union_region([icon, expand_region(char, r)])
+    return [("圖標區", icon), ("人物區", char), ("箭頭窗", arrow), ("聯集", union)]
+
+
+def bench(backend, region, iterations, warmup):
+    """回傳 (每秒張數, 延遲毫秒 ndarray)；與實際執行相同，寫入預先配置的 BGR 緩衝"""
+    out = np.empty((region[3], region[2], 3), dtype=np.uint8)
+    for _ in range(warmup):
+        backend.grab_into(region, out)
+    lat = np.empty(iterations, dtype=np.float64)
+    t0 = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        backend.grab_into(region, out)
+        lat[i] = (time.perf_counter() - t) * 1000.0
+    total = time.perf_counter() - t0
+    return iterations / max(total, 1e-9), lat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="擷取後端效能測試")
+    parser.add_argument("-b", "--backend", action="append", choices=sorted(CAPTURE_BACKENDS),
+                        help="要測試的後端（可重複指定；預設全部可用後端）")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="每個區域的擷取次數")
+    parser.add_argument("-w", "--warmup", type=int, default=10, help="暖身次數（不計入）")
+    parser.add_argument("-c", "--config", default="config.json", help="設定檔路徑")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.config):
+        print(f"找不到設定檔: {args.config}")
+        return 1
+    regions = load_regions(args.config)
+
+    names = args.backend or available_backends()
+    if not names:
+        print("沒有可用的擷取後端")
+        return 1
+
+    print(f"擷取次數 {args.iterations}（暖身 {args.warmup}），設定檔 {args.config}")
+    print(f"{'後端':<10}{'區域':<8}{'尺寸':>10}{'張/秒':>10}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for name in names:
+        try:
+            backend = create_backend(name)
+        except Exception as e:
+            print(f"{name:<10}無法使用: {e}")
+            continue
+        try:
+            screen = backend.screen_size()
+            for label, region in regions:
+                region = clamp_region(region, screen)
+                fps, lat = bench(backend, region, args.iterations, args.warmup)
+                p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+                size = f"{region[2]}x{region[3]}"
+                print(f"{name:<10}{label:<8}{size:>10}{fps:>10.1f}{p50:>9.2f}{p90:>9.2f}{p99:>9.2f}{lat.max():>9.2f}")
+        except Exception as e:
+            print(f"{name:<10}測試失敗: {e}")
+        finally:
+            backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# benchRing.py
+# 圓環偵測引擎效能測試：在錄好的影格（截圖檔）上比較 hough 與 annulus 的延遲百分位數、偵測率與結果一致性
+#
+# 用法：
+#   python benchRing.py frames/                 # 目錄內所有 png/jpg/bmp
+#   python benchRing.py a.png b.png -n 20 -e annulus
+#   python benchRing.py frames/ --full          # 不套用 CHARACTER_SEARCH_REGION，整張影格都當搜尋區
+#
+# 影格為全螢幕截圖時以 config.json 的 CHARACTER_SEARCH_REGION 為搜尋區（螢幕座標 = 影像座標）；
+# 搜尋區超出影像（例如影格本身就是裁好的人物區）時改用整張影格
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+
+from screenCapture import Frame, FrameSource, clamp_region
+from app import ArrowDetector, DEFAULT_CFG, config_file_path
+
+ENGINES = ("hough", "annulus")
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def load_frames(paths):
+    """展開目錄並讀入所有影格（BGR）"""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(os.path.join(p, f) for f in sorted(os.listdir(p)) if f.lower().endswith(IMAGE_EXTS))
+        else:
+            files.append(p)
+    frames = []
+    for f in files:
+        img = cv2.imread(f, cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"無法讀取影格: {f}")
+            continue
+        frames.append((os.path.basename(f), img))
+    return frames
+
+
+def ring_kwargs(cfg, engine):
+    """與 find_character_enhanced 相同的參數"""
+    return dict(
+        circle_r_min=cfg.get("RING_CIRCLE_R_MIN", 18),
+        circle_r_max=cfg.get("RING_CIRCLE_R_MAX", 40),
+        white_v_thresh=cfg.get("RING_WHITE_V_THRESH", 200),
+        white_s_max=cfg.get("RING_WHITE_S_MAX", 60),
+        ring_consistency=cfg.get("RING_CONSISTENCY", 0.55),
+        refine_window=cfg.get("RING_REFINE_WINDOW", 120),
+        confidence=cfg.get("RING_TEMPLATE_CONFIDENCE", 0.82),
+        engine=engine,
+        annulus_step=cfg.get("RING_ANNULUS_STEP", 4),
+        annulus_top_k=cfg.get("RING_ANNULUS_TOP_K", 8),
+        annulus_scale=cfg.get("RING_ANNULUS_SCALE", 0.5),
+    )
+
+
+def bench(detector, frames, cfg, engine, iterations, full):
+    """回傳 (延遲毫秒 ndarray, {影格名稱: 圓心或 None})；每張影格重複 iterations 次（第一次為暖身，不計入）"""
+    kwargs = ring_kwargs(cfg, engine)
+    lat = []
+    centers = {}
+    for name, img in frames:
+        h, w = img.shape[:2]
+        region = (0, 0, w, h)
+        if not full:
+            r = clamp_region(cfg["CHARACTER_SEARCH_REGION"], (w, h))
+            if tuple(r) == tuple(cfg["CHARACTER_SEARCH_REGION"]):
+                region = r
+        for i in range(iterations + 1):
+            frame = Frame(img, (0, 0, w, h))  # 每次都從頭做色彩轉換，與實際每個 tick 一張新影格相同
+            t = time.perf_counter()
+            center, _, _ = detector.find_ring_then_match(search_region=region, frame=frame, **kwargs)
+            if i:
+                lat.append((time.perf_counter() - t) * 1000.0)
+        centers[name] = center
+    return np.array(lat), centers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="圓環偵測引擎效能測試")
+    parser.add_argument("frames", nargs="+", help="影格檔案或目錄")
+    parser.add_argument("-e", "--engine", action="append", choices=ENGINES, help="要測試的引擎（可重複指定；預設全部）")
+    parser.add_argument("-n", "--iterations", type=int, default=10, help="每張影格的重複次數")
+    parser.add_argument("-c", "--config", default="config.json", help="設定檔路徑")
+    parser.add_argument("--full", action="store_true", help="整張影格都當搜尋區")
+    parser.add_argument("--tolerance", type=float, default=4.0, help="兩引擎圓心視為一致的距離（像素）")
+    args = parser.parse_args()
+
+    cfg = dict(DEFAULT_CFG)
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            cfg.update(json.load(f))
+
+    frames = load_frames(args.frames)
+    if not frames:
+        print("沒有可用的影格")
+        return 1
+
+    # 影格都已在記憶體中，不會真的截圖
+    detector = ArrowDetector(config_file_path(cfg["CHARACTER_IMAGE_PATH"]), cfg["CHARACTER_SEARCH_REGION"],
+                             scale_steps=cfg["CHARACTER_SCALE_STEPS"],
+                             scale_range=tuple(cfg["CHARACTER_SCALE_RANGE"]),
+                             frame_source=FrameSource())
+
+    engines = args.engine or list(ENGINES)
+    print(f"影格 {len(frames)} 張 × {args.iterations} 次，設定檔 {args.config}")
+    print(f"{'引擎':<10}{'偵測率':>10}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    results = {}
+    for engine in engines:
+        lat, centers = bench(detector, frames, cfg, engine, args.iterations, args.full)
+        results[engine] = centers
+        hits = sum(c is not None for c in centers.values())
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        print(f"{engine:<10}{hits:>5}/{len(frames):<4}{p50:>9.2f}{p90:>9.2f}{p99:>9.2f}{lat.max():>9.2f}")
+
+    if len(results) == 2:
+        a, b = (results[e] for e in ENGINES)
+        agree = differ = 0
+        for name in a:
+            if a[name] is None or b[name] is None:
+                continue
+            if np.hypot(a[name][0] - b[name][0], a[name][1] - b[name][1]) <= args.tolerance:
+                agree += 1
+            else:
+                differ += 1
+                print(f"  不一致 {name}: hough={a[name]} annulus={b[name]}")
+        only = [n for n in a if (a[n] is None) != (b[n] is None)]
+        print(f"兩引擎都找到且一致 {agree}、不一致 {differ}、只有其中一個找到 {len(only)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
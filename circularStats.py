@@ -0,0 +1,129 @@
+# circularStats.py
+# 角度的環形統計（0°=上、順時針）：累加 sin/cos 總和，每次加入樣本 O(1)，均值、R、環形標準差也都是 O(1)
+#
+# 三種模式：
+#   - 全部累加（預設）
+#   - window=N：只保留最近 N 個樣本（滑動窗，舊樣本從總和扣掉）
+#   - alpha=a：指數加權（新樣本權重 a，舊的依序衰減），取代角度 EMA
+# 另外累加 sin 2θ / cos 2θ，可算均值的標準誤與信賴區間（序貫停止用）
+import math
+from collections import deque
+
+
+class CircularAccumulator:
+    """
+    環形統計累加器：S = Σ sin θ、C = Σ cos θ
+    - mean()：atan2(S, C)，0~360 度；沒有樣本或合向量為 0 時回傳 None
+    - resultant()：R = |(S, C)| / 權重和，0~1，越接近 1 越集中
+    - std()：環形標準差 sqrt(-2 ln R)（度）
+    - mean_halfwidth(z)：均值信賴區間的半寬（度），樣本越多、越一致就越窄
+    滑動窗每扣掉 RESYNC_EVERY 個樣本就從窗內樣本重新加總一次，避免浮點誤差累積
+    """
+    RESYNC_EVERY = 256
+
+    def __init__(self, window=None, alpha=None):
+        self.window = window
+        self.alpha = alpha
+        self._recent = deque() if window else None
+        self._evicted = 0
+        self.clear()
+
+    def clear(self):
+        self.S = 0.0
+        self.C = 0.0
+        self.S2 = 0.0
+        self.C2 = 0.0
+        self.weight = 0.0
+        self.n = 0
+        if self._recent is not None:
+            self._recent.clear()
+
+    def __len__(self):
+        return self.n
+
+    def add(self, angle_deg):
+        rad = math.radians(angle_deg)
+        s, c = math.sin(rad), math.cos(rad)
+        s2, c2 = 2.0 * s * c, c * c - s * s
+        self.n += 1
+        if self.alpha is not None and self.weight > 0:
+            keep = 1.0 - self.alpha
+            self.S = keep * self.S + self.alpha * s
+            self.C = keep * self.C + self.alpha * c
+            self.S2 = keep * self.S2 + self.alpha * s2
+            self.C2 = keep * self.C2 + self.alpha * c2
+            self.weight = keep * self.weight + self.alpha
+            return
+        self.S += s
+        self.C += c
+        self.S2 += s2
+        self.C2 += c2
+        self.weight += 1.0
+        if self._recent is not None:
+            self._recent.append((s, c, s2, c2))
+            if len(self._recent) > self.window:
+                s0, c0, s20, c20 = self._recent.popleft()
+                self.S -= s0
+                self.C -= c0
+                self.S2 -= s20
+                self.C2 -= c20
+                self.weight -= 1.0
+                self.n -= 1
+                self._evicted += 1
+                if self._evicted % self.RESYNC_EVERY == 0:
+                    self.S, self.C, self.S2, self.C2 = (sum(v[i] for v in self._recent) for i in range(4))
+
+    def extend(self, angles_deg):
+        for a in angles_deg:
+            self.add(a)
+        return self
+
+    def mean(self):
+        if self.n == 0 or (self.S == 0 and self.C == 0):
+            return None
+        return (math.degrees(math.atan2(self.S, self.C)) + 360) % 360
+
+    def resultant(self):
+        if self.weight <= 0:
+            return 0.0
+        return math.hypot(self.S, self.C) / self.weight
+
+    def std(self):
+        if self.n == 0:
+            return None
+        # R 夾在 (0, 1) 內，避免 log(0) 與負的標準差
+        R = max(min(self.resultant(), 0.999999), 1e-6)
+        return math.degrees(math.sqrt(-2.0 * math.log(R)))
+
+    def mean_halfwidth(self, z=1.96):
+        """
+        均值信賴區間半寬（度）：z · 標準誤，標準誤 = sqrt(δ / n)，δ = (1 − ρ2) / (2R²)
+        ρ2 為繞均值的二階三角動差（Fisher 的環形離散度），不需假設分布集中程度
+        少於 2 個樣本或合向量為 0 時回傳 None（無法判斷）
+        """
+        if self.n < 2 or self.weight <= 0:
+            return None
+        R = self.resultant()
+        if R < 1e-6:
+            return None
+        mu = math.atan2(self.S, self.C)
+        # cos 2(θ − μ) 的平均，由 Σcos2θ、Σsin2θ 旋轉 2μ 得到
+        rho2 = (self.C2 * math.cos(2 * mu) + self.S2 * math.sin(2 * mu)) / self.weight
+        delta = max(0.0, 1.0 - rho2) / (2.0 * R * R)
+        se = math.sqrt(delta / self.n)
+        # 標準誤超過 1 弧度時近似已不成立，視為完全不確定
+        return 180.0 if se >= 1.0 else math.degrees(z * se)
+
+    def stats(self):
+        """回傳 (均值角度deg, R, circular_std_deg)；沒有樣本回傳 (None, 0.0, None)"""
+        if self.n == 0:
+            return None, 0.0, None
+        R = max(min(self.resultant(), 0.999999), 1e-6)
+        return self.mean(), R, self.std()
+
+
+def circular_mean_deg(angles_deg):
+    """對 0°=上、順時針 的角度做圓形平均，回傳平均角度（度）。"""
+    if not angles_deg:
+        return None
+    return CircularAccumulator().extend(angles_deg).mean()
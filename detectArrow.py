@@ -4,6 +4,8 @@ import numpy as np
 import time
 import math
 
+from circularStats import circular_mean_deg
+
 # --- 參數設定 ---
 SCREEN_WIDTH, SCREEN_HEIGHT = pyautogui.size()
 
@@ -18,17 +20,6 @@ DRAG_DISTANCE = 100
 DRAG_HOLD_SECONDS = 1.0
 DRAG_BUTTON = 'left'
 
-def circular_mean_deg(angles_deg):
-    """對 0°=上、順時針 的角度做圓形平均，回傳平均角度（度）。"""
-    if not angles_deg:
-        return None
-    sum_x = sum(math.sin(math.radians(a)) for a in angles_deg)
-    sum_y = sum(math.cos(math.radians(a)) for a in angles_deg)
-    if sum_x == 0 and sum_y == 0:
-        return None
-    mean_rad = math.atan2(sum_x, sum_y)
-    return (math.degrees(mean_rad) + 360) % 360
-
 def wait_for_arrow(center_x, center_y, radius, timeout=3.0, poll=0.12, min_hits=2, min_area=300):
     """
     在 timeout 秒內重複偵測箭頭，蒐集角度並做圓形平均。
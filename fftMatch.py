@@ -0,0 +1,133 @@
+# fftMatch.py
+# FFT 批次相關：搜尋影像每個影格只做一次 DFT，所有尺度的模板頻譜（預先算好並快取）直接與之相乘
+# 正規化分母用積分影像求每個視窗的和與平方和，結果與 cv2.matchTemplate 相同格式（可直接 minMaxLoc）
+#
+# 支援：
+#   - TM_CCOEFF_NORMED（人物、傳統圖標、圖標邊緣）
+#   - TM_CCORR_NORMED + 二值遮罩（增強圖標的灰階+遮罩比對）
+#   - 未正規化互相關（圓環偵測的環帶卷積核）
+import numpy as np
+import cv2
+
+
+class FFTCorrelator:
+    """
+    單張搜尋影像的 FFT 相關引擎
+    影像只補零到最佳 DFT 尺寸（不需依模板大小加大）：模板完整落在影像內的位置不會發生循環環繞，
+    取 (H-th+1, W-tw+1) 的有效區域即可
+    模板頻譜依 (DFT 尺寸, 種類) 存在呼叫端提供的 cache dict（每張模板各自一個，例如
+    TemplateLevel.spectra_for("plain")），同一個搜尋區域大小下每張模板只轉換一次
+    """
+    EPS = 1e-6
+
+    def __init__(self, image):
+        self.image = image.astype(np.float32)
+        self.H, self.W = self.image.shape[:2]
+        self.dft_size = (cv2.getOptimalDFTSize(self.H), cv2.getOptimalDFTSize(self.W))
+        self._spec = None
+        self._spec_sq = None
+        self._sums = None
+
+    def _pad(self, a):
+        out = np.zeros(self.dft_size, dtype=np.float32)
+        out[:a.shape[0], :a.shape[1]] = a
+        return out
+
+    def _dft(self, a):
+        return cv2.dft(self._pad(a))
+
+    def _image_spectrum(self):
+        if self._spec is None:
+            self._spec = self._dft(self.image)
+        return self._spec
+
+    def _image_sq_spectrum(self):
+        if self._spec_sq is None:
+            self._spec_sq = self._dft(self.image * self.image)
+        return self._spec_sq
+
+    def _window_energy(self, th, tw):
+        """每個模板位置的 sum((I - mean)^2)（積分影像，float64 避免相減時失去精度）"""
+        if self._sums is None:
+            self._sums = cv2.integral2(self.image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        s, sq = self._sums
+        h, w = self.H - th + 1, self.W - tw + 1
+
+        def box(ii):
+            out = ii[th:th + h, tw:tw + w] - ii[:h, tw:tw + w]
+            out -= ii[th:th + h, :w]
+            out += ii[:h, :w]
+            return out
+        s1 = box(s)
+        var = box(sq)
+        s1 *= s1
+        s1 *= 1.0 / (th * tw)
+        var -= s1
+        np.maximum(var, 0.0, out=var)
+        return var
+
+    @staticmethod
+    def _cached(cache, key, build):
+        if cache is None:
+            return build()
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = build()
+        return value
+
+    def _template_spectrum(self, cache, kind, build):
+        return self._cached(cache, (self.dft_size, kind), lambda: self._dft(build()))
+
+    def _correlate(self, img_spec, tmpl_spec, th, tw):
+        prod = cv2.mulSpectrums(img_spec, tmpl_spec, 0, conjB=True)
+        full = cv2.idft(prod, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+        return full[:self.H - th + 1, :self.W - tw + 1]
+
+    def correlate(self, tmpl, cache=None, kind="raw"):
+        """未正規化的互相關 sum(T * I)，大小 (H-th+1, W-tw+1)（等同 cv2.matchTemplate 的 TM_CCORR）"""
+        th, tw = tmpl.shape[:2]
+        return self._correlate(self._image_spectrum(),
+                               self._template_spectrum(cache, kind, lambda: tmpl.astype(np.float32)), th, tw)
+
+    def ccoeff_normed(self, tmpl, cache=None):
+        """等同 cv2.matchTemplate(image, tmpl, TM_CCOEFF_NORMED)"""
+        th, tw = tmpl.shape[:2]
+
+        def centered():
+            t = tmpl.astype(np.float32)
+            t0 = t - float(t.mean())
+            return t0, float((t0.astype(np.float64) ** 2).sum())
+        t0, t_norm2 = self._cached(cache, "ccoeff_template", centered)
+
+        # sum(T' * I) == sum(T' * I')，因為 T' 的總和為 0
+        num = self._correlate(self._image_spectrum(),
+                              self._template_spectrum(cache, "ccoeff", lambda: t0), th, tw)
+        den = self._window_energy(th, tw)
+        den *= t_norm2
+        return self._normalize(num, den)
+
+    def ccorr_normed_masked(self, tmpl, mask, cache=None):
+        """等同 cv2.matchTemplate(image, tmpl, TM_CCORR_NORMED, mask=mask)（8U 遮罩視為二值）"""
+        th, tw = tmpl.shape[:2]
+
+        def masked():
+            m = (mask > 0).astype(np.float32)
+            tm = tmpl.astype(np.float32) * m
+            return m, tm, float((tm.astype(np.float64) ** 2).sum())
+        m, tm, t_norm2 = self._cached(cache, "ccorr_masked_template", masked)
+
+        num = self._correlate(self._image_spectrum(),
+                              self._template_spectrum(cache, "ccorr_masked", lambda: tm), th, tw)
+        den = self._correlate(self._image_sq_spectrum(),
+                              self._template_spectrum(cache, "mask", lambda: m), th, tw)
+        np.maximum(den, 0.0, out=den)
+        den *= t_norm2
+        return self._normalize(num, den)
+
+    def _normalize(self, num, den_sq):
+        """num / sqrt(den_sq)；分母過小（平坦區域）的位置記為 0"""
+        den = np.sqrt(den_sq, out=den_sq)
+        out = np.zeros(num.shape, dtype=np.float32)
+        np.divide(num, den, out=out, where=den > self.EPS, casting="unsafe")
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
@@ -6,6 +6,7 @@ import math
 import random
 import pygetwindow as gw
 from config import *
+from circularStats import circular_mean_deg
 
 def show_menu():
     """顯示主選單"""
@@ -83,17 +84,6 @@ def show_config():
     print(f"最大箭頭嘗試: {MAX_ARROW_ATTEMPTS} 次")
     print("="*50)
 
-def circular_mean_deg(angles_deg):
-    """對 0°=上、順時針 的角度做圓形平均，回傳平均角度（度）。"""
-    if not angles_deg:
-        return None
-    sum_x = sum(math.sin(math.radians(a)) for a in angles_deg)
-    sum_y = sum(math.cos(math.radians(a)) for a in angles_deg)
-    if sum_x == 0 and sum_y == 0:
-        return None
-    mean_rad = math.atan2(sum_x, sum_y)
-    return (math.degrees(mean_rad) + 360) % 360
-
 def clamp_region_to_screen(x, y, w, h):
     """將擷取區域夾在螢幕邊界內且為整數，寬高最少為 1。"""
     sw, sh = pyautogui.size()
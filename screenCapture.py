@@ -0,0 +1,687 @@
+# screenCapture.py
+# 螢幕擷取層：每個 tick 只擷取一次「聯集區域」，各偵測器從同一張影格裁切自己的區域
+import sys
+import time
+import ctypes
+import ctypes.util
+import threading
+import weakref
+from collections import deque
+import numpy as np
+import cv2
+
+from fftMatch import FFTCorrelator
+
+
+def union_region(regions):
+    """回傳多個 (x, y, w, h) 區域的最小外接矩形；空列表回傳 None"""
+    regions = [tuple(map(int, r)) for r in regions if r]
+    if not regions:
+        return None
+    x0 = min(r[0] for r in regions)
+    y0 = min(r[1] for r in regions)
+    x1 = max(r[0] + r[2] for r in regions)
+    y1 = max(r[1] + r[3] for r in regions)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def expand_region(region, margin):
+    """把區域四邊各外擴 margin 像素（例如人物區域 + 箭頭搜尋半徑）"""
+    x, y, w, h = map(int, region)
+    m = int(round(margin))
+    return x - m, y - m, w + 2 * m, h + 2 * m
+
+
+def clamp_region(region, screen_size):
+    """將區域夾在螢幕內且為整數，寬高最少為 1"""
+    sw, sh = screen_size
+    x, y, w, h = region
+    x0 = int(round(max(0, min(x, sw - 1))))
+    y0 = int(round(max(0, min(y, sh - 1))))
+    x1 = int(round(max(x0 + 1, min(x + w, sw))))
+    y1 = int(round(max(y0 + 1, min(y + h, sh))))
+    return x0, y0, x1 - x0, y1 - y0
+
+
+# ==========================
+# 可重複使用的緩衝區
+# ==========================
+class BufferPool:
+    """
+    依 (名稱, 形狀, dtype) 保留可重複使用的 ndarray，讓 OpenCV 的 dst= 寫回同一塊記憶體
+    長時間執行時避免每次偵測都配置新陣列（GC 停頓、取樣節奏抖動）
+    每個執行緒各自一份，背景執行緒與偵測執行緒不會互相覆寫
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, name, shape, dtype=np.uint8):
+        bufs = getattr(self._local, "bufs", None)
+        if bufs is None:
+            bufs = self._local.bufs = {}
+        shape = tuple(int(v) for v in shape)
+        buf = bufs.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = bufs[name] = np.empty(shape, dtype=dtype)
+        return buf
+
+
+# ==========================
+# 擷取後端
+# ==========================
+class CaptureBackend:
+    """
+    擷取後端介面：grab_into(region, out) 把畫面以 BGR 寫進預先配置的 (h, w, 3) uint8 連續緩衝
+    region 由呼叫端保證已夾在螢幕內
+    """
+    name = "base"
+
+    def screen_size(self):
+        raise NotImplementedError
+
+    def grab_into(self, region, out):
+        raise NotImplementedError
+
+    def grab(self, region):
+        """配置新緩衝並擷取（測試或單次使用）"""
+        out = np.empty((region[3], region[2], 3), dtype=np.uint8)
+        self.grab_into(region, out)
+        return out
+
+    def close(self):
+        """釋放目前執行緒持有的資源"""
+        pass
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    """pyautogui.screenshot：PIL 影像再轉 ndarray（相容性最好，速度最慢）"""
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def screen_size(self):
+        return self._pyautogui.size()
+
+    def grab_into(self, region, out):
+        shot = self._pyautogui.screenshot(region=region)
+        if shot is None:
+            raise RuntimeError(f"截圖返回空值: {region}")
+        rgb = np.asarray(shot)
+        if rgb.shape[:2] != out.shape[:2]:
+            raise RuntimeError(f"截圖尺寸不符: {rgb.shape[:2]} != {out.shape[:2]}")
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=out)
+        return out
+
+
+class MSSBackend(CaptureBackend):
+    """mss：直接取 BGRA 原始緩衝，不經過 PIL（mss 物件不可跨執行緒，因此每個執行緒各持一個）"""
+    name = "mss"
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        self._local = threading.local()
+        self._sct()  # 立即建立一次，套件或顯示環境有問題時在這裡就報錯
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+        return sct
+
+    def screen_size(self):
+        mon = self._sct().monitors[1]  # 主螢幕
+        return mon["width"], mon["height"]
+
+    def grab_into(self, region, out):
+        x, y, w, h = region
+        shot = self._sct().grab({"left": x, "top": y, "width": w, "height": h})
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+        return out
+
+    def close(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class _XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int), ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int), ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int), ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int), ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong), ("green_mask", ctypes.c_ulong), ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p), ("readOnly", ctypes.c_int),
+    ]
+
+
+class XShmBackend(CaptureBackend):
+    """
+    X11 MIT-SHM：XShmGetImage 直接把畫面寫進共享記憶體，省去 socket 傳輸（僅 Linux/X11，可在 Xvfb 下測試）
+    每個執行緒各持一個 Display 連線，每種區域尺寸各保留一塊共享記憶體重複使用
+    """
+    name = "xshm"
+
+    _ZPIXMAP = 2
+    _IPC_PRIVATE = 0
+    _IPC_CREAT = 0o1000
+    _IPC_RMID = 0
+    _ALL_PLANES = ctypes.c_ulong(-1).value
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise RuntimeError("XShm 擷取只支援 Linux/X11")
+        x11 = ctypes.util.find_library("X11")
+        xext = ctypes.util.find_library("Xext")
+        if not x11 or not xext:
+            raise RuntimeError("找不到 libX11 / libXext")
+        self._x11 = ctypes.CDLL(x11)
+        self._xext = ctypes.CDLL(xext)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._declare()
+        self._local = threading.local()
+        self._state()  # 立即連線一次，沒有 DISPLAY 或不支援 MIT-SHM 時在這裡就報錯
+
+    def _declare(self):
+        x11, xext, libc = self._x11, self._xext, self._libc
+        vp, ci, cu, cul = ctypes.c_void_p, ctypes.c_int, ctypes.c_uint, ctypes.c_ulong
+        x11.XOpenDisplay.restype = vp; x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [vp]
+        x11.XDefaultScreen.restype = ci; x11.XDefaultScreen.argtypes = [vp]
+        x11.XRootWindow.restype = cul; x11.XRootWindow.argtypes = [vp, ci]
+        x11.XDefaultVisual.restype = vp; x11.XDefaultVisual.argtypes = [vp, ci]
+        x11.XDefaultDepth.restype = ci; x11.XDefaultDepth.argtypes = [vp, ci]
+        x11.XDisplayWidth.restype = ci; x11.XDisplayWidth.argtypes = [vp, ci]
+        x11.XDisplayHeight.restype = ci; x11.XDisplayHeight.argtypes = [vp, ci]
+        x11.XFree.argtypes = [vp]
+        x11.XSync.argtypes = [vp, ci]
+        xext.XShmQueryExtension.restype = ci; xext.XShmQueryExtension.argtypes = [vp]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [vp, vp, cu, ci, vp, ctypes.POINTER(_XShmSegmentInfo), cu, cu]
+        xext.XShmAttach.restype = ci; xext.XShmAttach.argtypes = [vp, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.restype = ci; xext.XShmDetach.argtypes = [vp, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.restype = ci; xext.XShmGetImage.argtypes = [vp, cul, ctypes.POINTER(_XImage), ci, ci, cul]
+        libc.shmget.restype = ci; libc.shmget.argtypes = [ci, ctypes.c_size_t, ci]
+        libc.shmat.restype = vp; libc.shmat.argtypes = [ci, vp, ci]
+        libc.shmdt.restype = ci; libc.shmdt.argtypes = [vp]
+        libc.shmctl.restype = ci; libc.shmctl.argtypes = [ci, ci, vp]
+
+    def _state(self):
+        st = getattr(self._local, "st", None)
+        if st is None:
+            dpy = self._x11.XOpenDisplay(None)
+            if not dpy:
+                raise RuntimeError("無法連線 X display（DISPLAY 未設定？）")
+            if not self._xext.XShmQueryExtension(dpy):
+                self._x11.XCloseDisplay(dpy)
+                raise RuntimeError("X server 不支援 MIT-SHM")
+            scr = self._x11.XDefaultScreen(dpy)
+            st = self._local.st = {"dpy": dpy, "scr": scr, "root": self._x11.XRootWindow(dpy, scr), "images": {}}
+        return st
+
+    def _image(self, st, w, h):
+        """取得 (w, h) 尺寸的共享記憶體影像（同尺寸重複使用）"""
+        key = (w, h)
+        if key in st["images"]:
+            return st["images"][key]
+        dpy, scr = st["dpy"], st["scr"]
+        info = _XShmSegmentInfo()
+        ximg = self._xext.XShmCreateImage(dpy, self._x11.XDefaultVisual(dpy, scr), self._x11.XDefaultDepth(dpy, scr),
+                                          self._ZPIXMAP, None, ctypes.byref(info), w, h)
+        if not ximg:
+            raise RuntimeError("XShmCreateImage 失敗")
+        size = ximg.contents.bytes_per_line * ximg.contents.height
+        info.shmid = self._libc.shmget(self._IPC_PRIVATE, size, self._IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            self._x11.XFree(ximg)
+            raise OSError(ctypes.get_errno(), "shmget 失敗")
+        addr = self._libc.shmat(info.shmid, None, 0)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(info.shmid, self._IPC_RMID, None)
+            self._x11.XFree(ximg)
+            raise OSError(ctypes.get_errno(), "shmat 失敗")
+        info.shmaddr = addr
+        info.readOnly = 0
+        ximg.contents.data = addr
+        self._xext.XShmAttach(dpy, ctypes.byref(info))
+        self._x11.XSync(dpy, 0)
+        # 雙方都 attach 後即可標記刪除，程序結束時系統自動回收
+        self._libc.shmctl(info.shmid, self._IPC_RMID, None)
+        buf = (ctypes.c_uint8 * size).from_address(addr)
+        view = np.frombuffer(buf, dtype=np.uint8).reshape(h, ximg.contents.bytes_per_line)
+        st["images"][key] = (ximg, info, view)
+        return st["images"][key]
+
+    def screen_size(self):
+        st = self._state()
+        return self._x11.XDisplayWidth(st["dpy"], st["scr"]), self._x11.XDisplayHeight(st["dpy"], st["scr"])
+
+    def grab_into(self, region, out):
+        x, y, w, h = region
+        st = self._state()
+        ximg, _, view = self._image(st, w, h)
+        if not self._xext.XShmGetImage(st["dpy"], st["root"], ximg, x, y, self._ALL_PLANES):
+            raise RuntimeError(f"XShmGetImage 失敗: {region}")
+        if ximg.contents.bits_per_pixel != 32:
+            raise RuntimeError(f"不支援的像素格式: {ximg.contents.bits_per_pixel} bpp")
+        # 共享記憶體直接轉成 BGR 寫進 out，不經過任何中間陣列
+        bgra = view[:, :w * 4].reshape(h, w, 4)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+        return out
+
+    def close(self):
+        st = getattr(self._local, "st", None)
+        if st is None:
+            return
+        for ximg, info, _ in st["images"].values():
+            self._xext.XShmDetach(st["dpy"], ctypes.byref(info))
+            self._libc.shmdt(info.shmaddr)
+            self._x11.XFree(ximg)
+        self._x11.XCloseDisplay(st["dpy"])
+        self._local.st = None
+
+
+CAPTURE_BACKENDS = {
+    "pyautogui": PyAutoGUIBackend,
+    "mss": MSSBackend,
+    "xshm": XShmBackend,
+}
+
+# auto 模式的嘗試順序（由快到慢）
+AUTO_BACKEND_ORDER = ["xshm", "mss", "pyautogui"]
+
+
+def available_backends():
+    """回傳目前環境可用的後端名稱列表"""
+    names = []
+    for name, cls in CAPTURE_BACKENDS.items():
+        try:
+            cls().close()
+            names.append(name)
+        except Exception:
+            continue
+    return names
+
+
+def create_backend(name="auto"):
+    """依名稱建立擷取後端；auto 依序嘗試 xshm → mss → pyautogui"""
+    if name in (None, "", "auto"):
+        errors = []
+        for candidate in AUTO_BACKEND_ORDER:
+            try:
+                return CAPTURE_BACKENDS[candidate]()
+            except Exception as e:
+                errors.append(f"{candidate}: {e}")
+        raise RuntimeError("沒有可用的擷取後端 (" + "; ".join(errors) + ")")
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f"未知的擷取後端: {name}")
+    return CAPTURE_BACKENDS[name]()
+
+
+# ==========================
+# 影格與影格來源
+# ==========================
+class Frame:
+    """一次擷取的影格：image 為 BGR ndarray（OpenCV 原生順序），region 為其在螢幕上的 (x, y, w, h)"""
+
+    def __init__(self, image, region, timestamp=None):
+        self.image = image
+        self.region = tuple(map(int, region))
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._context = None
+
+    @property
+    def context(self):
+        """此影格的 FrameContext（第一次存取時建立）"""
+        if self._context is None:
+            self._context = FrameContext(self)
+        return self._context
+
+    def contains(self, region):
+        fx, fy, fw, fh = self.region
+        x, y, w, h = map(int, region)
+        return fx <= x and fy <= y and x + w <= fx + fw and y + h <= fy + fh
+
+    def crop(self, region):
+        """回傳 region 對應的零複製 view；超出影格範圍回傳 None"""
+        if not self.contains(region):
+            return None
+        fx, fy = self.region[:2]
+        x, y, w, h = map(int, region)
+        return self.image[y - fy:y - fy + h, x - fx:x - fx + w]
+
+
+class FrameContext:
+    """
+    單一影格的色彩轉換快取：gray / HSV / Lab / Canny 邊緣依區域延遲計算，每個區域只算一次
+    同一個 tick 內圖標、圓環、人物、箭頭偵測共用同一份轉換結果
+    已算過的較大區域若包含新區域，直接回傳其零複製 view，不再重算
+    scale != 1 的縮小版（由粗到細搜尋用）只快取完全相同的區域
+    回傳的陣列視為唯讀（需要修改時請先 copy）
+    """
+
+    def __init__(self, frame):
+        # 弱參照：Frame 與 FrameContext 不形成循環，Frame 沒人持有時立刻釋放，緩衝池才能重用它的緩衝
+        self.frame = weakref.proxy(frame)
+        self._cache = {}  # kind -> [(region, ndarray), ...]
+        self._lock = threading.Lock()
+
+    def bgr(self, region):
+        return self.frame.crop(region)
+
+    def gray(self, region, scale=1.0):
+        if scale != 1.0:
+            return self._get(("gray", scale), region, lambda r: self._downscale(self.gray(r), scale), exact=True)
+        return self._get("gray", region, lambda r: cv2.cvtColor(self.bgr(r), cv2.COLOR_BGR2GRAY))
+
+    def hsv(self, region):
+        return self._get("hsv", region, lambda r: cv2.cvtColor(self.bgr(r), cv2.COLOR_BGR2HSV))
+
+    def lab(self, region):
+        return self._get("lab", region, lambda r: cv2.cvtColor(self.bgr(r), cv2.COLOR_BGR2LAB))
+
+    def edges(self, region, low=50, high=150, scale=1.0):
+        return self._get(("edges", low, high, scale), region,
+                         lambda r: cv2.Canny(self.gray(r, scale), low, high), exact=(scale != 1.0))
+
+    def correlator(self, region, source="gray", scale=1.0):
+        """source（"gray" / "edges"）影像的 FFTCorrelator；影像頻譜每個影格、每個區域只算一次"""
+        if source == "edges":
+            build = lambda r: FFTCorrelator(self.edges(r, scale=scale))
+        else:
+            build = lambda r: FFTCorrelator(self.gray(r, scale))
+        return self._get(("fft", source, scale), region, build, exact=True)
+
+    @staticmethod
+    def _downscale(img, scale):
+        h, w = img.shape[:2]
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    def _get(self, kind, region, compute, exact=False):
+        region = tuple(map(int, region))
+        if not self.frame.contains(region):
+            return None
+        with self._lock:
+            for cached_region, img in self._cache.get(kind, ()):
+                if exact:
+                    if cached_region == region:
+                        return img
+                    continue
+                cx, cy, cw, ch = cached_region
+                x, y, w, h = region
+                if cx <= x and cy <= y and x + w <= cx + cw and y + h <= cy + ch:
+                    return img[y - cy:y - cy + h, x - cx:x - cx + w]
+        # 計算放在鎖外（edges 會再取 gray）；同區域重複計算只是浪費，不影響正確性
+        img = compute(region)
+        with self._lock:
+            self._cache.setdefault(kind, []).append((region, img))
+        return img
+
+
+class FrameRing:
+    """
+    帶時間戳的最新影格環形緩衝（執行緒安全）
+    容量固定，處理跟不上時最舊的影格直接被覆蓋丟棄
+    """
+
+    def __init__(self, capacity=4):
+        self.capacity = max(1, int(capacity))
+        self._frames = deque(maxlen=self.capacity)
+        self._cond = threading.Condition()
+
+    def push(self, frame):
+        with self._cond:
+            self._frames.append(frame)
+            self._cond.notify_all()
+
+    def clear(self):
+        with self._cond:
+            self._frames.clear()
+
+    def latest(self):
+        """回傳最新影格（不阻塞）；緩衝為空回傳 None"""
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def since(self, timestamp):
+        """回傳所有時間戳晚於 timestamp 的影格（舊→新，不阻塞）"""
+        with self._cond:
+            return [f for f in self._frames if f.timestamp > timestamp]
+
+    def wait_newer(self, timestamp, timeout):
+        """等待並回傳晚於 timestamp 的最新影格；逾時回傳 None"""
+        deadline = time.time() + max(0.0, timeout)
+        with self._cond:
+            while not (self._frames and self._frames[-1].timestamp > timestamp):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._frames[-1]
+
+
+class FramePool:
+    """
+    影格緩衝池：依尺寸保留 (h, w, 3) BGR 緩衝輪流寫入，每塊記錄最後包在它上面的 Frame（weakref）
+    - 只有該 Frame 已經沒有人持有（不在環形緩衝裡、也沒有呼叫端拿著）才會被覆寫，
+      拿著 Frame 期間讀到的影像（含之後延遲計算的轉換）都不會被改掉
+    - 每種尺寸先配置 min_slots 塊輪流使用；全部被持有時另外配置一塊，最多 max_slots 塊（None 表示不限）
+    - 只保留 frame.crop() 的 view 而丟掉 Frame 本身不受保護（輪流使用下至少到下一次同尺寸擷取前仍可讀）
+    不是執行緒安全的，每個擷取執行緒各用一個
+    """
+
+    def __init__(self, min_slots=2, max_slots=None):
+        self.min_slots = max(1, int(min_slots))
+        self.max_slots = max_slots
+        self._slots = {}  # (h, w) -> [[緩衝, 最後發出的 Frame（weakref）], ...]
+        self._next = {}   # (h, w) -> 下一次從哪一塊開始找
+
+    def size(self, w, h):
+        """目前 w x h 緩衝的塊數"""
+        return len(self._slots.get((h, w), ()))
+
+    def _free_slot(self, shape):
+        slots = self._slots.get(shape)
+        if slots is None:
+            slots = self._slots[shape] = [[np.empty(shape + (3,), np.uint8), None] for _ in range(self.min_slots)]
+        n = len(slots)
+        start = self._next.get(shape, 0)
+        for i in range(n):
+            j = (start + i) % n
+            lease = slots[j][1]
+            if lease is None or lease() is None:
+                self._next[shape] = j + 1
+                return slots[j]
+        if self.max_slots is not None and n >= self.max_slots:
+            return None
+        slots.append([np.empty(shape + (3,), np.uint8), None])
+        self._next[shape] = 0
+        return slots[-1]
+
+    def capture(self, region, grab_into, timestamp=None):
+        """
+        取一塊沒人持有的緩衝，grab_into(region, 緩衝) 寫入後包成 Frame 並登記
+        緩衝全被持有且已達 max_slots 時回傳 None（不覆寫任何影格）
+        """
+        x, y, w, h = region
+        slot = self._free_slot((h, w))
+        if slot is None:
+            return None
+        t = time.time() if timestamp is None else timestamp
+        grab_into(region, slot[0])
+        frame = Frame(slot[0], region, t)
+        slot[1] = weakref.ref(frame)
+        return frame
+
+
+class CaptureThread(threading.Thread):
+    """
+    背景擷取執行緒：以固定間隔擷取聯集區域並寫入 FrameRing
+    影格緩衝由 FramePool 管理（環形容量 + 2 塊起，最多 MAX_SLOTS 塊）：
+    偵測再慢，消費者拿著的 Frame 都不會被覆寫；所有緩衝都被持有時跳過這次擷取
+    """
+    MAX_SLOTS = 16
+
+    def __init__(self, source, region, ring, interval=1/30):
+        super().__init__(name="CaptureThread", daemon=True)
+        self.source = source
+        self.region = region
+        self.ring = ring
+        self.interval = max(0.0, float(interval))
+        self._stop_ev = threading.Event()
+        self.error = None
+        self.pool = FramePool(min_slots=ring.capacity + 2, max_slots=self.MAX_SLOTS)
+
+    def stop(self):
+        self._stop_ev.set()
+
+    def run(self):
+        while not self._stop_ev.is_set():
+            t = time.time()
+            try:
+                frame = self.pool.capture(self.region, self.source.backend.grab_into, t)
+                if frame is None:
+                    raise RuntimeError(f"擷取緩衝 {self.MAX_SLOTS} 塊都還被持有，跳過這次擷取")
+                self.ring.push(frame)
+                self.error = None
+            except Exception as e:
+                # 擷取失敗不中斷執行緒，稍後重試
+                self.error = e
+            wait = self.interval - (time.time() - t)
+            if wait > 0:
+                self._stop_ev.wait(wait)
+        # 釋放本執行緒建立的後端資源（mss / X display 連線）
+        try:
+            self.source.backend.close()
+        except Exception:
+            pass
+
+
+class FrameSource:
+    """
+    影格來源：
+    - grab()：擷取所有註冊區域的聯集一次，回傳 Frame（同一 tick 的偵測共用）
+    - capture(region)：只擷取單一區域（沒有共用影格時使用）
+    - view(region, frame)：從影格裁切區域，影格不含該區域時才另外截圖
+    - start_stream()：改由背景執行緒持續擷取，grab()/next_frame() 直接取環形緩衝中的新影格
+    backend：CaptureBackend 實例或名稱（預設 pyautogui）
+    """
+
+    def __init__(self, regions=None, backend=None):
+        if backend is None or isinstance(backend, str):
+            backend = create_backend(backend or "pyautogui")
+        self.backend = backend
+        self.regions = []
+        # 同步擷取用的影格緩衝池：每個執行緒一個，呼叫端還拿著的影格不會被之後的擷取覆寫
+        self._pools = threading.local()
+        self.ring = None
+        self._thread = None
+        if regions:
+            self.set_regions(regions)
+
+    def set_regions(self, regions):
+        self.regions = [tuple(map(int, r)) for r in regions if r]
+
+    def screen_size(self):
+        return self.backend.screen_size()
+
+    def capture(self, region):
+        """擷取單一區域（已夾在螢幕內）到本執行緒緩衝池的 BGR 緩衝，回傳 Frame"""
+        region = clamp_region(region, self.screen_size())
+        pool = getattr(self._pools, "pool", None)
+        if pool is None:
+            pool = self._pools.pool = FramePool()
+        return pool.capture(region, self.backend.grab_into)
+
+    def grab(self):
+        """
+        擷取聯集區域一次；沒有註冊區域時回傳 None
+        串流模式下回傳「呼叫之後才開始擷取」的新影格，確保看得到點擊後的畫面
+        """
+        region = union_region(self.regions)
+        if region is None:
+            return None
+        frame = None
+        if self.streaming:
+            frame = self.next_frame(time.time(), timeout=max(0.2, self._thread.interval * 4))
+        if frame is None:
+            frame = self.capture(region)
+        return frame
+
+    # ---- 背景串流 ----
+    @property
+    def streaming(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_stream(self, interval=1/30, capacity=4):
+        """啟動背景擷取執行緒；已在串流或沒有註冊區域時不動作"""
+        if self.streaming:
+            return
+        region = union_region(self.regions)
+        if region is None:
+            return
+        self.ring = FrameRing(capacity)
+        self._thread = CaptureThread(self, clamp_region(region, self.screen_size()), self.ring, interval)
+        self._thread.start()
+
+    def stop_stream(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.stop()
+            thread.join(timeout=1.0)
+
+    def close(self):
+        self.stop_stream()
+        self.backend.close()
+
+    def latest(self):
+        """串流中的最新影格（不阻塞）；未串流回傳 None"""
+        return self.ring.latest() if self.streaming else None
+
+    def frames_since(self, timestamp):
+        """串流中所有晚於 timestamp 的影格（不阻塞）"""
+        return self.ring.since(timestamp) if self.streaming else []
+
+    def next_frame(self, timestamp, timeout):
+        """
+        等待晚於 timestamp 的最新影格；中間沒處理到的舊影格直接略過
+        未串流或逾時回傳 None
+        """
+        if not self.streaming:
+            return None
+        return self.ring.wait_newer(timestamp, timeout)
+
+    def frame_for(self, region, frame=None):
+        """
+        回傳 (影格, 實際區域)：frame 涵蓋 region 時直接沿用，否則單獨截圖
+        單獨截圖時區域會被夾在螢幕內，之後請以回傳的區域向 frame.context 取影像
+        """
+        region = tuple(map(int, region))
+        if frame is not None and frame.contains(region):
+            return frame, region
+        frame = self.capture(region)
+        return frame, frame.region
+
+    def view(self, region, frame=None):
+        """取得區域影像（BGR）；優先從 frame 裁切，否則單獨截圖"""
+        if frame is not None:
+            img = frame.crop(region)
+            if img is not None:
+                return img
+        return self.capture(region).image
@@ -0,0 +1,68 @@
+# 測試共用設定：讓測試直接匯入專案根目錄的模組
+# app.py 在匯入時需要 pyautogui / pygetwindow（Windows 桌面自動化），
+# 在沒有顯示器或非 Windows 的 CI 上無法匯入時，換成只提供偵測流程會用到介面的替身
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+SCREEN_SIZE = (1920, 1080)
+
+
+def _fake_pyautogui():
+    mod = types.ModuleType("pyautogui")
+
+    class PyAutoGUIException(Exception):
+        pass
+
+    mod.PyAutoGUIException = PyAutoGUIException
+    mod.FAILSAFE = False
+    mod.size = lambda: SCREEN_SIZE
+    for name in ("moveTo", "mouseDown", "mouseUp", "click", "screenshot"):
+        setattr(mod, name, lambda *a, **k: None)
+    return mod
+
+
+for _name, _factory in (("pyautogui", _fake_pyautogui), ("pygetwindow", lambda: types.ModuleType("pygetwindow"))):
+    try:
+        __import__(_name)
+    except Exception:
+        sys.modules[_name] = _factory()
+
+
+@pytest.fixture(scope="session")
+def repo_root():
+    return ROOT
+
+
+@pytest.fixture(scope="session")
+def screen_size():
+    return SCREEN_SIZE
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def still_source(screen_size):
+    """只用測試提供之影格的 FrameSource：偵測器若自行截圖就直接失敗"""
+    from screenCapture import CaptureBackend, FrameSource
+
+    class StillBackend(CaptureBackend):
+        name = "still"
+
+        def screen_size(self):
+            return screen_size
+
+        def grab_into(self, region, out):
+            raise AssertionError("測試不應截圖")
+
+    return FrameSource(backend=StillBackend())
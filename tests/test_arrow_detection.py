@@ -0,0 +1,75 @@
+# 箭頭紅色遮罩 / 探針 / 角度的回歸測試：在合成影格上跑完整流程，不需要螢幕
+# 另外檢查拖曳之間沿用感知估計的條件（_fresh_estimate）
+import math
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from circularStats import CircularAccumulator
+from screenCapture import Frame
+
+CENTER = (300, 300)
+RADIUS = 140
+
+
+def arrow_frame(angle_deg, dist=80, size=28):
+    """人物中心周圍 dist 處畫一個指向 angle_deg（0°=上、順時針）的紅色三角形箭頭"""
+    img = np.full((600, 600, 3), 60, np.uint8)
+    rad = math.radians(angle_deg)
+    ux, uy = math.sin(rad), -math.cos(rad)     # 箭頭方向
+    px, py = -uy, ux                           # 垂直方向
+    bx, by = CENTER[0] + dist * ux, CENTER[1] + dist * uy
+    tip = (bx + size * ux, by + size * uy)
+    left = (bx - size * 0.6 * px, by - size * 0.6 * py)
+    right = (bx + size * 0.6 * px, by + size * 0.6 * py)
+    pts = np.array([tip, left, right], np.float32).round().astype(np.int32)
+    cv2.fillPoly(img, [pts], (20, 20, 230))
+    return Frame(img, (0, 0, 600, 600))
+
+
+@pytest.fixture
+def detector(app_module, repo_root, still_source):
+    return app_module.ArrowDetector(
+        f"{repo_root}/character.png", (0, 0, 600, 600), arrow_search_radius=RADIUS,
+        frame_source=still_source, arrow_inner_radius=30,
+    )
+
+
+def test_red_mask_finds_synthetic_arrow(detector):
+    frame = arrow_frame(90)
+    mask = detector._preprocess_red_mask(frame.image)
+    assert mask is not None
+    assert cv2.countNonZero(mask) > 200
+
+
+def test_arrow_red_count_and_presence(detector):
+    frame = arrow_frame(45)
+    assert detector.arrow_red_count(*CENTER, frame=frame) > 200
+    assert detector.arrow_present(*CENTER, {"ARROW_PROBE_ENABLED": True}, frame=frame)
+
+    empty = Frame(np.full((600, 600, 3), 60, np.uint8), (0, 0, 600, 600))
+    assert detector.arrow_red_count(*CENTER, frame=empty) == 0
+
+
+@pytest.mark.parametrize("angle", [0, 90, 200, 315])
+def test_find_arrow_by_color_angle(detector, angle):
+    loc, _, found = detector.find_arrow_by_color(*CENTER, frame=arrow_frame(angle))
+    assert loc is not None
+    assert abs((found - angle + 180) % 360 - 180) < 15
+
+
+def test_angle_decided_needs_agreeing_samples(detector):
+    tight = CircularAccumulator().extend([358, 2, 0])
+    assert not detector._angle_decided(CircularAccumulator().extend([358, 2]), 3)
+    assert detector._angle_decided(tight, 3)
+    assert not detector._angle_decided(CircularAccumulator().extend([300, 40, 10]), 3)
+
+
+@pytest.mark.parametrize("present, expected", [(True, True), (False, False)])
+def test_fresh_estimate_requires_arrow_present(app_module, detector, present, expected):
+    now = time.time()
+    estimate = app_module.PerceptionEstimate(7, now, CENTER, present, angle=90.0, std=3.0,
+                                             hits=5, last_hit=now, samples=5)
+    assert detector._fresh_estimate(estimate, {"PERCEPTION_MAX_AGE": 0.3}) is expected
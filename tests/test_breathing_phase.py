@@ -0,0 +1,46 @@
+# 箭頭呼吸相位估計的回歸測試：以已知週期的合成紅色像素數驗證鎖定、相位與等待時間
+import math
+
+import pytest
+
+PEAK = 0.3   # 亮峰時間（秒，週期 1 秒）
+
+
+def feed(phase, until, depth=0.8, start=0.0, rate=30):
+    t = start
+    while t <= until:
+        phase.observe(t, 100 * (1 + depth * math.cos(2 * math.pi * (t - PEAK))))
+        t += 1.0 / rate
+
+
+@pytest.fixture
+def phase(app_module):
+    return app_module.BreathingPhase(period=1.0, bright_fraction=0.5)
+
+
+def test_locks_onto_bright_peak(phase):
+    feed(phase, 1.5)
+    assert phase.locked(1.5)
+    assert phase.depth == pytest.approx(0.8, abs=0.05)
+    assert phase.phase(2.3) == pytest.approx(0.0, abs=0.1)
+    assert abs(phase.phase(2.8)) == pytest.approx(math.pi, abs=0.1)
+
+
+def test_wait_time_skips_to_next_bright_half(phase):
+    feed(phase, 1.5)
+    assert phase.wait_time(2.3) == 0.0                          # 亮峰
+    assert phase.wait_time(2.8) == pytest.approx(0.25, abs=0.02)  # 暗谷 → 等到 3.05 進入亮相位
+
+
+def test_no_lock_without_modulation_or_full_cycle(phase, app_module):
+    feed(phase, 0.8)
+    assert not phase.locked(0.8)        # 還不到一個週期
+    flat = app_module.BreathingPhase(period=1.0)
+    feed(flat, 2.0, depth=0.05)
+    assert not flat.locked(2.0)         # 調變太淺（箭頭沒有呼吸或不在）
+    assert flat.wait_time(2.0) == 0.0
+
+
+def test_lock_expires_when_samples_get_old(phase):
+    feed(phase, 1.5)
+    assert not phase.locked(1.5 + 3.5)
@@ -0,0 +1,91 @@
+# 環形統計累加器的回歸測試：跨 0° 的平均、滑動窗淘汰、指數加權與空累加器
+import pytest
+
+from circularStats import CircularAccumulator, circular_mean_deg
+
+
+def angle_diff(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def test_mean_wraps_around_zero():
+    acc = CircularAccumulator().extend([350, 10, 355, 5])
+    assert angle_diff(acc.mean(), 0) < 1e-6
+    assert acc.resultant() > 0.98
+    assert angle_diff(circular_mean_deg([350, 10]), 0) < 1e-6
+
+
+def test_empty_and_cancelling_samples():
+    acc = CircularAccumulator()
+    assert len(acc) == 0
+    assert acc.stats() == (None, 0.0, None)
+    assert circular_mean_deg([]) is None
+    # 正好相反的兩個方向幾乎抵銷：R 趨近 0，標準差很大
+    acc.extend([90, 270])
+    assert acc.resultant() < 1e-9
+    assert acc.std() > 180
+
+
+def test_window_drops_old_samples():
+    acc = CircularAccumulator(window=3).extend([180, 180, 180, 10, 20, 30])
+    assert len(acc) == 3
+    assert acc.mean() == pytest.approx(20, abs=1e-6)
+    assert acc.weight == pytest.approx(3)
+
+
+def test_window_resync_keeps_sums_exact():
+    acc = CircularAccumulator(window=4)
+    for i in range(CircularAccumulator.RESYNC_EVERY * 3 + 7):
+        acc.add(i * 37.0)
+    ref = CircularAccumulator().extend(i * 37.0 for i in range(CircularAccumulator.RESYNC_EVERY * 3 + 3,
+                                                               CircularAccumulator.RESYNC_EVERY * 3 + 7))
+    assert acc.S == pytest.approx(ref.S, abs=1e-9)
+    assert acc.C == pytest.approx(ref.C, abs=1e-9)
+
+
+def test_alpha_follows_recent_direction():
+    acc = CircularAccumulator(alpha=0.5).extend([0] * 5 + [90] * 5)
+    assert angle_diff(acc.mean(), 90) < 5
+    assert acc.weight == pytest.approx(1.0)
+    # 全部累加則停在兩群中間
+    assert CircularAccumulator().extend([0] * 5 + [90] * 5).mean() == pytest.approx(45)
+
+
+def test_concentrated_samples_have_small_std():
+    tight = CircularAccumulator().extend([358, 0, 2])
+    loose = CircularAccumulator().extend([300, 0, 60])
+    assert tight.std() < 3
+    assert loose.std() > tight.std() * 10
+
+
+def spread(center, offsets):
+    return [(center + d) % 360 for d in offsets]
+
+
+def test_halfwidth_needs_two_samples():
+    acc = CircularAccumulator()
+    assert acc.mean_halfwidth() is None
+    acc.add(42)
+    assert acc.mean_halfwidth() is None
+
+
+def test_halfwidth_narrows_with_more_samples():
+    offsets = [-6, 4, -2, 7, -5, 3, 1, -4]
+    few = CircularAccumulator().extend(spread(355, offsets[:3]))
+    many = CircularAccumulator().extend(spread(355, offsets * 4))
+    assert many.mean_halfwidth() < few.mean_halfwidth()
+    # 跨 0° 的樣本不應被算成散開
+    assert many.mean_halfwidth() < 3
+
+
+def test_halfwidth_wider_for_dispersed_angles():
+    tight = CircularAccumulator().extend(spread(0, [-3, 2, -1, 3, -2]))
+    loose = CircularAccumulator().extend(spread(0, [-40, 35, -20, 45, -30]))
+    assert loose.mean_halfwidth() > tight.mean_halfwidth() * 5
+    # 完全抵銷的方向沒有均值可言
+    assert CircularAccumulator().extend([0, 90, 180, 270]).mean_halfwidth() in (None, 180.0)
+
+
+def test_halfwidth_follows_window():
+    acc = CircularAccumulator(window=4).extend([0, 120, 240, 60, 10, 12, 11, 9])
+    assert acc.mean_halfwidth() < 3
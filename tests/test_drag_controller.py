@@ -0,0 +1,72 @@
+# 動態拖曳控制器的回歸測試：不需要螢幕與滑鼠，只驗證狀態機的判斷
+import threading
+import time
+import types
+
+import pytest
+
+
+class StuckPerception(threading.Thread):
+    """收到停止信號後仍卡在一張影格上的感知執行緒"""
+
+    def __init__(self, busy):
+        super().__init__(daemon=True)
+        self.busy = busy
+        self.release = threading.Event()
+
+    def stop(self):
+        pass
+
+    def run(self):
+        self.release.wait(self.busy)
+
+
+@pytest.fixture
+def fake_detector():
+    return types.SimpleNamespace(poll=0.02, drag_button="left", drag_distance=200)
+
+
+@pytest.fixture
+def controller(app_module, fake_detector):
+    ctl = app_module.DragController(fake_detector, {"CAPTURE_STREAM_FPS": 50})
+    ctl.t_start = None
+    return ctl
+
+
+def test_release_does_not_wait_for_stuck_perception(controller, capsys):
+    controller.perception = StuckPerception(busy=5.0)
+    controller.perception.start()
+    t = time.time()
+    controller._release()
+    assert time.time() - t < 0.5
+    assert controller.state == controller.RELEASE
+    assert "未結束" in capsys.readouterr().out
+    controller.perception.release.set()
+
+
+def test_release_joins_finished_perception(controller, capsys):
+    controller.perception = StuckPerception(busy=0.0)
+    controller.perception.start()
+    controller._release()
+    assert not controller.perception.is_alive()
+    assert "未結束" not in capsys.readouterr().out
+
+
+def estimate_at(app_module, t, last_hit=None):
+    return app_module.PerceptionEstimate(3, t, (300, 300), False, hits=0 if last_hit is None else 1,
+                                         last_hit=last_hit)
+
+
+@pytest.mark.parametrize("steer", [False, True])
+def test_miss_timer_waits_for_first_hit_in_fixed_hold(app_module, fake_detector, steer):
+    ctl = app_module.DragController(fake_detector, {"ARROW_MISS_TOLERANCE_TIME": 0.5}, steer=steer)
+    ctl.t_start, ctl.missing = 100.0, False
+    # 開頭 1 秒都在呼吸暗相：固定拖曳還沒看過箭頭，不可提早放開；動態拖曳在最短拖曳時間後照常計時
+    assert ctl._check_missing(estimate_at(app_module, 101.0), 1.0) is steer
+
+
+def test_fixed_hold_releases_after_arrow_disappears(app_module, fake_detector):
+    ctl = app_module.DragController(fake_detector, {"ARROW_MISS_TOLERANCE_TIME": 0.5}, steer=False)
+    ctl.t_start, ctl.missing = 100.0, False
+    assert not ctl._check_missing(estimate_at(app_module, 100.4, last_hit=100.2), 0.4)
+    assert ctl._check_missing(estimate_at(app_module, 100.8, last_hit=100.2), 0.8)
@@ -0,0 +1,42 @@
+# FFT 相關引擎的回歸測試：結果要與 cv2.matchTemplate 一致（模板頻譜快取重複使用時也一樣）
+import cv2
+import numpy as np
+import pytest
+
+from fftMatch import FFTCorrelator
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (97, 131), dtype=np.uint8), (0, 0), 1.5)
+
+
+def test_ccoeff_normed_matches_opencv(image):
+    tmpl = image[30:55, 40:76].copy()
+    expected = cv2.matchTemplate(image, tmpl, cv2.TM_CCOEFF_NORMED)
+    got = FFTCorrelator(image).ccoeff_normed(tmpl)
+    assert got.shape == expected.shape
+    assert np.abs(got - expected).max() < 1e-3
+    assert cv2.minMaxLoc(got)[3] == (40, 30)
+
+
+def test_ccorr_normed_masked_matches_opencv(image):
+    tmpl = image[10:40, 60:92].copy()
+    mask = np.zeros(tmpl.shape, np.uint8)
+    cv2.circle(mask, (16, 15), 12, 255, -1)
+    expected = cv2.matchTemplate(image, tmpl, cv2.TM_CCORR_NORMED, mask=mask)
+    got = FFTCorrelator(image).ccorr_normed_masked(tmpl, mask)
+    assert np.abs(got - expected).max() < 1e-3
+    assert cv2.minMaxLoc(got)[3] == (60, 10)
+
+
+def test_template_spectrum_cache_is_keyed_by_image_size(image):
+    tmpl = image[20:44, 20:50].copy()
+    cache = {}
+    small = image[:60, :80]
+    for img in (image, small, image):
+        expected = cv2.matchTemplate(img, tmpl, cv2.TM_CCOEFF_NORMED)
+        assert np.abs(FFTCorrelator(img).ccoeff_normed(tmpl, cache) - expected).max() < 1e-3
+    # 兩種 DFT 尺寸各一份頻譜，加上與尺寸無關的置中模板
+    assert len([k for k in cache if isinstance(k, tuple)]) == 2
@@ -0,0 +1,38 @@
+# 人物白色圓環偵測的回歸測試：環帶卷積引擎與 HoughCircles 在合成影格上找到同一個圓
+import cv2
+import numpy as np
+import pytest
+
+from screenCapture import Frame
+
+REGION = (0, 0, 400, 300)
+
+
+@pytest.fixture
+def detector(app_module, repo_root, still_source):
+    return app_module.ArrowDetector(f"{repo_root}/character.png", REGION, frame_source=still_source)
+
+
+def ring_frame(center=(230, 140), radius=28, clutter=True):
+    img = np.full((REGION[3], REGION[2], 3), 40, np.uint8)
+    if clutter:
+        # 白色雜訊：實心方塊與線段的綜合分數都比空心圓環低
+        cv2.rectangle(img, (40, 40), (90, 80), (255, 255, 255), -1)
+        cv2.line(img, (300, 250), (390, 200), (255, 255, 255), 3)
+    if center is not None:
+        cv2.circle(img, center, radius, (255, 255, 255), 3)
+    return Frame(img, REGION)
+
+
+@pytest.mark.parametrize("engine", ["annulus", "hough"])
+def test_engines_find_the_ring(detector, engine):
+    center, radius, score = detector.find_ring_then_match(frame=ring_frame(), engine=engine)
+    assert center is not None
+    assert abs(center[0] - 230) <= 2 and abs(center[1] - 140) <= 2
+    assert abs(radius - 28) <= 4
+    assert score > 0
+
+
+def test_annulus_engine_without_white_finds_nothing(detector):
+    center, radius, score = detector.find_ring_then_match(frame=ring_frame(center=None, clutter=False), engine="annulus")
+    assert center is None
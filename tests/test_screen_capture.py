@@ -0,0 +1,131 @@
+# 影格來源的回歸測試：環形緩衝、影格緩衝租用（拿著 Frame 期間不能被覆寫），不需要螢幕
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from screenCapture import CaptureBackend, CaptureThread, Frame, FrameRing, FrameSource
+
+
+class CountingBackend(CaptureBackend):
+    """每次擷取把整張影像填成擷取序號"""
+    name = "counting"
+
+    def __init__(self):
+        self.count = 0
+
+    def screen_size(self):
+        return (64, 64)
+
+    def grab_into(self, region, out):
+        self.count += 1
+        out[:] = self.count % 256
+
+
+class Source:
+    def __init__(self, backend):
+        self.backend = backend
+
+
+def make_frame(timestamp):
+    return Frame(np.zeros((4, 4, 3), np.uint8), (0, 0, 4, 4), timestamp)
+
+
+def run_thread(ring, backend, interval=1 / 500):
+    thread = CaptureThread(Source(backend), (0, 0, 8, 8), ring, interval)
+    thread.start()
+    return thread
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.time() + timeout
+    while not cond():
+        assert time.time() < deadline
+        time.sleep(0.005)
+
+
+def test_ring_since_returns_newer_frames_oldest_first():
+    ring = FrameRing(3)
+    frames = [make_frame(t) for t in (1.0, 2.0, 3.0, 4.0)]
+    for f in frames:
+        ring.push(f)
+    assert ring.since(0.0) == frames[1:]   # 容量 3，最舊的已被擠掉
+    assert ring.since(2.0) == frames[2:]
+    assert ring.since(4.0) == []
+    assert ring.latest() is frames[-1]
+
+
+def test_ring_wait_newer_wakes_on_push():
+    ring = FrameRing(2)
+    ring.push(make_frame(1.0))
+    assert ring.wait_newer(1.0, timeout=0.01) is None
+    newer = make_frame(2.0)
+    threading.Timer(0.02, ring.push, (newer,)).start()
+    assert ring.wait_newer(1.0, timeout=1.0) is newer
+
+
+def test_held_frame_is_not_overwritten():
+    ring, backend = FrameRing(2), CountingBackend()
+    thread = run_thread(ring, backend)
+    try:
+        wait_for(lambda: ring.latest() is not None)
+        held = ring.latest()
+        value = int(held.image[0, 0, 0])
+        start = backend.count
+        wait_for(lambda: backend.count > start + 40)
+        assert (held.image == value).all()
+        assert thread.pool.size(8, 8) == ring.capacity + 2
+    finally:
+        thread.stop()
+        thread.join()
+
+
+def test_slots_are_capped_and_reused_after_release():
+    ring, backend = FrameRing(2), CountingBackend()
+    thread = run_thread(ring, backend)
+    try:
+        held = []
+        wait_for(lambda: ring.latest() is not None)
+        deadline = time.time() + 2.0
+        while thread.pool.size(8, 8) < CaptureThread.MAX_SLOTS or thread.error is None:
+            assert time.time() < deadline
+            frame = ring.latest()
+            if not held or frame is not held[-1]:
+                held.append(frame)
+            time.sleep(0.002)
+        assert thread.pool.size(8, 8) == CaptureThread.MAX_SLOTS
+        held.clear()
+        wait_for(lambda: thread.error is None)
+    finally:
+        thread.stop()
+        thread.join()
+
+
+def test_sync_capture_never_overwrites_held_frames():
+    source = FrameSource(backend=CountingBackend())
+    held = [source.capture((0, 0, 8, 8)) for _ in range(5)]
+    assert [int(f.image[0, 0, 0]) for f in held] == [1, 2, 3, 4, 5]
+    # 之前的影格丟掉後緩衝重複使用，不再配置
+    held.clear()
+    for _ in range(10):
+        source.capture((0, 0, 8, 8))
+    assert source._pools.pool.size(8, 8) == 5
+
+
+def test_dropped_capture_stays_readable_until_next_capture():
+    source = FrameSource(backend=CountingBackend())
+    first = source.capture((0, 0, 8, 8)).image
+    source.capture((0, 0, 8, 8))
+    assert (first == 1).all()
+
+
+def test_frame_context_does_not_keep_frame_alive():
+    source = FrameSource(backend=CountingBackend())
+    frame = source.capture((0, 0, 8, 8))
+    gray = frame.context.gray((0, 0, 8, 8))
+    assert gray.shape == (8, 8) and (gray == 1).all()
+    # 用過 context 的影格丟掉後不必等 GC 就釋放，緩衝池才能馬上重用它的緩衝
+    ref = weakref.ref(frame)
+    del frame
+    assert ref() is None
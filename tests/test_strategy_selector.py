@@ -0,0 +1,68 @@
+# 偵測策略選擇器的回歸測試：分層排序、失敗計數與暫時跳過
+import pytest
+
+
+@pytest.fixture
+def selector(app_module):
+    def make(names, tiers=None, skip_after=3, retry_every=4):
+        return app_module.StrategySelector(names, skip_after=skip_after, retry_every=retry_every, tiers=tiers)
+    return make
+
+
+def test_never_run_methods_keep_original_order(selector):
+    assert selector(["a", "b", "c"]).order({"a", "b", "c"}) == ["a", "b", "c"]
+
+
+def test_cheaper_method_moves_ahead_within_a_tier(selector):
+    sel = selector(["slow", "fast"], skip_after=100)
+    for _ in range(5):
+        sel.record([("slow", False, 0.050), ("fast", True, 0.005)])
+    assert sel.order({"slow", "fast"}) == ["fast", "slow"]
+
+
+def test_fallback_never_moves_ahead_of_validated_tier(selector):
+    sel = selector(["enhanced", "original"], tiers=[["enhanced"], ["original"]])
+    # 增強比對拒絕（可能是誤判）而傳統比對又快又「成功」：排序與跳過都不受影響
+    for _ in range(20):
+        assert sel.order({"enhanced", "original"}) == ["enhanced", "original"]
+        sel.record([("enhanced", False, 0.080), ("original", True, 0.002)])
+    assert sel.stats["enhanced"]["fails"] == 0
+
+
+def test_method_failing_in_scene_is_skipped_then_retried(selector):
+    sel = selector(["a", "b"], skip_after=3, retry_every=4)
+    for _ in range(3):
+        sel.record([("a", False, 0.01), ("b", True, 0.01)])
+    orders = [sel.order({"a", "b"}) for _ in range(4)]
+    assert orders[:3] == [["b"]] * 3
+    assert "a" in orders[3]              # 第 retry_every 次給它一次機會
+    sel.record([("a", True, 0.01)])
+    assert sel.stats["a"]["fails"] == 0
+    assert sorted(sel.order({"a", "b"})) == ["a", "b"]   # 重新成功後恢復使用
+
+
+def test_all_failing_call_does_not_count_as_failure(selector):
+    sel = selector(["a", "b"], skip_after=1)
+    sel.record([("a", False, 0.01), ("b", False, 0.01)])
+    assert sel.stats["a"]["fails"] == 0 and sel.stats["b"]["fails"] == 0
+    assert sel.order({"a", "b"}) == ["a", "b"]
+
+
+def test_run_strategies_stops_at_first_success(app_module, selector):
+    sel = selector(["enhanced", "original"], tiers=[["enhanced"], ["original"]])
+    calls = []
+
+    def method(name, ok):
+        def run():
+            calls.append(name)
+            return name, ok
+        return run
+
+    methods = {"enhanced": method("enhanced", True), "original": method("original", True)}
+    assert app_module.run_strategies(sel, methods, {"STRATEGY_ADAPTIVE": True}) == "enhanced"
+    assert calls == ["enhanced"]
+
+    calls.clear()
+    methods = {"original": method("original", False), "enhanced": method("enhanced", False)}
+    assert app_module.run_strategies(sel, methods, {"STRATEGY_ADAPTIVE": False}) is None
+    assert calls == ["original", "enhanced"]   # 關閉自適應時照 methods 原本順序
@@ -0,0 +1,115 @@
+# 模板庫的回歸測試：各尺度的預算結果與重建條件，使用合成模板，不需要螢幕
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    """有紋理的 40x30 彩色模板（中間一塊白色，周圍青藍色）"""
+    img = np.zeros((30, 40, 3), np.uint8)
+    img[:] = (200, 180, 40)
+    cv2.rectangle(img, (10, 8), (29, 21), (255, 255, 255), -1)
+    cv2.line(img, (0, 29), (39, 0), (0, 0, 200), 2)
+    path = str(tmp_path / "icon.png")
+    cv2.imwrite(path, img)
+    return path
+
+
+def test_levels_cover_scale_range(app_module, template_path):
+    full_mask = lambda bgr: np.full(bgr.shape[:2], 255, np.uint8)
+    bank = app_module.TemplateBank(template_path, (0.5, 1.5), 5, mask_builder=full_mask)
+    assert [lv.scale for lv in bank.levels] == pytest.approx([0.5, 0.75, 1.0, 1.25, 1.5])
+    for lv in bank.levels:
+        assert (lv.w, lv.h) == (round(40 * lv.scale), round(30 * lv.scale))
+        for img in (lv.gray, lv.edge, lv.mask, lv.plain):
+            assert img.shape == (lv.h, lv.w)
+    assert (bank.levels[2].gray == cv2.cvtColor(cv2.imread(template_path), cv2.COLOR_BGR2GRAY)).all()
+
+
+def test_bank_without_mask_builder_has_no_masks(app_module, template_path):
+    bank = app_module.TemplateBank(template_path, (0.8, 1.2), 3)
+    assert bank.mask is None and all(lv.mask is None for lv in bank.levels)
+
+
+def test_missing_template_raises(app_module, tmp_path):
+    with pytest.raises(ValueError):
+        app_module.TemplateBank(str(tmp_path / "missing.png"), (0.8, 1.2), 3)
+
+
+def test_detector_rebuilds_bank_only_when_settings_change(app_module, template_path, still_source):
+    det = app_module.ImageDetector(template_path, (0, 0, 200, 200), frame_source=still_source)
+    bank = det.template_bank()
+    assert det.template_bank() is bank
+    assert det.template_bank(scale_range=(0.8, 1.2), scale_steps=7) is bank
+    rebuilt = det.template_bank(scale_steps=5)
+    assert rebuilt is not bank and len(rebuilt.levels) == 5
+
+
+def textured_template(tmp_path, size=(48, 40)):
+    """平滑的隨機紋理模板（比對分數隨尺度平滑變化，適合驗證尺度內插）"""
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (size[1], size[0]), dtype=np.uint8), (0, 0), 2.0)
+    img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+    path = str(tmp_path / "texture.png")
+    cv2.imwrite(path, img)
+    return path, img
+
+
+def scene_with(template, scale, at, size=(320, 240)):
+    rng = np.random.default_rng(1)
+    scene = cv2.GaussianBlur(rng.integers(80, 176, (size[1], size[0]), dtype=np.uint8), (0, 0), 2.0)
+    h, w = template.shape[:2]
+    tw, th = int(round(w * scale)), int(round(h * scale))
+    scene[at[1]:at[1] + th, at[0]:at[0] + tw] = cv2.resize(template, (tw, th), interpolation=cv2.INTER_AREA)
+    return scene
+
+
+def gray_matcher(scene, factor):
+    """scan_template_scales 用的比對函式（灰階 TM_CCOEFF_NORMED）；full_calls 記錄全解析度比對的尺度"""
+    sh, sw = scene.shape[:2]
+    coarse_scene = cv2.resize(scene, (round(sw * factor), round(sh * factor)), interpolation=cv2.INTER_AREA)
+    full_calls = []
+
+    def match(lv, coarse, window):
+        img, ox, oy = (coarse_scene if coarse else scene), 0, 0
+        if window is not None:
+            x, y, w, h = window
+            ox, oy = max(0, x), max(0, y)
+            img = img[oy:y + h, ox:x + w]
+        if lv.h > img.shape[0] or lv.w > img.shape[1]:
+            return None
+        if not coarse:
+            full_calls.append(lv.scale)
+        _, score, _, loc = cv2.minMaxLoc(cv2.matchTemplate(img, lv.gray, cv2.TM_CCOEFF_NORMED))
+        return score, (loc[0] + ox, loc[1] + oy)
+
+    return match, full_calls
+
+
+@pytest.mark.parametrize("mode", ["coarse_to_fine", "dense"])
+def test_scale_search_recovers_scale_and_position(app_module, tmp_path, mode):
+    path, template = textured_template(tmp_path)
+    bank = app_module.TemplateBank(path, (0.8, 1.2), 9, coarse_factor=0.5)
+    assert bank.coarse_ok
+    match, full_calls = gray_matcher(scene_with(template, 1.12, (100, 70)), bank.coarse_factor)
+
+    grid, best = app_module.scan_template_scales(bank, match, {"ICON_SEARCH_MODE": mode, "ICON_REFINE_TOP_K": 2})
+    score, loc, scale = best
+    assert score > 0.9
+    assert abs(scale - 1.12) < 0.025     # 格點間距 0.05，誤差不到半格
+    assert abs(loc[0] - 100) <= 2 and abs(loc[1] - 70) <= 2
+    if mode == "dense":
+        assert len(full_calls) == 9
+    else:
+        assert len(full_calls) <= 2 + 3
+
+
+def test_small_templates_fall_back_to_dense_search(app_module, tmp_path):
+    path, template = textured_template(tmp_path, size=(20, 14))
+    bank = app_module.TemplateBank(path, (0.8, 1.2), 5, coarse_factor=0.5)
+    assert not bank.coarse_ok            # 粗層模板會小於 COARSE_MIN_SIZE
+    match, full_calls = gray_matcher(scene_with(template, 1.0, (50, 40)), 0.5)
+    _, best = app_module.scan_template_scales(bank, match, {"ICON_SEARCH_MODE": "coarse_to_fine"})
+    assert len(full_calls) == 5
+    assert best[1] == (50, 40) and best[2] == pytest.approx(1.0)
@@ -0,0 +1,74 @@
+# 人物追蹤的回歸測試：等速 Kalman 追蹤器的預測與不確定性、拖曳中光流位移量測
+import cv2
+import numpy as np
+import pytest
+
+from screenCapture import Frame
+
+
+@pytest.fixture
+def tracker(app_module):
+    return app_module.CharacterTracker()
+
+
+def test_uninitialized_tracker_predicts_nothing(tracker):
+    assert not tracker.initialized
+    assert tracker.predict(1.0) is None
+
+
+def test_constant_velocity_is_learned_and_extrapolated(tracker):
+    # 每 0.05 秒量測一次，等速 (200, -100) px/s
+    for k in range(20):
+        t = k * 0.05
+        tracker.update(100 + 200 * t, 300 - 100 * t, t)
+    x, y, std = tracker.predict(1.2)
+    assert x == pytest.approx(100 + 200 * 1.2, abs=2.0)
+    assert y == pytest.approx(300 - 100 * 1.2, abs=2.0)
+    assert std < 10
+
+
+def test_uncertainty_grows_with_time_since_last_update(tracker):
+    for k in range(5):
+        tracker.update(50, 50, k * 0.05)
+    stds = [tracker.predict(0.2 + dt)[2] for dt in (0.0, 0.1, 0.5)]
+    assert stds[0] < stds[1] < stds[2]
+
+
+def test_reset_forgets_state(tracker):
+    tracker.update(10, 10, 0.0)
+    tracker.reset()
+    assert tracker.predict(0.1) is None
+
+
+def textured_frames(shifts, size=(400, 300)):
+    """同一張紋理依序平移 shifts（累積位移，像素）的影格，時間間隔 0.05 秒"""
+    rng = np.random.default_rng(0)
+    tex = cv2.GaussianBlur(rng.integers(0, 256, (size[1] + 100, size[0] + 100, 3), dtype=np.uint8), (0, 0), 1.5)
+    frames = []
+    for k, (dx, dy) in enumerate(shifts):
+        img = np.ascontiguousarray(tex[50 - dy:50 - dy + size[1], 50 - dx:50 - dx + size[0]])
+        frames.append(Frame(img, (0, 0, size[0], size[1]), timestamp=k * 0.05))
+    return frames
+
+
+@pytest.fixture
+def motion(app_module, still_source):
+    return app_module.MotionEstimator(still_source, (0, 0, 400, 300), (60, 60), stall_speed=20.0)
+
+
+def test_motion_estimator_measures_displacement(motion):
+    frames = textured_frames([(0, 0), (6, -4), (12, -8)])
+    assert motion.start((200, 150), frames[0])
+    for f in frames[1:]:
+        dx, dy = motion.update(f)
+        assert dx == pytest.approx(6, abs=0.5) and dy == pytest.approx(-4, abs=0.5)
+    assert motion.displacement == pytest.approx((12, -8), abs=1.0)
+    assert motion.speed > 20.0 and motion.still_for() == 0.0
+
+
+def test_motion_estimator_detects_stall(motion):
+    frames = textured_frames([(0, 0)] * 6)
+    assert motion.start((200, 150), frames[0])
+    for f in frames[1:]:
+        assert motion.update(f) == pytest.approx((0, 0), abs=0.1)
+    assert motion.still_for() == pytest.approx(0.2)